@@ -0,0 +1,53 @@
+"""create knowledge base jobs table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'knowledge_base_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=100), nullable=False),
+        sa.Column('status', sa.String(length=50), default='pending'),
+        sa.Column('force_reprocess', sa.Boolean(), default=False),
+        sa.Column('parallel', sa.Boolean(), default=False),
+        sa.Column('total_files', sa.Integer(), default=0),
+        sa.Column('processed_files', sa.Integer(), default=0),
+        sa.Column('failed_files', sa.Integer(), default=0),
+        sa.Column('skipped_files', sa.Integer(), default=0),
+        sa.Column('embedded_chunks', sa.Integer(), default=0),
+        sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('checkpoint_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_knowledge_base_jobs_id'), 'knowledge_base_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_knowledge_base_jobs_job_id'), 'knowledge_base_jobs', ['job_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_knowledge_base_jobs_job_id'), table_name='knowledge_base_jobs')
+    op.drop_index(op.f('ix_knowledge_base_jobs_id'), table_name='knowledge_base_jobs')
+    op.drop_table('knowledge_base_jobs')
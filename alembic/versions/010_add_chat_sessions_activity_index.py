@@ -0,0 +1,31 @@
+"""add chat_sessions (user_id, activity, id) index for keyset pagination
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_chat_sessions_user_id_activity',
+        'chat_sessions',
+        ['user_id', sa.text('coalesce(updated_at, created_at) DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_sessions_user_id_activity', table_name='chat_sessions')
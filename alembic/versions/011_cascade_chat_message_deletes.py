@@ -0,0 +1,38 @@
+"""cascade chat message deletes from chat sessions
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 002 created the constraint unnamed, so it has the PostgreSQL default name
+    op.drop_constraint('chat_messages_session_id_fkey', 'chat_messages', type_='foreignkey')
+    op.create_foreign_key(
+        'chat_messages_session_id_fkey',
+        'chat_messages', 'chat_sessions',
+        ['session_id'], ['id'],
+        ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('chat_messages_session_id_fkey', 'chat_messages', type_='foreignkey')
+    op.create_foreign_key(
+        'chat_messages_session_id_fkey',
+        'chat_messages', 'chat_sessions',
+        ['session_id'], ['id']
+    )
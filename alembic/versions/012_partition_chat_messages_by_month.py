@@ -0,0 +1,119 @@
+"""partition chat_messages by created_at month
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created ahead of the current month; ChatRetentionService keeps this up
+PARTITIONS_AHEAD = 3
+
+
+def _detach_old_table() -> None:
+    """Rename chat_messages out of the way, keeping its id sequence"""
+    op.execute("ALTER TABLE chat_messages RENAME TO chat_messages_old")
+    op.execute("ALTER TABLE chat_messages_old RENAME CONSTRAINT chat_messages_pkey TO chat_messages_old_pkey")
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY NONE")
+
+
+def _finish_copy() -> None:
+    op.execute("DROP TABLE chat_messages_old")
+    op.execute("ALTER SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id")
+
+
+def upgrade() -> None:
+    op.drop_index('ix_chat_messages_session_id_created_at', table_name='chat_messages')
+    op.drop_index('ix_chat_messages_id', table_name='chat_messages')
+    _detach_old_table()
+    
+    # The partition key must be part of the primary key, and cannot be NULL
+    op.execute("""
+        CREATE TABLE chat_messages (
+            id integer NOT NULL DEFAULT nextval('chat_messages_id_seq'),
+            session_id integer NOT NULL,
+            role messagerole NOT NULL,
+            content text NOT NULL,
+            created_at timestamp with time zone NOT NULL DEFAULT now(),
+            CONSTRAINT chat_messages_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT chat_messages_session_id_fkey FOREIGN KEY (session_id)
+                REFERENCES chat_sessions (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (created_at)
+    """)
+    
+    # One partition per UTC month, from the oldest message to PARTITIONS_AHEAD months ahead
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month timestamp := date_trunc(
+                'month',
+                coalesce((SELECT min(created_at) FROM chat_messages_old), now()) AT TIME ZONE 'UTC'
+            );
+            last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC')
+                + interval '{PARTITIONS_AHEAD} months';
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF chat_messages FOR VALUES FROM (%L) TO (%L)',
+                    'chat_messages_p' || to_char(month, 'YYYYMM'),
+                    month::text || '+00',
+                    (month + interval '1 month')::text || '+00'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+    
+    op.create_index(
+        'ix_chat_messages_session_id_created_at',
+        'chat_messages',
+        ['session_id', 'created_at'],
+        unique=False
+    )
+    op.execute("""
+        INSERT INTO chat_messages (id, session_id, role, content, created_at)
+        SELECT id, session_id, role, content, coalesce(created_at, now())
+        FROM chat_messages_old
+    """)
+    _finish_copy()
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_session_id_created_at', table_name='chat_messages')
+    _detach_old_table()
+    
+    op.create_table(
+        'chat_messages',
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('chat_messages_id_seq')"), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('role', sa.Enum('USER', 'ASSISTANT', 'SYSTEM', name='messagerole', create_type=False), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO chat_messages (id, session_id, role, content, created_at)
+        SELECT id, session_id, role, content, created_at
+        FROM chat_messages_old
+    """)
+    op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+    op.create_index(
+        'ix_chat_messages_session_id_created_at',
+        'chat_messages',
+        ['session_id', 'created_at'],
+        unique=False
+    )
+    # Partitions are dropped with their parent table
+    _finish_copy()
@@ -0,0 +1,44 @@
+"""add full-text search column and index to chat_messages
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Added to the partitioned parent, so every partition gets the column and index
+    op.add_column(
+        'chat_messages',
+        sa.Column(
+            'content_tsv',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('indonesian', content)", persisted=True),
+            nullable=True
+        )
+    )
+    op.create_index(
+        'ix_chat_messages_content_tsv',
+        'chat_messages',
+        ['content_tsv'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_content_tsv', table_name='chat_messages')
+    op.drop_column('chat_messages', 'content_tsv')
@@ -0,0 +1,27 @@
+"""add default partition to chat_messages
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Holds messages of months without a partition until ChatRetentionService creates it
+    op.execute("CREATE TABLE chat_messages_default PARTITION OF chat_messages DEFAULT")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE chat_messages_default")
@@ -1,8 +1,9 @@
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.base import get_db
+from app.db.base import get_db, get_async_db
 from app.core.security import decode_access_token
 from app.services.user_service import UserService
 from app.models.user import User
@@ -38,6 +39,35 @@ def get_current_user(
     return user
 
 
+async def get_user_from_token_async(db: AsyncSession, token: str) -> Optional[User]:
+    """Get the user of a JWT access token, or None if the token is invalid."""
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    
+    user_id: int = payload.get("sub")
+    if user_id is None:
+        return None
+    
+    return await UserService.aget_by_id(db, user_id=int(user_id))
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> User:
+    """Get current authenticated user using an async session."""
+    user = await get_user_from_token_async(db, credentials.credentials)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user
+
+
 def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -50,6 +80,18 @@ def get_current_active_user(
     return current_user
 
 
+async def get_current_active_user_async(
+    current_user: User = Depends(get_current_user_async)
+) -> User:
+    """Get current active user using an async session."""
+    if not current_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    return current_user
+
+
 def get_current_superuser(
     current_user: User = Depends(get_current_active_user)
 ) -> User:
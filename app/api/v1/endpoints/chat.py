@@ -1,38 +1,60 @@
 """
 Chat API Endpoints for PetikSendiri Assistant
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from typing import Any, Dict, List, Optional, Type, TypeVar
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.base import get_db
+from app.core.pagination import decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
+from app.db.base import AsyncSessionLocal, get_db, get_async_db
 from app.schemas.chat import (
     ChatRequest,
     ChatResponse,
-    ChatSessionResponse,
+    ChatSearchResponse,
+    ChatSearchResult,
+    ChatSessionSummary,
+    ChatSessionsDeleteResponse,
     ChatSessionWithMessages,
     ChatMessageResponse,
+    ChatWebSocketMessageFrame,
+    ChatWebSocketSessionFrame,
     DocumentProcessRequest,
     DocumentProcessingStatus,
     ProcessedDocumentResponse,
-    KnowledgeBaseStats
+    KnowledgeBaseStats,
+    KnowledgeBaseJobResponse
 )
-from app.services.chat_service import ChatService
+from app.services.chat_retention_service import ChatRetentionService
+from app.services.chat_service import ChatConnection, ChatService
+from app.services.knowledge_base_job_service import KnowledgeBaseJobService
 from app.services.rag_service import rag_service, RAGService
-from app.api.deps import get_current_active_user, get_current_user, get_optional_user
+from app.api.deps import (
+    get_current_active_user,
+    get_current_active_user_async,
+    get_current_superuser,
+    get_current_user,
+    get_optional_user,
+    get_user_from_token_async
+)
 from app.models.user import User
-from app.models.chat import ProcessedDocument
+from app.models.chat import ProcessedDocument, KnowledgeBaseJob
 
 router = APIRouter()
 
+Frame = TypeVar("Frame", bound=BaseModel)
+
 
 # ==================== Chat Endpoints ====================
 
 @router.post("/send", response_model=ChatResponse, summary="Send Chat Message")
-def send_message(
+async def send_message(
     request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """
     Send a message to PetikSendiri Assistant and get a response.
@@ -46,12 +68,17 @@ def send_message(
     
     Requires authentication token.
     """
-    session, assistant_message, is_new_session = ChatService.process_message(
+    session, assistant_message, is_new_session = await ChatService.process_message(
         db=db,
         session_id=request.session_id,
         user_message=request.message,
         user_id=current_user.id
     )
+    if assistant_message is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
     
     return ChatResponse(
         session_id=session.session_id,
@@ -65,53 +92,314 @@ def send_message(
     )
 
 
-@router.get("/sessions", response_model=List[ChatSessionResponse], summary="Get User's Chat Sessions")
-def get_sessions(
-    skip: int = 0,
-    limit: int = 20,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+def _stream_data(event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Make the data of a chat stream event JSON-serializable"""
+    if event != "done":
+        return data
+    message = data["message"]
+    return {
+        "message": ChatMessageResponse(
+            id=message.id,
+            role=message.role,
+            content=message.content,
+            created_at=message.created_at
+        ).model_dump(mode="json"),
+        "title": data["title"]
+    }
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(_stream_data(event, data), ensure_ascii=False)}\n\n"
+
+
+@router.post("/send/stream", summary="Send Chat Message with Streaming Response")
+async def send_message_stream(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    """
+    Send a message to PetikSendiri Assistant and stream the response as server-sent events.
+    
+    - **message**: The user's message/question
+    - **session_id**: Optional session ID for continuing a conversation
+    
+    Events:
+    - **session**: `{"session_id", "is_new_session"}`, sent first
+    - **token**: `{"content"}`, one per generated chunk
+    - **done**: `{"message", "title"}`, the saved assistant message (and the generated title of a new session)
+    - **error**: `{"detail"}`
+    
+    Requires authentication token.
+    """
+    session, is_new_session, exchanges = await ChatService.prepare_message(
+        db=db,
+        session_id=request.session_id,
+        user_message=request.message,
+        user_id=current_user.id
+    )
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    
+    async def event_stream():
+        async for event, data in ChatService.stream_message(
+            session, exchanges, request.message, is_new_session
+        ):
+            yield _sse_event(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _ws_event(websocket: WebSocket, event: str, data: Dict[str, Any]) -> None:
+    """Send one chat event as a JSON WebSocket message"""
+    await websocket.send_json({"type": event, **_stream_data(event, data)})
+
+
+async def _ws_frame(websocket: WebSocket, model: Type[Frame], request: Dict[str, Any]) -> Optional[Frame]:
+    """Validate a client message, replying with an error event when it is malformed"""
+    try:
+        return model.model_validate(request)
+    except ValidationError as e:
+        detail = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        )
+        await _ws_event(websocket, "error", {"detail": f"Invalid {request.get('type')} message: {detail}"})
+        return None
+
+
+async def _ws_authenticate(websocket: WebSocket) -> Optional[User]:
+    """Get the active user of the bearer token in the headers or in the first message"""
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        try:
+            message = await websocket.receive_json()
+        except ValueError:
+            return None
+        if not isinstance(message, dict) or message.get("type") != "auth":
+            return None
+        token = message.get("token")
+        if not isinstance(token, str) or not token:
+            return None
+    
+    # A short-lived database session, so an open socket holds no connection
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token_async(db, token)
+    return user if user is not None and user.is_active else None
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Chat with PetikSendiri Assistant over a WebSocket.
+    
+    Authenticate once per connection with an `Authorization: Bearer <token>` header,
+    or by sending `{"type": "auth", "token"}` as the first message; the server then
+    sends `{"type": "ready"}`. Afterwards send:
+    - `{"type": "session", "session_id"}`: continue an existing session (null starts a new one)
+    - `{"type": "message", "message"}`: ask a question in the current session
+    
+    Replies are JSON objects with the `type` and fields of the **POST /send/stream**
+    events (session, token, done, error). The connection keeps the session and its
+    recent history, so a message only costs saving the turn and the LLM call.
+    """
+    await websocket.accept()
+    try:
+        user = await _ws_authenticate(websocket)
+        if user is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+            return
+        
+        connection = ChatConnection(user.id, user.is_superuser)
+        await websocket.send_json({"type": "ready", "user_id": user.id})
+        
+        while True:
+            try:
+                request = await websocket.receive_json()
+            except ValueError:
+                await _ws_event(websocket, "error", {"detail": "Invalid JSON"})
+                continue
+            kind = request.get("type") if isinstance(request, dict) else None
+            
+            if kind == "session":
+                frame = await _ws_frame(websocket, ChatWebSocketSessionFrame, request)
+                if frame is None:
+                    continue
+                session = await connection.open_session(frame.session_id)
+                if frame.session_id is not None and session is None:
+                    await _ws_event(websocket, "error", {"detail": "Chat session not found"})
+                    continue
+                await _ws_event(websocket, "session", {
+                    "session_id": session.session_id if session else None,
+                    "is_new_session": False,
+                    "title": session.title if session else None
+                })
+            elif kind == "message":
+                frame = await _ws_frame(websocket, ChatWebSocketMessageFrame, request)
+                if frame is None:
+                    continue
+                if not frame.message.strip():
+                    await _ws_event(websocket, "error", {"detail": "Message is required"})
+                    continue
+                async for event, data in connection.send_message(frame.message):
+                    await _ws_event(websocket, event, data)
+            else:
+                await _ws_event(websocket, "error", {"detail": "Unknown message type"})
+    except WebSocketDisconnect:
+        pass
+
+
+def _decode_cursor(cursor: Optional[str]):
+    """Decode a pagination cursor, rejecting malformed ones with 400"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("/sessions", response_model=List[ChatSessionSummary], summary="Get User's Chat Sessions")
+async def get_sessions(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """
-    Get all chat sessions for the authenticated user.
+    Get the authenticated user's chat sessions, most recently active first.
     
-    - **skip**: Number of records to skip (pagination)
     - **limit**: Maximum number of records to return
+    - **cursor**: Value of the `X-Next-Cursor` header of the previous page
+    - **skip**: Number of records to skip (deprecated, use `cursor`)
+    
+    Each session includes its message count and a preview of the last message.
+    The `X-Next-Cursor` response header is set when there are more sessions.
     """
-    sessions = ChatService.get_user_sessions(
-        db, current_user.id, skip=skip, limit=limit
+    rows, next_cursor = await ChatService.get_user_sessions(
+        db, current_user.id, limit=limit, cursor=_decode_cursor(cursor), skip=skip
     )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_cursor)
     
     return [
-        ChatSessionResponse(
+        ChatSessionSummary(
             id=session.id,
             session_id=session.session_id,
             user_id=session.user_id,
             title=session.title,
             created_at=session.created_at,
-            updated_at=session.updated_at
-        ) for session in sessions
+            updated_at=session.updated_at,
+            message_count=message_count,
+            last_message_preview=last_message_preview,
+            last_message_at=last_message_at
+        ) for session, message_count, last_message_preview, last_message_at in rows
     ]
 
 
+@router.get("/search", response_model=ChatSearchResponse, summary="Search User's Chat History")
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    """
+    Search the messages of all of the authenticated user's chat sessions.
+    
+    - **q**: Search text; supports "quoted phrases", `or` and `-excluded` words
+    - **limit**: Maximum number of results to return
+    - **cursor**: `next_cursor` of the previous page
+    
+    Results are ranked by relevance, and each has a snippet of the message with
+    matching words wrapped in `<mark>` tags. The rest of the snippet is the raw
+    message text, so escape it before rendering it as HTML.
+    """
+    rank_cursor = None
+    if cursor is not None:
+        try:
+            rank_cursor = decode_rank_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    rows, next_cursor = await ChatService.search_messages(
+        db, current_user.id, q, limit=limit, cursor=rank_cursor
+    )
+    
+    return ChatSearchResponse(
+        results=[
+            ChatSearchResult(
+                message_id=row.id,
+                session_id=row.session_id,
+                session_title=row.session_title,
+                role=row.role,
+                snippet=row.snippet,
+                rank=row.rank,
+                created_at=row.created_at
+            ) for row in rows
+        ],
+        next_cursor=encode_rank_cursor(*next_cursor) if next_cursor is not None else None
+    )
+
+
+@router.delete("/sessions", response_model=ChatSessionsDeleteResponse, summary="Delete All User's Chat Sessions")
+async def delete_sessions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    """
+    Delete all of the authenticated user's chat sessions and their messages.
+    
+    Returns the number of deleted sessions.
+    """
+    deleted_count = await ChatService.delete_user_sessions(db, current_user.id)
+    return ChatSessionsDeleteResponse(deleted_count=deleted_count)
+
+
 @router.get("/sessions/{session_id}", response_model=ChatSessionWithMessages, summary="Get Chat Session with Messages")
-def get_session(
+async def get_session(
     session_id: str,
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get a specific chat session with all its messages.
+    Get a specific chat session with a page of its messages.
     
     - **session_id**: The unique session ID
+    - **limit**: Maximum number of messages to return
+    - **cursor**: `next_cursor` of the previous page, to load older messages
+    
+    The first page holds the newest messages; messages within a page are in
+    chronological order. `next_cursor` is null on the page with the oldest messages.
     """
-    session = ChatService.get_session(db, session_id)
+    session = await ChatService.get_session(db, session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Chat session not found"
         )
     
-    messages = ChatService.get_session_messages(db, session_id)
+    messages, next_cursor = await ChatService.get_session_messages(
+        db, session, limit=limit, cursor=_decode_cursor(cursor)
+    )
     
     return ChatSessionWithMessages(
         id=session.id,
@@ -127,22 +415,23 @@ def get_session(
                 content=msg.content,
                 created_at=msg.created_at
             ) for msg in messages
-        ]
+        ],
+        next_cursor=encode_cursor(*next_cursor) if next_cursor is not None else None
     )
 
 
 @router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete Chat Session")
-def delete_session(
+async def delete_session(
     session_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """
     Delete a chat session and all its messages.
     
     - **session_id**: The unique session ID to delete
     """
-    session = ChatService.get_session(db, session_id)
+    session = await ChatService.get_session(db, session_id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,23 +445,81 @@ def delete_session(
             detail="Not authorized to delete this session"
         )
     
-    ChatService.delete_session(db, session_id)
+    await ChatService.delete_session(db, session_id)
     return None
 
 
+@router.post("/maintenance/retention", response_model=dict, summary="Run Chat Retention")
+def run_chat_retention(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Create upcoming chat message partitions, expire partitions older than the
+    retention period and purge stale anonymous sessions (and, with
+    CHAT_PURGE_INACTIVE_SESSIONS, registered users' inactive sessions).
+    
+    This is normally run on a schedule with
+    `python -m app.services.chat_retention_service`.
+    
+    Note: Only superusers can run retention.
+    """
+    return ChatRetentionService.run(db)
+
+
 # ==================== Knowledge Base Endpoints ====================
 
-@router.post("/knowledge-base/process", response_model=dict, summary="Process Knowledge Base Documents")
+def _job_response(job: KnowledgeBaseJob) -> KnowledgeBaseJobResponse:
+    """Build a job response with overall progress percentage"""
+    total_files = job.total_files or 0
+    done_files = (job.processed_files or 0) + (job.failed_files or 0)
+    if job.status == "completed":
+        progress = 100.0
+    else:
+        progress = round(done_files / total_files * 100, 1) if total_files else 0.0
+    
+    return KnowledgeBaseJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        force_reprocess=job.force_reprocess,
+        parallel=job.parallel,
+        total_files=total_files,
+        processed_files=job.processed_files or 0,
+        failed_files=job.failed_files or 0,
+        skipped_files=job.skipped_files or 0,
+        embedded_chunks=job.embedded_chunks or 0,
+        progress=progress,
+        result=job.result,
+        error_message=job.error_message,
+        started_at=job.started_at,
+        heartbeat_at=job.heartbeat_at,
+        checkpoint_at=job.checkpoint_at,
+        finished_at=job.finished_at,
+        created_at=job.created_at
+    )
+
+
+@router.post(
+    "/knowledge-base/process",
+    response_model=KnowledgeBaseJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Process Knowledge Base Documents"
+)
 def process_knowledge_base(
     request: DocumentProcessRequest = DocumentProcessRequest(),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Process all PDF/DOCX/TXT documents in the knowledge base folder
-    and create/update the vector store.
+    Start a background job that processes all PDF/DOCX/TXT documents in the
+    knowledge base folder and creates/updates the vector store.
+    
+    Only added or changed files (by content hash) are re-embedded, and vectors
+    of removed files are deleted from the vector store. The job checkpoints its
+    progress periodically; poll **GET /knowledge-base/jobs/{job_id}** for status.
     
-    - **force_reprocess**: If True, reprocess all documents even if already processed
+    - **force_reprocess**: If True, rebuild the vector store from all documents
+    - **parallel**: If True, parse and chunk files in a process pool and embed in concurrent batches
     
     Note: Only superusers can trigger document processing.
     """
@@ -182,8 +529,97 @@ def process_knowledge_base(
             detail="Only superusers can process knowledge base"
         )
     
-    result = rag_service.process_documents(db, request.force_reprocess)
-    return result
+    job = KnowledgeBaseJobService.create_job(
+        db,
+        force_reprocess=request.force_reprocess,
+        parallel=request.parallel,
+        user_id=current_user.id
+    )
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another knowledge base job is already running"
+        )
+    
+    KnowledgeBaseJobService.start_job(job.job_id)
+    return _job_response(job)
+
+
+@router.get("/knowledge-base/jobs/{job_id}", response_model=KnowledgeBaseJobResponse, summary="Get Knowledge Base Job Status")
+def get_knowledge_base_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the status and progress of a knowledge base processing job.
+    
+    - **job_id**: The job ID returned when processing was started
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers can view knowledge base jobs"
+        )
+    
+    job = KnowledgeBaseJobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Knowledge base job not found"
+        )
+    
+    return _job_response(job)
+
+
+@router.post(
+    "/knowledge-base/jobs/{job_id}/resume",
+    response_model=KnowledgeBaseJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Resume Knowledge Base Job"
+)
+def resume_knowledge_base_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Resume a failed or interrupted knowledge base job from its last checkpoint.
+    
+    A running job counts as interrupted once it has not reported progress
+    for RAG_JOB_STALE_SECONDS (e.g. after a worker restart). A job cannot be
+    resumed while a different job is running.
+    
+    - **job_id**: The job ID to resume
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers can process knowledge base"
+        )
+    
+    job = KnowledgeBaseJobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Knowledge base job not found"
+        )
+    
+    if not KnowledgeBaseJobService.is_resumable(job):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Knowledge base job is {job.status} and cannot be resumed"
+        )
+    
+    active_job = KnowledgeBaseJobService.get_active_job(db, exclude_job_id=job.job_id)
+    if active_job:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Knowledge base job {active_job.job_id} is already running"
+        )
+    
+    KnowledgeBaseJobService.start_job(job.job_id, resume=True)
+    return _job_response(job)
 
 
 @router.get("/knowledge-base/stats", response_model=KnowledgeBaseStats, summary="Get Knowledge Base Statistics")
@@ -201,6 +637,39 @@ def get_knowledge_base_stats(
     return KnowledgeBaseStats(**stats)
 
 
+@router.get("/knowledge-base/cache-stats", response_model=dict, summary="Get Retrieval Cache Statistics")
+def get_cache_stats():
+    """
+    Get size and hit/miss counters of the retrieval and response caches in this worker, including generation time saved by response cache hits.
+    """
+    return rag_service.get_cache_stats()
+
+
+@router.get("/knowledge-base/index-report", response_model=dict, summary="Compare Vector Index Types")
+def get_index_report(
+    k: int = Query(4, ge=1, le=50),
+    sample_size: int = Query(200, ge=1, le=5000),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Build HNSW and IVF-PQ indexes over the current knowledge base and report
+    their recall@k and search latency against the exact flat index.
+    
+    - **k**: Number of neighbours compared per query
+    - **sample_size**: Number of stored chunks used as queries, at most a tenth of the
+      chunks; they are left out of the compared indexes
+    
+    Note: Only superusers can run the report.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only superusers can run the index report"
+        )
+    
+    return rag_service.get_index_report(k=k, sample_size=sample_size)
+
+
 @router.get("/knowledge-base/documents", response_model=List[ProcessedDocumentResponse], summary="List Processed Documents")
 def list_processed_documents(
     db: Session = Depends(get_db)
@@ -218,6 +687,7 @@ def list_processed_documents(
             filename=doc.filename,
             file_path=doc.file_path,
             file_type=doc.file_type,
+            content_hash=doc.content_hash,
             chunk_count=doc.chunk_count,
             status=doc.status,
             error_message=doc.error_message,
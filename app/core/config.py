@@ -28,6 +28,50 @@ class Settings(BaseSettings):
     # RAG Configuration
     KNOWLEDGE_BASE_PATH: str = "knowledge_base"
     VECTOR_STORE_PATH: str = "vector_store"
+    VECTOR_STORE_REFRESH_SECONDS: int = 5
+    VECTOR_STORE_KEEP_VERSIONS: int = 3
+    VECTOR_STORE_MMAP: bool = True
+    VECTOR_INDEX_TYPE: str = "flat"  # flat, hnsw, ivfpq
+    VECTOR_HNSW_M: int = 32
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 200
+    VECTOR_HNSW_EF_SEARCH: int = 64
+    VECTOR_IVF_NLIST: int = 0  # 0 = 4 * sqrt(number of vectors)
+    VECTOR_IVF_NPROBE: int = 16
+    VECTOR_PQ_M: int = 64
+    VECTOR_PQ_NBITS: int = 8
+    RAG_RETRIEVAL_MODE: str = "hybrid"  # vector, hybrid, lexical
+    RAG_RRF_K: int = 60
+    RAG_EMBEDDING_TIMEOUT_SECONDS: float = 2.0
+    RAG_RETRIEVAL_K: int = 4
+    RAG_MIN_SIMILARITY: float = 0.75  # cosine similarity; unrelated text scores ~0.7 with ada-002
+    RAG_MIN_BM25_SCORE: float = 1.0
+    RAG_PROMPT_TOKEN_BUDGET: int = 3000  # system prompt, context, history and question
+    RAG_CONTEXT_TOKEN_BUDGET: int = 1500
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 0  # 0 = entries never expire
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 1000
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.98  # Hits also need the same key terms
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400  # 0 = entries never expire
+    CHAT_TITLE_LLM_REFINEMENT: bool = False
+    CHAT_SUMMARY_RECENT_EXCHANGES: int = 1  # Raw exchanges kept next to the summary
+    CHAT_SUMMARY_EVERY_EXCHANGES: int = 2
+    CHAT_HISTORY_WINDOW_MESSAGES: int = 12  # Keep above 2 * (RECENT + EVERY exchanges) + 1
+    CHAT_MESSAGE_RETENTION_MONTHS: int = 12  # 0 = keep every partition
+    CHAT_MESSAGE_PARTITIONS_AHEAD: int = 3
+    CHAT_ARCHIVE_EXPIRED_PARTITIONS: bool = False  # Detach expired partitions instead of dropping them
+    CHAT_ANONYMOUS_SESSION_TTL_DAYS: int = 30  # 0 = keep anonymous sessions
+    CHAT_PURGE_INACTIVE_SESSIONS: bool = False  # Also delete users' sessions inactive since the retention cutoff
+    RAG_INTENT_FAST_PATH: bool = True
+    RAG_INGEST_WORKERS: int = 4
+    RAG_EMBEDDING_BATCH_SIZE: int = 64
+    RAG_EMBEDDING_CONCURRENCY: int = 4
+    RAG_INDEX_BATCH_SIZE: int = 256
+    RAG_CHECKPOINT_INTERVAL_BATCHES: int = 10
+    RAG_CHECKPOINT_MIN_GROWTH: float = 0.5  # New vectors since the last checkpoint, as a fraction of it
+    RAG_JOB_STALE_SECONDS: int = 300
+    EMBEDDING_CACHE_PATH: str = "embedding_cache"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
     
     # Gemini AI Configuration
     GEMINI_API_KEY: str = ""
@@ -39,6 +83,10 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
     
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,46 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+
+def _encode(payload: Dict[str, Any]) -> str:
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> Dict[str, Any]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    if not isinstance(payload, dict):
+        raise TypeError("Cursor payload is not an object")
+    return payload
+
+
+def encode_cursor(sort_value: datetime, id: int) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor."""
+    return _encode({"t": sort_value.isoformat(), "id": id})
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor made by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        payload = _decode(cursor)
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except (binascii.Error, UnicodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_rank_cursor(rank: float, id: int) -> str:
+    """Encode a keyset position in results ordered by a relevance score."""
+    return _encode({"r": rank, "id": id})
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor made by encode_rank_cursor. Raises ValueError if it is malformed."""
+    try:
+        payload = _decode(cursor)
+        return float(payload["r"]), int(payload["id"])
+    except (binascii.Error, UnicodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -1,8 +1,13 @@
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.services.chat_retention_service import ensure_message_partitions
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -37,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API router
@@ -46,6 +52,20 @@ app.include_router(api_router, prefix="/api/v1")
 app.mount("/", StaticFiles(directory="public"), name="public")
 
 
+@app.on_event("startup")
+def create_chat_message_partitions():
+    """
+    Make sure the chat_messages partitions of the coming months exist, in case the
+    retention job is not scheduled.
+    """
+    try:
+        created = ensure_message_partitions()
+        if created:
+            logger.info(f"Created chat message partitions: {', '.join(created)}")
+    except Exception as e:
+        logger.error(f"Error creating chat message partitions: {e}")
+
+
 @app.get("/", tags=["Root"])
 def root():
     """
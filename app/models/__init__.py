@@ -1,7 +1,7 @@
 from app.models.user import User
-from app.models.chat import ChatSession, ChatMessage, ProcessedDocument, MessageRole
+from app.models.chat import ChatSession, ChatMessage, ProcessedDocument, KnowledgeBaseJob, MessageRole
 from app.models.garden_design import GardenDesign
 from app.models.plant import Plant
 from app.models.vendor import Vendor
 
-__all__ = ["User", "ChatSession", "ChatMessage", "ProcessedDocument", "MessageRole", "GardenDesign", "Plant", "Vendor"]
+__all__ = ["User", "ChatSession", "ChatMessage", "ProcessedDocument", "KnowledgeBaseJob", "MessageRole", "GardenDesign", "Plant", "Vendor"]
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean, Index
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from app.db.base import Base
 import enum
 
 
+# Text search configuration of chat message content (Indonesian stemming and stopwords)
+SEARCH_CONFIG = "indonesian"
+
+
 class MessageRole(str, enum.Enum):
     USER = "user"
     ASSISTANT = "assistant"
@@ -18,11 +23,29 @@ class ChatSession(Base):
     session_id = Column(String(100), unique=True, index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     title = Column(String(255), nullable=True, default="New Chat")
+    summary = Column(Text, nullable=True)
+    summary_message_id = Column(Integer, nullable=True)  # Last message folded into summary
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # Keyset pagination of a user's sessions by last activity
+        Index(
+            "ix_chat_sessions_user_id_activity",
+            user_id,
+            func.coalesce(updated_at, created_at).desc(),
+            id.desc()
+        ),
+    )
+    
     # Relationships
-    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    # Messages are removed by the ON DELETE CASCADE foreign key, without loading them
+    messages = relationship(
+        "ChatMessage",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
     user = relationship("User", backref="chat_sessions")
     
     def __repr__(self):
@@ -31,12 +54,24 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),
+        Index("ix_chat_messages_content_tsv", "content_tsv", postgresql_using="gin"),
+        # Monthly partitions, created and expired by ChatRetentionService
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     role = Column(Enum(MessageRole), nullable=False)
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    # Maintained by the database; only loaded when a query asks for it
+    content_tsv = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', content)", persisted=True)
+    ))
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
@@ -52,6 +87,7 @@ class ProcessedDocument(Base):
     filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     file_type = Column(String(50), nullable=False)
+    content_hash = Column(String(64), nullable=True)
     chunk_count = Column(Integer, default=0)
     status = Column(String(50), default="pending")  # pending, processing, completed, failed
     error_message = Column(Text, nullable=True)
@@ -60,3 +96,29 @@ class ProcessedDocument(Base):
     
     def __repr__(self):
         return f"<ProcessedDocument(id={self.id}, filename={self.filename}, status={self.status})>"
+
+
+class KnowledgeBaseJob(Base):
+    __tablename__ = "knowledge_base_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(100), unique=True, index=True, nullable=False)
+    status = Column(String(50), default="pending")  # pending, running, completed, failed
+    force_reprocess = Column(Boolean, default=False)
+    parallel = Column(Boolean, default=False)
+    total_files = Column(Integer, default=0)
+    processed_files = Column(Integer, default=0)
+    failed_files = Column(Integer, default=0)
+    skipped_files = Column(Integer, default=0)
+    embedded_chunks = Column(Integer, default=0)
+    result = Column(JSONB, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    checkpoint_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<KnowledgeBaseJob(id={self.id}, job_id={self.job_id}, status={self.status})>"
@@ -48,8 +48,34 @@ class ChatSessionResponse(ChatSessionBase):
         from_attributes = True
 
 
+class ChatSessionSummary(ChatSessionResponse):
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+
+
 class ChatSessionWithMessages(ChatSessionResponse):
     messages: List[ChatMessageResponse] = []
+    next_cursor: Optional[str] = None
+
+
+class ChatSessionsDeleteResponse(BaseModel):
+    deleted_count: int
+
+
+class ChatSearchResult(BaseModel):
+    message_id: int
+    session_id: str
+    session_title: Optional[str] = None
+    role: MessageRole
+    snippet: str
+    rank: float
+    created_at: datetime
+
+
+class ChatSearchResponse(BaseModel):
+    results: List[ChatSearchResult] = []
+    next_cursor: Optional[str] = None
 
 
 # Chat Request/Response
@@ -58,6 +84,15 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+# WebSocket Chat Schemas
+class ChatWebSocketSessionFrame(BaseModel):
+    session_id: Optional[str] = None
+
+
+class ChatWebSocketMessageFrame(BaseModel):
+    message: str
+
+
 class ChatResponse(BaseModel):
     session_id: str
     message: ChatMessageResponse
@@ -67,6 +102,7 @@ class ChatResponse(BaseModel):
 # Document Processing Schemas
 class DocumentProcessRequest(BaseModel):
     force_reprocess: bool = False
+    parallel: bool = False
 
 
 class ProcessedDocumentResponse(BaseModel):
@@ -74,6 +110,7 @@ class ProcessedDocumentResponse(BaseModel):
     filename: str
     file_path: str
     file_type: str
+    content_hash: Optional[str] = None
     chunk_count: int
     status: str
     error_message: Optional[str] = None
@@ -96,4 +133,25 @@ class KnowledgeBaseStats(BaseModel):
     total_documents: int
     total_chunks: int
     vector_store_exists: bool
+    vector_store_version: Optional[str] = None
     last_updated: Optional[datetime] = None
+
+
+class KnowledgeBaseJobResponse(BaseModel):
+    job_id: str
+    status: str
+    force_reprocess: bool
+    parallel: bool
+    total_files: int
+    processed_files: int
+    failed_files: int
+    skipped_files: int
+    embedded_chunks: int
+    progress: float
+    result: Optional[dict] = None
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    checkpoint_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
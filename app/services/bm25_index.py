@@ -0,0 +1,154 @@
+"""
+BM25 lexical index for the PetikSendiri knowledge base
+Catches exact plant and product names that embeddings miss, and answers without any network call
+"""
+import re
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+from pathlib import Path
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Common Indonesian function words that carry no retrieval signal
+STOPWORDS = frozenset("""
+    yang dan di ke dari untuk dengan pada adalah ini itu atau juga dalam tidak akan
+    bisa dapat ada saya aku kamu anda kami kita mereka dia ia apa apakah bagaimana
+    kenapa mengapa sudah telah masih agar supaya jika kalau karena oleh sebagai
+    seperti saat setelah sebelum hanya lebih sangat tersebut nya lah kah pun
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over knowledge base chunks
+
+    Postings are stored as flat row/term-frequency arrays with a term -> (start, end)
+    vocabulary, saved next to the FAISS index of the same vector store version.
+    """
+
+    VOCAB_FILE = "bm25_vocab.json"
+    DOC_IDS_FILE = "bm25_doc_ids.json"
+    DOC_LENGTHS_FILE = "bm25_doc_lengths.npy"
+    POSTING_ROWS_FILE = "bm25_posting_rows.npy"
+    POSTING_TF_FILE = "bm25_posting_tf.npy"
+
+    def __init__(
+        self,
+        vocab: Dict[str, Tuple[int, int]],
+        doc_ids: List[str],
+        doc_lengths: np.ndarray,
+        posting_rows: np.ndarray,
+        posting_tf: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.vocab = vocab
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.posting_rows = posting_rows
+        self.posting_tf = posting_tf
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, doc_ids: List[str], texts: Iterable[str]) -> "BM25Index":
+        """Build an index; texts must be in the same order as doc_ids"""
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((row, tf))
+
+        vocab: Dict[str, Tuple[int, int]] = {}
+        posting_rows: List[int] = []
+        posting_tf: List[int] = []
+        for term in sorted(postings):
+            start = len(posting_rows)
+            for row, tf in postings[term]:
+                posting_rows.append(row)
+                posting_tf.append(tf)
+            vocab[term] = (start, len(posting_rows))
+
+        return cls(
+            vocab,
+            list(doc_ids),
+            np.array(doc_lengths, dtype=np.int32),
+            np.array(posting_rows, dtype=np.int32),
+            np.array(posting_tf, dtype=np.int32)
+        )
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / self.DOC_LENGTHS_FILE, self.doc_lengths)
+        np.save(path / self.POSTING_ROWS_FILE, self.posting_rows)
+        np.save(path / self.POSTING_TF_FILE, self.posting_tf)
+        with open(path / self.DOC_IDS_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.doc_ids, f)
+        # Written last: its presence marks a complete save
+        with open(path / self.VOCAB_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return (Path(path) / cls.VOCAB_FILE).exists()
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        """Load a saved index, memory-mapping the posting arrays"""
+        path = Path(path)
+        with open(path / cls.VOCAB_FILE, encoding="utf-8") as f:
+            vocab = {term: tuple(span) for term, span in json.load(f).items()}
+        with open(path / cls.DOC_IDS_FILE, encoding="utf-8") as f:
+            doc_ids = json.load(f)
+        return cls(
+            vocab,
+            doc_ids,
+            np.load(path / cls.DOC_LENGTHS_FILE),
+            np.load(path / cls.POSTING_ROWS_FILE, mmap_mode="r"),
+            np.load(path / cls.POSTING_TF_FILE, mmap_mode="r")
+        )
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Get the top k (doc_id, score) pairs for a query"""
+        doc_count = len(self.doc_ids)
+        if doc_count == 0:
+            return []
+
+        scores = np.zeros(doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            span = self.vocab.get(term)
+            if span is None:
+                continue
+            start, end = span
+            rows = np.asarray(self.posting_rows[start:end])
+            tf = np.asarray(self.posting_tf[start:end], dtype=np.float32)
+            df = end - start
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            length_norm = 1 - self.b + self.b * self.doc_lengths[rows] / self.avg_doc_length
+            # Each row appears once per term, so plain fancy-index addition is safe
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        k = min(k, doc_count)
+        top_rows = np.argpartition(-scores, k - 1)[:k]
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+        return [(self.doc_ids[row], float(scores[row])) for row in top_rows if scores[row] > 0]
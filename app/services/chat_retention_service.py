@@ -0,0 +1,287 @@
+"""
+Chat Retention Service for PetikSendiri Assistant
+Maintains the monthly partitions of chat_messages and purges stale chat sessions
+
+Run periodically (e.g. daily from cron) with: python -m app.services.chat_retention_service
+"""
+import re
+import logging
+from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.chat import ChatSession
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "chat_messages_p"
+# Catches messages of months without a partition, so inserts never fail
+DEFAULT_PARTITION = "chat_messages_default"
+MESSAGE_COLUMNS = "id, session_id, role, content, created_at"
+PARTITION_NAME_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+# Fail instead of queueing chat traffic behind a partition lock
+LOCK_TIMEOUT = "5s"
+
+
+class ChatRetentionService:
+    """Service for chat message partitions and chat data retention"""
+    
+    @staticmethod
+    def _current_month() -> date:
+        return datetime.now(timezone.utc).date().replace(day=1)
+    
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+    
+    @staticmethod
+    def _month_start(month: date) -> datetime:
+        return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    
+    @staticmethod
+    def partition_name(month: date) -> str:
+        """Get the name of the partition holding the messages of a month"""
+        return f"{PARTITION_PREFIX}{month.year:04d}{month.month:02d}"
+    
+    @staticmethod
+    def list_partitions(db: Session) -> List[Tuple[str, date]]:
+        """Get the attached monthly partitions of chat_messages, oldest first"""
+        rows = db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = 'chat_messages'::regclass
+        """)).scalars()
+        
+        partitions = []
+        for name in rows:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+        partitions.sort(key=lambda partition: partition[1])
+        return partitions
+    
+    @staticmethod
+    def _create_partition(db: Session, name: str, lower: datetime, upper: datetime) -> None:
+        """
+        Create a monthly partition, moving rows of its month out of the default partition
+        
+        PostgreSQL refuses to attach a range that has rows in the default partition, so they
+        are taken out first and inserted again once the partition exists.
+        """
+        bounds = {"lower": lower, "upper": upper}
+        moved = db.execute(text(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM {DEFAULT_PARTITION}
+                WHERE created_at >= :lower AND created_at < :upper
+            )
+        """), bounds).scalar()
+        if moved:
+            db.execute(text(f"""
+                CREATE TEMPORARY TABLE chat_messages_moved ON COMMIT DROP AS
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= :lower AND created_at < :upper
+                    RETURNING {MESSAGE_COLUMNS}
+                )
+                SELECT * FROM moved
+            """), bounds)
+        
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF chat_messages "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        
+        if moved:
+            db.execute(text(
+                f"INSERT INTO chat_messages ({MESSAGE_COLUMNS}) "
+                f"SELECT {MESSAGE_COLUMNS} FROM chat_messages_moved"
+            ))
+            db.execute(text("DROP TABLE chat_messages_moved"))
+            logger.warning(f"Moved messages from {DEFAULT_PARTITION} into new partition {name}")
+    
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: int) -> List[str]:
+        """Create the partitions of the current month and the next months_ahead months"""
+        existing = {name for name, _ in ChatRetentionService.list_partitions(db)}
+        current = ChatRetentionService._current_month()
+        
+        created = []
+        for offset in range(months_ahead + 1):
+            month = ChatRetentionService._add_months(current, offset)
+            name = ChatRetentionService.partition_name(month)
+            if name in existing:
+                continue
+            lower = ChatRetentionService._month_start(month)
+            upper = ChatRetentionService._month_start(ChatRetentionService._add_months(month, 1))
+            ChatRetentionService._create_partition(db, name, lower, upper)
+            created.append(name)
+        return created
+    
+    @staticmethod
+    def retention_cutoff(retention_months: int) -> Optional[datetime]:
+        """Get the start of the oldest month that is kept, or None when everything is kept"""
+        if retention_months <= 0:
+            return None
+        month = ChatRetentionService._add_months(ChatRetentionService._current_month(), -retention_months)
+        return ChatRetentionService._month_start(month)
+    
+    @staticmethod
+    def _partition_default_rows(db: Session, before: datetime) -> List[str]:
+        """Move rows older than before out of the default partition into monthly partitions"""
+        months = db.execute(text(f"""
+            SELECT DISTINCT CAST(date_trunc('month', created_at AT TIME ZONE 'UTC') AS date)
+            FROM {DEFAULT_PARTITION}
+            WHERE created_at < :before
+        """), {"before": before}).scalars().all()
+        
+        created = []
+        for month in sorted(months):
+            name = ChatRetentionService.partition_name(month)
+            lower = ChatRetentionService._month_start(month)
+            upper = ChatRetentionService._month_start(ChatRetentionService._add_months(month, 1))
+            ChatRetentionService._create_partition(db, name, lower, upper)
+            created.append(name)
+        return created
+    
+    @staticmethod
+    def expire_partitions(db: Session, cutoff: datetime, archive: bool = False) -> List[str]:
+        """
+        Remove the partitions whose month ends before the cutoff
+        
+        Dropping a partition discards its messages without scanning or vacuuming them. When
+        archiving, the partition is only detached and stays in the database as a plain table
+        that can be dumped and dropped separately. Its foreign keys are dropped as well, so
+        purging the sessions afterwards does not cascade into the archive. Expired rows in
+        the default partition are first moved into partitions of their months, so they are
+        removed or archived the same way.
+        """
+        ChatRetentionService._partition_default_rows(db, cutoff)
+        
+        expired = []
+        for name, month in ChatRetentionService.list_partitions(db):
+            if ChatRetentionService._month_start(ChatRetentionService._add_months(month, 1)) > cutoff:
+                break
+            db.execute(text(f"ALTER TABLE chat_messages DETACH PARTITION {name}"))
+            if archive:
+                ChatRetentionService._drop_foreign_keys(db, name)
+            else:
+                db.execute(text(f"DROP TABLE {name}"))
+            expired.append(name)
+        return expired
+    
+    @staticmethod
+    def _drop_foreign_keys(db: Session, table: str) -> None:
+        """Drop the foreign keys a detached partition kept from chat_messages"""
+        constraints = db.execute(
+            text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'"),
+            {"table": table}
+        ).scalars().all()
+        for constraint in constraints:
+            db.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"'))
+    
+    @staticmethod
+    def purge_sessions(
+        db: Session,
+        anonymous_before: Optional[datetime],
+        inactive_before: Optional[datetime]
+    ) -> int:
+        """
+        Delete stale chat sessions in one statement and get how many were deleted
+        
+        Anonymous sessions go when inactive since anonymous_before, any session, including
+        registered users' sessions, when inactive since inactive_before. Remaining messages
+        are deleted by the database cascade.
+        """
+        conditions = []
+        activity = func.coalesce(ChatSession.updated_at, ChatSession.created_at)
+        if anonymous_before is not None:
+            conditions.append((ChatSession.user_id.is_(None)) & (activity < anonymous_before))
+        if inactive_before is not None:
+            conditions.append(activity < inactive_before)
+        if not conditions:
+            return 0
+        
+        result = db.execute(
+            delete(ChatSession)
+            .where(or_(*conditions))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+    
+    @staticmethod
+    def run(db: Session) -> dict:
+        """
+        Run retention once with the configured settings
+        
+        Expired partitions are removed before sessions are purged, so the cascade does not
+        delete their messages row by row. Registered users' sessions are only purged with
+        CHAT_PURGE_INACTIVE_SESSIONS; otherwise they stay, without their expired messages.
+        """
+        cutoff = ChatRetentionService.retention_cutoff(settings.CHAT_MESSAGE_RETENTION_MONTHS)
+        inactive_before = cutoff if settings.CHAT_PURGE_INACTIVE_SESSIONS else None
+        anonymous_before = None
+        if settings.CHAT_ANONYMOUS_SESSION_TTL_DAYS > 0:
+            anonymous_before = datetime.now(timezone.utc) - timedelta(
+                days=settings.CHAT_ANONYMOUS_SESSION_TTL_DAYS
+            )
+        
+        try:
+            db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            created = ChatRetentionService.ensure_partitions(db, settings.CHAT_MESSAGE_PARTITIONS_AHEAD)
+            expired = []
+            if cutoff is not None:
+                expired = ChatRetentionService.expire_partitions(
+                    db, cutoff, archive=settings.CHAT_ARCHIVE_EXPIRED_PARTITIONS
+                )
+            db.commit()
+            
+            purged_sessions = ChatRetentionService.purge_sessions(db, anonymous_before, inactive_before)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        result = {
+            "created_partitions": created,
+            "expired_partitions": expired,
+            "archived": settings.CHAT_ARCHIVE_EXPIRED_PARTITIONS,
+            "purged_sessions": purged_sessions,
+            "retention_cutoff": cutoff.isoformat() if cutoff else None
+        }
+        logger.info("Chat retention finished: %s", result)
+        return result
+
+
+def ensure_message_partitions() -> List[str]:
+    """Create the upcoming monthly partitions in their own database session"""
+    db = SessionLocal()
+    try:
+        created = ChatRetentionService.ensure_partitions(db, settings.CHAT_MESSAGE_PARTITIONS_AHEAD)
+        db.commit()
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_retention() -> dict:
+    """Run chat retention in its own database session"""
+    db = SessionLocal()
+    try:
+        return ChatRetentionService.run(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(run_retention())
@@ -3,197 +3,689 @@ Chat Service for PetikSendiri Assistant
 Handles chat sessions and message management
 """
 import uuid
-from typing import Optional, List, Tuple
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, List, Set, Tuple
 from datetime import datetime
 
-from sqlalchemy.orm import Session
-from app.models.chat import ChatSession, ChatMessage, MessageRole
+from sqlalchemy import cast, delete, func, insert, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.models.chat import ChatSession, ChatMessage, MessageRole, SEARCH_CONFIG
 from app.services.rag_service import rag_service, RAGService
+from app.services.title_generator import extract_title
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREVIEW_LENGTH = 120
+SEARCH_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# Keeps background title and summary updates referenced until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
 
 class ChatService:
-    """Service for chat operations"""
+    """Service for chat operations, using async sessions so requests never block a thread"""
     
     @staticmethod
-    def create_session(db: Session, user_id: Optional[int] = None) -> ChatSession:
-        """Create a new chat session with welcome message"""
-        session_id = str(uuid.uuid4())
-        
-        chat_session = ChatSession(
-            session_id=session_id,
-            user_id=user_id,
-            title="New Chat"
+    async def _insert_session(
+        db: AsyncSession,
+        user_id: Optional[int],
+        title: str
+    ) -> ChatSession:
+        """Insert a session without committing, reading generated columns back with RETURNING"""
+        return await db.scalar(
+            insert(ChatSession)
+            .values(
+                session_id=str(uuid.uuid4()),
+                user_id=user_id,
+                title=title,
+                updated_at=func.now()
+            )
+            .returning(ChatSession)
         )
-        db.add(chat_session)
-        db.commit()
-        db.refresh(chat_session)
-        
-        # Add welcome message
-        welcome_message = ChatMessage(
-            session_id=chat_session.id,
-            role=MessageRole.ASSISTANT,
-            content=RAGService.FIRST_MESSAGE
+    
+    @staticmethod
+    async def _insert_messages(
+        db: AsyncSession,
+        session_pk: int,
+        messages: List[Tuple[MessageRole, str]]
+    ) -> List[ChatMessage]:
+        """Insert (role, content) messages in one statement without committing"""
+        result = await db.scalars(
+            insert(ChatMessage).returning(ChatMessage, sort_by_parameter_order=True),
+            [
+                {"session_id": session_pk, "role": role, "content": content}
+                for role, content in messages
+            ]
         )
-        db.add(welcome_message)
-        db.commit()
+        return list(result.all())
+    
+    @staticmethod
+    async def _touch_session(db: AsyncSession, session_pk: int, **values) -> bool:
+        """Bump updated_at (and set values) without committing; False if the session is gone"""
+        result = await db.execute(
+            update(ChatSession)
+            .where(ChatSession.id == session_pk)
+            .values(updated_at=func.now(), **values)
+            .returning(ChatSession.id)
+        )
+        return result.first() is not None
+    
+    @staticmethod
+    async def create_session(
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        title: str = "New Chat"
+    ) -> ChatSession:
+        """Create a new chat session with welcome message"""
+        chat_session = await ChatService._insert_session(db, user_id, title)
+        await ChatService._insert_messages(
+            db, chat_session.id, [(MessageRole.ASSISTANT, RAGService.FIRST_MESSAGE)]
+        )
+        await db.commit()
         
         return chat_session
     
     @staticmethod
-    def get_session(db: Session, session_id: str) -> Optional[ChatSession]:
+    async def get_session(db: AsyncSession, session_id: str) -> Optional[ChatSession]:
         """Get a chat session by session_id"""
-        return db.query(ChatSession).filter(
-            ChatSession.session_id == session_id
-        ).first()
+        result = await db.execute(
+            select(ChatSession).where(ChatSession.session_id == session_id)
+        )
+        return result.scalars().first()
     
     @staticmethod
-    def get_session_by_id(db: Session, id: int) -> Optional[ChatSession]:
+    async def get_session_by_id(db: AsyncSession, id: int) -> Optional[ChatSession]:
         """Get a chat session by id"""
-        return db.query(ChatSession).filter(ChatSession.id == id).first()
+        result = await db.execute(select(ChatSession).where(ChatSession.id == id))
+        return result.scalars().first()
     
     @staticmethod
-    def get_user_sessions(
-        db: Session,
+    def _session_activity():
+        """Sort key of the session list; sessions that never got a message fall back to created_at"""
+        return func.coalesce(ChatSession.updated_at, ChatSession.created_at)
+    
+    @staticmethod
+    async def get_user_sessions(
+        db: AsyncSession,
         user_id: int,
-        skip: int = 0,
-        limit: int = 20
-    ) -> List[ChatSession]:
-        """Get all chat sessions for a user"""
-        return db.query(ChatSession).filter(
-            ChatSession.user_id == user_id
-        ).order_by(ChatSession.updated_at.desc()).offset(skip).limit(limit).all()
-    
-    @staticmethod
-    def get_session_messages(
-        db: Session,
-        session_id: str
-    ) -> List[ChatMessage]:
-        """Get all messages for a session"""
-        session = ChatService.get_session(db, session_id)
-        if not session:
-            return []
+        limit: int = 20,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        skip: int = 0
+    ) -> Tuple[List[Tuple[ChatSession, int, Optional[str], Optional[datetime]]], Optional[Tuple[datetime, int]]]:
+        """
+        Get a page of a user's chat sessions, most recently active first
+        
+        Pages are keyed on (activity, id) after cursor. Each row carries the message count
+        and a preview of the last message, computed in the same query.
+        Returns: ([(session, message_count, last_message_preview, last_message_at)], next_cursor)
+        """
+        activity = ChatService._session_activity()
+        message_count = (
+            select(func.count(ChatMessage.id))
+            .where(ChatMessage.session_id == ChatSession.id)
+            .correlate(ChatSession)
+            .scalar_subquery()
+        )
+        last_message = (
+            select(
+                func.left(ChatMessage.content, SESSION_PREVIEW_LENGTH).label("preview"),
+                ChatMessage.created_at.label("last_message_at")
+            )
+            .where(ChatMessage.session_id == ChatSession.id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(1)
+            .correlate(ChatSession)
+            .lateral("last_message")
+        )
+        
+        query = (
+            select(
+                ChatSession,
+                activity.label("activity"),
+                message_count.label("message_count"),
+                last_message.c.preview,
+                last_message.c.last_message_at
+            )
+            .outerjoin(last_message, true())
+            .where(ChatSession.user_id == user_id)
+        )
+        if cursor is not None:
+            query = query.where(tuple_(activity, ChatSession.id) < tuple_(*cursor))
+        elif skip:
+            query = query.offset(skip)
+        
+        result = await db.execute(
+            query.order_by(activity.desc(), ChatSession.id.desc()).limit(limit + 1)
+        )
+        rows = result.all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].activity, rows[-1].ChatSession.id)
+        
+        return [
+            (row.ChatSession, row.message_count, row.preview, row.last_message_at)
+            for row in rows
+        ], next_cursor
+    
+    @staticmethod
+    async def get_session_messages(
+        db: AsyncSession,
+        session: ChatSession,
+        limit: int = 50,
+        cursor: Optional[Tuple[datetime, int]] = None
+    ) -> Tuple[List[ChatMessage], Optional[Tuple[datetime, int]]]:
+        """
+        Get a page of a session's messages, walking back from the newest
+        
+        The page holds the newest limit messages before cursor on (created_at, id), in
+        chronological order; next_cursor points at older messages.
+        Returns: (messages, next_cursor)
+        """
+        query = select(ChatMessage).where(ChatMessage.session_id == session.id)
+        if cursor is not None:
+            query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(*cursor))
+        
+        result = await db.execute(
+            query
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(limit + 1)
+        )
+        messages = list(result.scalars())
+        
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = (messages[-1].created_at, messages[-1].id)
         
-        return db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at.asc()).all()
+        messages.reverse()
+        return messages, next_cursor
     
     @staticmethod
-    def get_chat_history(db: Session, session_id: str) -> List[Tuple[str, str]]:
-        """Get chat history as list of (human, ai) tuples for RAG context"""
-        messages = ChatService.get_session_messages(db, session_id)
+    async def search_messages(
+        db: AsyncSession,
+        user_id: int,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[Tuple[float, int]] = None
+    ) -> Tuple[List[Any], Optional[Tuple[float, int]]]:
+        """
+        Full-text search a user's messages across all their sessions, best match first
+        
+        The query uses web search syntax ("quoted phrases", OR, -excluded) and is matched
+        through the GIN index on content_tsv. Highlighted snippets are built only for the
+        returned page. Rows have id, session_id, session_title, role, created_at, rank and
+        snippet; next_cursor is on (rank, id).
+        Returns: (rows, next_cursor)
+        """
+        config = cast(SEARCH_CONFIG, REGCONFIG)
+        ts_query = func.websearch_to_tsquery(config, query)
+        rank = func.ts_rank(ChatMessage.content_tsv, ts_query)
+        
+        page = (
+            select(
+                ChatMessage.id,
+                ChatMessage.role,
+                ChatMessage.content,
+                ChatMessage.created_at,
+                ChatSession.session_id,
+                ChatSession.title.label("session_title"),
+                rank.label("rank")
+            )
+            .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+            .where(
+                ChatSession.user_id == user_id,
+                ChatMessage.content_tsv.op("@@")(ts_query)
+            )
+        )
+        if cursor is not None:
+            page = page.where(tuple_(rank, ChatMessage.id) < tuple_(*cursor))
+        page = (
+            page
+            .order_by(rank.desc(), ChatMessage.id.desc())
+            .limit(limit + 1)
+            .subquery()
+        )
+        
+        result = await db.execute(
+            select(
+                page.c.id,
+                page.c.session_id,
+                page.c.session_title,
+                page.c.role,
+                page.c.created_at,
+                page.c.rank,
+                func.ts_headline(config, page.c.content, ts_query, SEARCH_HEADLINE_OPTIONS).label("snippet")
+            )
+            .order_by(page.c.rank.desc(), page.c.id.desc())
+        )
+        rows = list(result.all())
         
-        history = []
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].rank, rows[-1].id)
+        return rows, next_cursor
+    
+    @staticmethod
+    async def get_chat_history(
+        db: AsyncSession,
+        session: ChatSession
+    ) -> List[Tuple[ChatMessage, ChatMessage]]:
+        """
+        Get the recent (human, ai) message pairs not yet folded into the session summary
+        
+        Reads at most CHAT_HISTORY_WINDOW_MESSAGES messages after summary_message_id, newest
+        first, in one query served by the (session_id, created_at) index, so the cost per
+        turn does not grow with the session. If summaries fell behind by more than the
+        window, the oldest unsummarized messages are left out.
+        """
+        query = select(ChatMessage).where(ChatMessage.session_id == session.id)
+        if session.summary_message_id is not None:
+            query = query.where(ChatMessage.id > session.summary_message_id)
+        result = await db.execute(
+            query
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(settings.CHAT_HISTORY_WINDOW_MESSAGES)
+        )
+        messages = list(result.scalars())
+        messages.reverse()
+        
+        exchanges = []
         human_msg = None
         
         for msg in messages:
             if msg.role == MessageRole.USER:
-                human_msg = msg.content
+                human_msg = msg
             elif msg.role == MessageRole.ASSISTANT and human_msg is not None:
-                history.append((human_msg, msg.content))
+                exchanges.append((human_msg, msg))
                 human_msg = None
         
-        return history
+        return exchanges
+    
+    @staticmethod
+    def _history(exchanges: List[Tuple[ChatMessage, ChatMessage]]) -> List[Tuple[str, str]]:
+        """(human, ai) text pairs for RAG context"""
+        return [(human_msg.content, ai_msg.content) for human_msg, ai_msg in exchanges]
     
     @staticmethod
-    def add_message(
-        db: Session,
+    async def add_message(
+        db: AsyncSession,
         session: ChatSession,
         role: MessageRole,
         content: str
-    ) -> ChatMessage:
-        """Add a message to a session"""
-        message = ChatMessage(
-            session_id=session.id,
-            role=role,
-            content=content
-        )
-        db.add(message)
+    ) -> Optional[ChatMessage]:
+        """
+        Add a message to a session in one transaction
+        
+        Returns None if the session was deleted in the meantime.
+        """
+        if not await ChatService._touch_session(db, session.id):
+            await db.rollback()
+            return None
         
-        session.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(message)
+        message, = await ChatService._insert_messages(db, session.id, [(role, content)])
+        await db.commit()
         
         return message
     
     @staticmethod
-    def process_message(
-        db: Session,
+    async def prepare_message(
+        db: AsyncSession,
         session_id: Optional[str],
         user_message: str,
         user_id: Optional[int] = None
-    ) -> Tuple[ChatSession, ChatMessage, bool]:
+    ) -> Tuple[Optional[ChatSession], bool, List[Tuple[ChatMessage, ChatMessage]]]:
         """
-        Process a user message and generate response
-        Returns: (session, assistant_message, is_new_session)
+        Get or create the session, read its recent history and save the user's message
+        
+        Everything is written in a single transaction, which is committed before the
+        response is generated so no connection is held during the LLM call. New sessions
+        are titled from the keywords of the first message, and the title is refined by the
+        LLM in the background when CHAT_TITLE_LLM_REFINEMENT is enabled.
+        The session is None if it was deleted after it was read.
+        Returns: (session, is_new_session, exchanges)
         """
-        is_new_session = False
-        
-        # Get or create session
-        if session_id:
-            session = ChatService.get_session(db, session_id)
-            if not session:
-                # Session not found, create new one
-                session = ChatService.create_session(db, user_id)
-                is_new_session = True
-            else:
-                # Update user_id if session exists but doesn't have user_id
-                if user_id and not session.user_id:
-                    session.user_id = user_id
-                    db.commit()
-                    db.refresh(session)
-        else:
-            session = ChatService.create_session(db, user_id)
+        session = await ChatService.get_session(db, session_id) if session_id else None
+        
+        if session is None:
+            # No session or session not found, create new one with its welcome message
+            session = await ChatService._insert_session(db, user_id, extract_title(user_message))
             is_new_session = True
+            exchanges = []
+            messages = [
+                (MessageRole.ASSISTANT, RAGService.FIRST_MESSAGE),
+                (MessageRole.USER, user_message)
+            ]
+        else:
+            is_new_session = False
+            exchanges = await ChatService.get_chat_history(db, session)
+            messages = [(MessageRole.USER, user_message)]
+            # Update user_id if session exists but doesn't have user_id
+            values = {"user_id": user_id} if user_id and not session.user_id else {}
+            if not await ChatService._touch_session(db, session.id, **values):
+                await db.rollback()
+                return None, False, []
         
-        # Add user message
-        user_msg = ChatService.add_message(db, session, MessageRole.USER, user_message)
+        await ChatService._insert_messages(db, session.id, messages)
+        await db.commit()
         
-        # Generate title from first user message if it's a new session
-        if is_new_session:
-            title = rag_service.generate_title(user_message)
-            session.title = title
-            db.commit()
-            db.refresh(session)
+        if is_new_session and settings.CHAT_TITLE_LLM_REFINEMENT:
+            ChatService.schedule_title_refinement(session.id, user_message, session.title)
+        
+        return session, is_new_session, exchanges
+    
+    @staticmethod
+    def schedule_title_refinement(session_pk: int, user_message: str, local_title: str) -> None:
+        """Replace a generated title with an LLM title later, without delaying the reply"""
+        _run_in_background(ChatService._refine_title(session_pk, user_message, local_title))
+    
+    @staticmethod
+    async def _refine_title(session_pk: int, user_message: str, local_title: str) -> None:
+        try:
+            title = await rag_service.agenerate_title(user_message)
+            async with AsyncSessionLocal() as db:
+                session = await ChatService.get_session_by_id(db, session_pk)
+                # Keep titles that were renamed in the meantime
+                if session is None or session.title != local_title:
+                    return
+                session.title = title
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Error refining title of session {session_pk}: {e}")
+    
+    @staticmethod
+    def schedule_summary_update(
+        session: ChatSession,
+        exchanges: List[Tuple[ChatMessage, ChatMessage]]
+    ) -> Optional[asyncio.Task]:
+        """
+        Fold older exchanges into the session summary once enough have accumulated
         
-        # Get chat history for context
-        chat_history = ChatService.get_chat_history(db, session.session_id)
+        exchanges are the unsummarized pairs before the turn that was just answered. Once
+        that turn brings them to CHAT_SUMMARY_RECENT_EXCHANGES + CHAT_SUMMARY_EVERY_EXCHANGES,
+        all but the most recent CHAT_SUMMARY_RECENT_EXCHANGES are summarized in the
+        background, so the prompt holds the summary plus at most a few raw exchanges.
+        Returns the background task, or None when nothing is summarized yet.
+        """
+        keep = max(1, settings.CHAT_SUMMARY_RECENT_EXCHANGES)
+        unsummarized = len(exchanges) + 1
+        if unsummarized < keep + settings.CHAT_SUMMARY_EVERY_EXCHANGES:
+            return None
         
-        # Generate response using RAG
-        response_content = rag_service.generate_response(
+        fold = exchanges[:unsummarized - keep]
+        return _run_in_background(ChatService._update_summary(
+            session.id,
+            session.summary,
+            session.summary_message_id,
+            ChatService._history(fold),
+            fold[-1][1].id
+        ))
+    
+    @staticmethod
+    async def _update_summary(
+        session_pk: int,
+        previous_summary: Optional[str],
+        previous_message_id: Optional[int],
+        exchanges: List[Tuple[str, str]],
+        last_message_id: int
+    ) -> Optional[Tuple[str, int]]:
+        """Save a new summary; returns (summary, summary_message_id) if it was saved"""
+        try:
+            summary = await rag_service.asummarize_conversation(previous_summary, exchanges)
+            if summary is None:
+                return None  # Retried after the next turn
+            async with AsyncSessionLocal() as db:
+                # Skip if another turn already moved the summary on; keep the session's position
+                result = await db.execute(
+                    update(ChatSession)
+                    .where(ChatSession.id == session_pk)
+                    .where(ChatSession.summary_message_id.is_not_distinct_from(previous_message_id))
+                    .values(
+                        summary=summary,
+                        summary_message_id=last_message_id,
+                        updated_at=ChatSession.updated_at
+                    )
+                    .returning(ChatSession.id)
+                )
+                saved = result.first() is not None
+                await db.commit()
+            return (summary, last_message_id) if saved else None
+        except Exception as e:
+            logger.error(f"Error updating summary of session {session_pk}: {e}")
+            return None
+    
+    @staticmethod
+    async def process_message(
+        db: AsyncSession,
+        session_id: Optional[str],
+        user_message: str,
+        user_id: Optional[int] = None
+    ) -> Tuple[Optional[ChatSession], Optional[ChatMessage], bool]:
+        """
+        Process a user message and generate response
+        
+        Takes two transactions: one for the user message and session bookkeeping, one for
+        the assistant reply. The assistant message is None if the session was deleted
+        while the message was processed.
+        Returns: (session, assistant_message, is_new_session)
+        """
+        session, is_new_session, exchanges = await ChatService.prepare_message(
+            db, session_id, user_message, user_id
+        )
+        if session is None:
+            return None, None, False
+        
+        # Generate response using RAG, from recent exchanges and the summary of older ones
+        response_content = await rag_service.agenerate_response(
             user_message=user_message,
-            chat_history=chat_history
+            chat_history=ChatService._history(exchanges),
+            summary=session.summary
         )
         
         # Add assistant message
-        assistant_message = ChatService.add_message(
+        assistant_message = await ChatService.add_message(
             db, session, MessageRole.ASSISTANT, response_content
         )
+        if assistant_message is not None:
+            ChatService.schedule_summary_update(session, exchanges)
         
         return session, assistant_message, is_new_session
     
     @staticmethod
-    def delete_session(db: Session, session_id: str) -> bool:
-        """Delete a chat session and all its messages"""
-        session = ChatService.get_session(db, session_id)
-        if not session:
-            return False
+    async def stream_message(
+        session: ChatSession,
+        exchanges: List[Tuple[ChatMessage, ChatMessage]],
+        user_message: str,
+        is_new_session: bool
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream the assistant response as (event, data) pairs
+        
+        Events are "session" first, then one "token" per model chunk, then "done" with the
+        saved assistant message. The stream outlives the request's database session, so the
+        message is saved with a session of its own once the stream completes.
+        """
+        title = session.title if is_new_session else None
+        yield "session", {"session_id": session.session_id, "is_new_session": is_new_session}
+        
+        parts: List[str] = []
+        async for token in rag_service.astream_response(
+            user_message, ChatService._history(exchanges), session.summary
+        ):
+            parts.append(token)
+            yield "token", {"content": token}
+        
+        async with AsyncSessionLocal() as db:
+            assistant_message = await ChatService.add_message(
+                db, session, MessageRole.ASSISTANT, "".join(parts)
+            )
+        if assistant_message is None:
+            yield "error", {"detail": "Chat session not found"}
+            return
+        ChatService.schedule_summary_update(session, exchanges)
         
-        db.delete(session)
-        db.commit()
-        return True
+        yield "done", {"message": assistant_message, "title": title}
+    
+    @staticmethod
+    async def delete_session(db: AsyncSession, session_id: str) -> bool:
+        """Delete a chat session; its messages are removed by the database cascade"""
+        result = await db.execute(
+            delete(ChatSession)
+            .where(ChatSession.session_id == session_id)
+            .returning(ChatSession.id)
+        )
+        deleted = result.scalar_one_or_none() is not None
+        await db.commit()
+        return deleted
+    
+    @staticmethod
+    async def delete_user_sessions(db: AsyncSession, user_id: int) -> int:
+        """Delete all chat sessions of a user in one statement and get how many were deleted"""
+        result = await db.execute(
+            delete(ChatSession)
+            .where(ChatSession.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
     
     @staticmethod
-    def update_session_title(
-        db: Session,
+    async def update_session_title(
+        db: AsyncSession,
         session_id: str,
         title: str
     ) -> Optional[ChatSession]:
         """Update the title of a chat session"""
-        session = ChatService.get_session(db, session_id)
+        session = await ChatService.get_session(db, session_id)
         if not session:
             return None
         
-        session.title = title
-        db.commit()
-        db.refresh(session)
+        await ChatService._touch_session(db, session.id, title=title)
+        await db.commit()
         return session
+
+
+class ChatConnection:
+    """
+    Chat state of one WebSocket connection
+    
+    The user is authenticated once when the socket opens, and the current session and its
+    unsummarized exchanges are kept in memory between messages. A turn therefore costs the
+    LLM call plus one transaction that saves the question and the answer together; the
+    history is only read from the database when a session is opened.
+    """
+    
+    def __init__(self, user_id: int, is_superuser: bool = False):
+        self.user_id = user_id
+        self.is_superuser = is_superuser
+        self.session: Optional[ChatSession] = None
+        self.exchanges: List[Tuple[ChatMessage, ChatMessage]] = []
+        self._summary_task: Optional[asyncio.Task] = None
+    
+    def _can_access(self, session: ChatSession) -> bool:
+        return session.user_id is None or session.user_id == self.user_id or self.is_superuser
+    
+    def _reset(self, session: Optional[ChatSession] = None) -> None:
+        self.session = session
+        self.exchanges = []
+        self._summary_task = None
+    
+    async def open_session(self, session_id: Optional[str]) -> Optional[ChatSession]:
+        """
+        Switch to an existing session and load its recent history
+        
+        With no session_id the next message starts a new session. Returns None if the
+        session does not exist or belongs to another user.
+        """
+        if session_id is None:
+            self._reset()
+            return None
+        
+        async with AsyncSessionLocal() as db:
+            session = await ChatService.get_session(db, session_id)
+            if session is None or not self._can_access(session):
+                return None
+            exchanges = await ChatService.get_chat_history(db, session)
+        
+        self._reset(session)
+        self.exchanges = exchanges
+        return session
+    
+    def _apply_summary(self) -> None:
+        """Take over a finished background summary and drop the exchanges it covers"""
+        task = self._summary_task
+        if task is None or not task.done():
+            return
+        self._summary_task = None
+        if task.cancelled() or task.result() is None:
+            return
+        
+        summary, summary_message_id = task.result()
+        self.session.summary = summary
+        self.session.summary_message_id = summary_message_id
+        self.exchanges = [
+            (human_msg, ai_msg) for human_msg, ai_msg in self.exchanges
+            if human_msg.id > summary_message_id
+        ]
+    
+    async def send_message(self, user_message: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Answer a message in the current session, starting one if needed
+        
+        Yields the same (event, data) pairs as ChatService.stream_message. The question is
+        saved together with the answer once the stream completes, so a turn interrupted by
+        a disconnect leaves nothing behind.
+        """
+        is_new_session = self.session is None
+        if is_new_session:
+            async with AsyncSessionLocal() as db:
+                session = await ChatService.create_session(db, self.user_id, extract_title(user_message))
+            self._reset(session)
+            if settings.CHAT_TITLE_LLM_REFINEMENT:
+                ChatService.schedule_title_refinement(session.id, user_message, session.title)
+        self._apply_summary()
+        
+        session = self.session
+        yield "session", {"session_id": session.session_id, "is_new_session": is_new_session}
+        
+        parts: List[str] = []
+        async for token in rag_service.astream_response(
+            user_message, ChatService._history(self.exchanges), session.summary
+        ):
+            parts.append(token)
+            yield "token", {"content": token}
+        
+        async with AsyncSessionLocal() as db:
+            # Claim anonymous sessions for the connected user, as prepare_message does
+            values = {"user_id": self.user_id} if session.user_id is None else {}
+            if not await ChatService._touch_session(db, session.id, **values):
+                await db.rollback()
+                self._reset()
+                yield "error", {"detail": "Chat session not found"}
+                return
+            human_msg, ai_msg = await ChatService._insert_messages(
+                db, session.id, [(MessageRole.USER, user_message), (MessageRole.ASSISTANT, "".join(parts))]
+            )
+            await db.commit()
+        session.user_id = session.user_id or self.user_id
+        
+        # One summary at a time; a turn while it runs keeps the exchanges it will cover
+        if self._summary_task is None:
+            self._summary_task = ChatService.schedule_summary_update(session, self.exchanges)
+        self.exchanges.append((human_msg, ai_msg))
+        self.exchanges = self.exchanges[-(settings.CHAT_HISTORY_WINDOW_MESSAGES // 2):]
+        
+        yield "done", {"message": ai_msg, "title": session.title if is_new_session else None}
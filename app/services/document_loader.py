@@ -0,0 +1,117 @@
+"""
+Document loading helpers for the PetikSendiri knowledge base
+Kept free of service singletons so ingestion worker processes can import it cheaply
+"""
+import hashlib
+import logging
+from typing import Iterator, List, Optional, Tuple
+from pathlib import Path
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt"}
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def create_text_splitter(
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> RecursiveCharacterTextSplitter:
+    """Create the text splitter used for knowledge base chunks"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+
+def compute_file_hash(file_path: str) -> str:
+    """Compute the SHA-256 hash of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _create_loader(file_path: Path):
+    """Create the langchain loader for a file, or None if the type is unsupported"""
+    extension = file_path.suffix.lower()
+
+    if extension == ".pdf":
+        return PyPDFLoader(str(file_path))
+    if extension == ".docx":
+        return Docx2txtLoader(str(file_path))
+    if extension == ".txt":
+        return TextLoader(str(file_path), encoding="utf-8")
+
+    logger.warning(f"Unsupported file type: {extension}")
+    return None
+
+
+def _add_source_metadata(doc: Document, file_path: Path) -> Document:
+    doc.metadata["source"] = str(file_path)
+    doc.metadata["filename"] = file_path.name
+    return doc
+
+
+def load_document(file_path: str) -> List[Document]:
+    """Load a document based on its file type"""
+    file_path = Path(file_path)
+
+    try:
+        loader = _create_loader(file_path)
+        if loader is None:
+            return []
+
+        return [_add_source_metadata(doc, file_path) for doc in loader.load()]
+    except Exception as e:
+        logger.error(f"Error loading document {file_path}: {e}")
+        return []
+
+
+def iter_document_chunks(
+    file_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> Iterator[Document]:
+    """
+    Lazily load a document page by page and yield its chunks
+
+    Only one page is held in memory at a time. Loader errors are raised to the caller.
+    """
+    file_path = Path(file_path)
+    loader = _create_loader(file_path)
+    if loader is None:
+        return
+
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap)
+    for page in loader.lazy_load():
+        yield from text_splitter.split_documents([_add_source_metadata(page, file_path)])
+
+
+def split_document_file(
+    file_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> Tuple[str, List[Document], Optional[str]]:
+    """
+    Load and split a single file into chunks
+    Returns: (file_path, chunks, error_message)
+
+    Runs inside ingestion worker processes, so errors are returned instead of raised.
+    """
+    try:
+        documents = load_document(file_path)
+        if not documents:
+            return file_path, [], "No content extracted from document"
+
+        chunks = create_text_splitter(chunk_size, chunk_overlap).split_documents(documents)
+        return file_path, chunks, None
+    except Exception as e:
+        return file_path, [], str(e)
@@ -0,0 +1,395 @@
+"""
+Embedding caches for PetikSendiri Assistant
+Persists chunk embeddings on disk so rebuilds do not pay for the same text twice
+"""
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class _Segment:
+    """One immutable file set of the embedding cache: vectors, keys and last-used clocks"""
+
+    def __init__(self, segment_id: int, vectors: np.ndarray, keys: np.ndarray, last_used: np.ndarray):
+        self.segment_id = segment_id
+        self.vectors = vectors
+        self.keys = keys
+        self.last_used = last_used
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by chunk text hash, one directory per embedding model
+
+    Vectors live in append-only segments of float32 .npy matrices opened with mmap, so only
+    the rows that are actually read get paged in. New entries are buffered in memory until
+    flush() (or until max_pending entries are buffered), which writes them as a new segment.
+    A new segment is merged into the previous one while that is at most twice its size, so
+    each vector is rewritten a logarithmic number of times and the segment count stays
+    small. Least recently used rows beyond max_entries are evicted by compacting all
+    segments into one, only once the cache has grown EVICTION_SLACK past max_entries.
+
+    The key index is loaded on first use, so serving workers, which only embed queries,
+    never hold a copy of it.
+    """
+
+    SEGMENT_PREFIX = "segment-"
+    VECTORS_SUFFIX = ".vectors.npy"
+    KEYS_SUFFIX = ".keys.npy"
+    LAST_USED_SUFFIX = ".last_used.npy"
+    SEGMENT_KEYS_PATTERN = re.compile(r"^segment-(\d+)\.keys\.npy$")
+    # Single-file layout of earlier versions, loaded as the first segment
+    LEGACY_FILES = {"vectors.npy": VECTORS_SUFFIX, "keys.npy": KEYS_SUFFIX, "last_used.npy": LAST_USED_SUFFIX}
+    COPY_BLOCK_ROWS = 4096
+    EVICTION_SLACK = 1.25
+
+    def __init__(self, path: Path, max_entries: int, max_pending: int = 8192):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._segments: List[_Segment] = []
+        self._rows: Dict[bytes, Tuple[_Segment, int]] = {}
+        self._next_segment_id = 0
+        self._clock = 0
+        self._pending: Dict[bytes, np.ndarray] = {}
+        self._pending_used: Dict[bytes, int] = {}
+        self._loaded = False
+
+    @classmethod
+    def for_model(cls, root: Path, model: str, max_entries: int) -> "EmbeddingCache":
+        """Create a cache stored in a per-model subdirectory of root"""
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        return cls(Path(root) / safe_model, max_entries)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest().encode("ascii")
+
+    def _segment_path(self, segment_id: int, suffix: str) -> Path:
+        return self.path / f"{self.SEGMENT_PREFIX}{segment_id:06d}{suffix}"
+
+    def _migrate_legacy_files(self) -> None:
+        """Rename the files of the single-file layout into segment 0"""
+        if not all((self.path / name).exists() for name in self.LEGACY_FILES):
+            return
+        if self._segment_path(0, self.KEYS_SUFFIX).exists():
+            return
+        # Keys are renamed last: they mark a complete segment
+        for name, suffix in sorted(self.LEGACY_FILES.items(), key=lambda item: item[1] == self.KEYS_SUFFIX):
+            os.replace(self.path / name, self._segment_path(0, suffix))
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _load(self) -> None:
+        """Open the persisted cache segments if present"""
+        if not self.path.exists():
+            return
+        self._migrate_legacy_files()
+
+        segment_ids = sorted(
+            int(match.group(1))
+            for match in (self.SEGMENT_KEYS_PATTERN.match(p.name) for p in self.path.iterdir())
+            if match
+        )
+        for segment_id in segment_ids:
+            self._next_segment_id = segment_id + 1
+            try:
+                vectors = np.load(self._segment_path(segment_id, self.VECTORS_SUFFIX), mmap_mode="r")
+                keys = np.load(self._segment_path(segment_id, self.KEYS_SUFFIX))
+                last_used = np.array(
+                    np.load(self._segment_path(segment_id, self.LAST_USED_SUFFIX)), dtype=np.int64
+                )
+                if not (len(vectors) == len(keys) == len(last_used)):
+                    raise ValueError("segment files are out of sync")
+            except Exception as e:
+                logger.warning(f"Discarding unreadable embedding cache segment {segment_id} at {self.path}: {e}")
+                continue
+
+            segment = _Segment(segment_id, vectors, keys, last_used)
+            self._segments.append(segment)
+            for row, key in enumerate(keys):
+                self._rows[bytes(key)] = (segment, row)
+            if len(last_used):
+                self._clock = max(self._clock, int(last_used.max()) + 1)
+
+        if self._rows:
+            logger.info(f"Embedding cache loaded with {len(self._rows)} entries in {len(self._segments)} segments")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._rows) + len(self._pending)
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up vectors for texts, returning None for misses"""
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            self._ensure_loaded()
+            self._clock += 1
+            for text in texts:
+                key = self._key(text)
+                location = self._rows.get(key)
+                if location is not None:
+                    segment, row = location
+                    segment.last_used[row] = self._clock
+                    segment.dirty = True
+                    results.append(segment.vectors[row].tolist())
+                    self.hits += 1
+                elif key in self._pending:
+                    self._pending_used[key] = self._clock
+                    results.append(self._pending[key].tolist())
+                    self.hits += 1
+                else:
+                    results.append(None)
+                    self.misses += 1
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Buffer new vectors until the next flush"""
+        with self._lock:
+            self._ensure_loaded()
+            self._clock += 1
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                if key in self._rows:
+                    continue
+                self._pending[key] = np.asarray(vector, dtype=np.float32)
+                self._pending_used[key] = self._clock
+            should_flush = len(self._pending) >= self.max_pending
+
+        # Keep the write buffer bounded during long ingestion runs
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Persist buffered vectors as a new segment
+
+        Only the new vectors and the small last-used arrays of read segments are written,
+        apart from the occasional merge or compaction.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._pending:
+                entries = [(self._pending_used[key], key, vector) for key, vector in self._pending.items()]
+                self._pending.clear()
+                self._pending_used.clear()
+                self._replace_segments([], entries)
+                self._merge_segments()
+
+            if len(self._rows) > self.max_entries * self.EVICTION_SLACK:
+                evicted = len(self._rows) - self.max_entries
+                self._compact(self.max_entries)
+                logger.info(f"Embedding cache compacted to {len(self._rows)} entries ({evicted} evicted)")
+
+            for segment in self._segments:
+                if segment.dirty:
+                    self._atomic_save(self._segment_path(segment.segment_id, self.LAST_USED_SUFFIX), segment.last_used)
+                    segment.dirty = False
+
+    @staticmethod
+    def _segment_entries(segments: List[_Segment]) -> List[Tuple[int, bytes, np.ndarray]]:
+        return [
+            (int(segment.last_used[row]), bytes(segment.keys[row]), segment.vectors[row])
+            for segment in segments
+            for row in range(len(segment))
+        ]
+
+    def _merge_segments(self) -> None:
+        """Merge the newest segment into the previous one while that is at most twice its size"""
+        while len(self._segments) >= 2 and len(self._segments[-2]) <= 2 * len(self._segments[-1]):
+            merged = self._segments[-2:]
+            self._replace_segments(merged, self._segment_entries(merged))
+
+    def _compact(self, max_entries: int) -> None:
+        """Rewrite all segments into one, keeping the max_entries most recently used rows"""
+        segments = list(self._segments)
+        entries = self._segment_entries(segments)
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        for _, key, _ in entries[max_entries:]:
+            del self._rows[key]
+        self._replace_segments(segments, entries[:max_entries])
+
+    def _replace_segments(self, old_segments: List[_Segment], entries: List[Tuple[int, bytes, np.ndarray]]) -> None:
+        """Write entries as a new segment at the end, then remove old_segments"""
+        if entries:
+            segment = self._write_segment(entries)
+            self._segments.append(segment)
+            for row, (_, key, _) in enumerate(entries):
+                self._rows[key] = (segment, row)
+
+        for segment in old_segments:
+            self._segments.remove(segment)
+            # Keys go first: a segment without them is ignored when loading
+            for suffix in (self.KEYS_SUFFIX, self.VECTORS_SUFFIX, self.LAST_USED_SUFFIX):
+                self._segment_path(segment.segment_id, suffix).unlink(missing_ok=True)
+
+    def _write_segment(self, entries: List[Tuple[int, bytes, np.ndarray]]) -> _Segment:
+        segment_id = self._next_segment_id
+        self._next_segment_id += 1
+        dim = len(entries[0][2])
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        vectors_path = self._segment_path(segment_id, self.VECTORS_SUFFIX)
+        tmp_vectors = vectors_path.with_name(vectors_path.name + ".tmp")
+        out = np.lib.format.open_memmap(
+            str(tmp_vectors), mode="w+", dtype=np.float32, shape=(len(entries), dim)
+        )
+        for start in range(0, len(entries), self.COPY_BLOCK_ROWS):
+            block = entries[start:start + self.COPY_BLOCK_ROWS]
+            out[start:start + len(block)] = [vector for _, _, vector in block]
+        out.flush()
+        del out
+        os.replace(tmp_vectors, vectors_path)
+
+        keys = np.array([key for _, key, _ in entries], dtype="S64")
+        last_used = np.array([used for used, _, _ in entries], dtype=np.int64)
+        self._atomic_save(self._segment_path(segment_id, self.LAST_USED_SUFFIX), last_used)
+        # Written last: its presence marks a complete segment
+        self._atomic_save(self._segment_path(segment_id, self.KEYS_SUFFIX), keys)
+        return _Segment(segment_id, np.load(vectors_path, mmap_mode="r"), keys, last_used)
+
+    @staticmethod
+    def _atomic_save(path: Path, array: np.ndarray) -> None:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        """Get cache size and hit/miss counters, without loading the cache"""
+        total = self.hits + self.misses
+        return {
+            "loaded": self._loaded,
+            "entries": len(self._rows) + len(self._pending),
+            "max_entries": self.max_entries,
+            "segments": len(self._segments),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class QueryEmbeddingCache:
+    """In-process LRU cache of query embeddings keyed by normalized query text, with optional TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        return " ".join(text.lower().split()).rstrip(" ?!.,")
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.normalize(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, vector = entry
+                if not self.ttl_seconds or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: List[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self.normalize(text)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Get cache size and hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves document embeddings from an EmbeddingCache
+    and query embeddings from an optional QueryEmbeddingCache
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        cache: EmbeddingCache,
+        query_cache: Optional[QueryEmbeddingCache] = None
+    ):
+        self.underlying = underlying
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            new_vectors = self.underlying.embed_documents(unique_texts)
+            self.cache.put_many(unique_texts, new_vectors)
+            by_text = dict(zip(unique_texts, new_vectors))
+            for i in missing:
+                vectors[i] = list(by_text[texts[i]])
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return self.underlying.embed_query(text)
+
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.query_cache.put(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return await self.underlying.aembed_query(text)
+
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            self.query_cache.put(text, vector)
+        return vector
@@ -0,0 +1,334 @@
+"""
+FAISS vector store persistence for PetikSendiri Assistant
+Stores the docstore as flat text/metadata blobs instead of a pickle, so serving
+workers can memory-map one shared copy of the index and documents
+"""
+import json
+import math
+import time
+import logging
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+IDS_FILE = "docstore_ids.json"
+TEXTS_FILE = "docstore_texts.bin"
+TEXT_OFFSETS_FILE = "docstore_text_offsets.npy"
+METADATA_FILE = "docstore_metadata.bin"
+METADATA_OFFSETS_FILE = "docstore_metadata_offsets.npy"
+
+# The flat index is always saved: builds need exact removal and incremental adds.
+# Approximate index types are derived from it for serving.
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+def ann_index_file(index_type: str) -> str:
+    """File name of the serving index for an approximate index type"""
+    return f"index.{index_type}.faiss"
+
+
+def _ivf_nlist(ntotal: int) -> int:
+    if settings.VECTOR_IVF_NLIST > 0:
+        return settings.VECTOR_IVF_NLIST
+    return max(1, int(4 * math.sqrt(ntotal)))
+
+
+def build_ann_index(flat_index: faiss.Index, index_type: str) -> Optional[faiss.Index]:
+    """
+    Build an approximate index over the vectors of a flat index, in the same order
+
+    IVF-PQ is trained on the existing vectors. Returns None when there are too few
+    vectors to train it, in which case serving falls back to the flat index.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported vector index type: {index_type}")
+    if index_type == "flat" or flat_index.ntotal == 0:
+        return None
+
+    dim = flat_index.d
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, settings.VECTOR_HNSW_M)
+        index.hnsw.efConstruction = settings.VECTOR_HNSW_EF_CONSTRUCTION
+        index.add(vectors)
+        return index
+
+    nlist = _ivf_nlist(flat_index.ntotal)
+    # k-means needs a few dozen points per centroid, PQ needs 2^nbits points per sub-quantizer
+    min_training_points = max(nlist * 39, 2 ** settings.VECTOR_PQ_NBITS)
+    if flat_index.ntotal < min_training_points or dim % settings.VECTOR_PQ_M != 0:
+        logger.warning(
+            f"Cannot train IVF-PQ with nlist={nlist}, m={settings.VECTOR_PQ_M} on "
+            f"{flat_index.ntotal} vectors of dimension {dim}, serving the flat index"
+        )
+        return None
+
+    quantizer = faiss.IndexFlatL2(dim)
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, settings.VECTOR_PQ_M, settings.VECTOR_PQ_NBITS)
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def _configure_search(index: faiss.Index) -> faiss.Index:
+    """Apply query-time search parameters of approximate indexes"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings.VECTOR_HNSW_EF_SEARCH
+    else:
+        try:
+            faiss.extract_index_ivf(index).nprobe = settings.VECTOR_IVF_NPROBE
+        except RuntimeError:
+            pass  # Not an IVF index
+    return index
+
+
+def _open_blob(path: Path) -> np.ndarray:
+    """Memory-map a byte blob (an empty file cannot be mapped)"""
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _write_blob(path: Path, values: Iterable[str], count: int) -> np.ndarray:
+    """Write strings as one UTF-8 blob and return their offsets"""
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for i, value in enumerate(values):
+            encoded = value.encode("utf-8")
+            f.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+    return offsets
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore backed by memory-mapped text and metadata blobs"""
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        with open(path / IDS_FILE, encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._texts = _open_blob(path / TEXTS_FILE)
+        self._text_offsets = np.load(path / TEXT_OFFSETS_FILE, mmap_mode="r")
+        self._metadata = _open_blob(path / METADATA_FILE)
+        self._metadata_offsets = np.load(path / METADATA_OFFSETS_FILE, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _read(blob: np.ndarray, offsets: np.ndarray, row: int) -> str:
+        return blob[offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            id=self.ids[row],
+            page_content=self._read(self._texts, self._text_offsets, row),
+            metadata=json.loads(self._read(self._metadata, self._metadata_offsets, row))
+        )
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self._document(row)
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        """Iterate over (id, document) pairs in index order"""
+        for row, doc_id in enumerate(self.ids):
+            yield doc_id, self._document(row)
+
+
+def save_ann_index(flat_index: faiss.Index, path: Path, index_type: str) -> None:
+    """Build the serving index of an approximate index type and save it next to the flat one"""
+    ann_index = build_ann_index(flat_index, index_type)
+    if ann_index is not None:
+        faiss.write_index(ann_index, str(Path(path) / ann_index_file(index_type)))
+
+
+def save_store(store: FAISS, path: Path, index_type: str = "flat") -> None:
+    """
+    Save a FAISS store as index.faiss plus flat docstore blobs
+
+    For approximate index types the serving index is built from the flat one and
+    saved next to it. Checkpoints that are not served save only the flat index.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+
+    faiss.write_index(store.index, str(path / INDEX_FILE))
+    save_ann_index(store.index, path, index_type)
+    text_offsets = _write_blob(
+        path / TEXTS_FILE,
+        (store.docstore.search(doc_id).page_content for doc_id in ids),
+        len(ids)
+    )
+    metadata_offsets = _write_blob(
+        path / METADATA_FILE,
+        (
+            json.dumps(store.docstore.search(doc_id).metadata, ensure_ascii=False, default=str)
+            for doc_id in ids
+        ),
+        len(ids)
+    )
+    np.save(path / TEXT_OFFSETS_FILE, text_offsets)
+    np.save(path / METADATA_OFFSETS_FILE, metadata_offsets)
+    # Written last: its presence marks a complete save
+    with open(path / IDS_FILE, "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+
+
+def _read_index(path: Path, mmap: bool) -> faiss.Index:
+    """Read a FAISS index, memory-mapping it read-only when the index type supports it"""
+    if mmap:
+        for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, flag_name, None)
+            if flag is None:
+                continue
+            try:
+                return faiss.read_index(str(path), flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                continue
+        logger.info(f"Index {path} does not support mmap, loading it into memory")
+    return faiss.read_index(str(path))
+
+
+def load_store(
+    path: Path,
+    embeddings: Embeddings,
+    read_only: bool = False,
+    mmap: bool = False,
+    index_type: str = "flat"
+) -> FAISS:
+    """
+    Load a FAISS store saved by save_store
+
+    Read-only stores serve the index_type index when one was saved, and with mmap=True
+    the index and docstore stay memory-mapped, so every worker process shares the same
+    page cache. Otherwise the flat index is loaded and the documents are copied into an
+    InMemoryDocstore that can be modified. Stores saved by FAISS.save_local (pickled
+    docstore) are still supported.
+    """
+    path = Path(path)
+    if not (path / IDS_FILE).exists():
+        return FAISS.load_local(str(path), embeddings, allow_dangerous_deserialization=True)
+
+    index_path = path / INDEX_FILE
+    if read_only and index_type != "flat" and (path / ann_index_file(index_type)).exists():
+        index_path = path / ann_index_file(index_type)
+    index = _configure_search(_read_index(index_path, mmap=read_only and mmap))
+    mmap_docstore = MmapDocstore(path)
+    index_to_docstore_id = dict(enumerate(mmap_docstore.ids))
+
+    if read_only:
+        docstore = mmap_docstore
+    else:
+        docstore = InMemoryDocstore(dict(mmap_docstore.iter_documents()))
+
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _search_latency(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, float]:
+    """Search queries one at a time, like request traffic, returning ids and mean latency in ms"""
+    results = np.empty((len(queries), k), dtype=np.int64)
+    started_at = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids = index.search(queries[i:i + 1], k)
+        results[i] = ids[0]
+    elapsed = time.perf_counter() - started_at
+    return results, elapsed / len(queries) * 1000
+
+
+def _hold_out_queries(flat_index: faiss.Index, sample_size: int) -> Tuple[faiss.Index, np.ndarray]:
+    """
+    Split a random sample of vectors off a flat index to use as queries
+
+    Returns a flat index of the remaining vectors and the held-out vectors. A query that
+    is also indexed finds itself at distance 0, which would inflate recall.
+    """
+    ntotal = flat_index.ntotal
+    rng = np.random.default_rng(0)
+    held_out = np.zeros(ntotal, dtype=bool)
+    held_out[rng.choice(ntotal, size=min(sample_size, ntotal // 10), replace=False)] = True
+
+    vectors = flat_index.reconstruct_n(0, ntotal)
+    base_index = faiss.IndexFlat(flat_index.d, flat_index.metric_type)
+    base_index.add(np.ascontiguousarray(vectors[~held_out]))
+    return base_index, np.ascontiguousarray(vectors[held_out], dtype=np.float32)
+
+
+def compare_index_types(
+    flat_index: faiss.Index,
+    index_types: Iterable[str],
+    k: int = 4,
+    sample_size: int = 200
+) -> dict:
+    """
+    Report recall@k and mean search latency of approximate indexes against the flat baseline
+
+    Queries are a random sample of the indexed vectors, at most a tenth of them, held out
+    of the compared indexes, so the report reflects the real distribution of the knowledge
+    base without queries finding themselves.
+    """
+    if flat_index.ntotal < 10:
+        return {"vectors": flat_index.ntotal, "k": k, "queries": 0, "baseline": None, "indexes": []}
+
+    flat_index, queries = _hold_out_queries(flat_index, sample_size)
+    ntotal = flat_index.ntotal
+    k = min(k, ntotal)
+
+    exact_ids, flat_latency = _search_latency(flat_index, queries, k)
+    report = {
+        "vectors": ntotal,
+        "dimension": flat_index.d,
+        "k": k,
+        "queries": len(queries),
+        "baseline": {"index_type": "flat", "avg_latency_ms": round(flat_latency, 4)},
+        "indexes": []
+    }
+
+    for index_type in index_types:
+        if index_type == "flat":
+            continue
+        started_at = time.perf_counter()
+        index = build_ann_index(flat_index, index_type)
+        build_seconds = time.perf_counter() - started_at
+        if index is None:
+            report["indexes"].append({"index_type": index_type, "available": False})
+            continue
+
+        ann_ids, latency = _search_latency(_configure_search(index), queries, k)
+        recall = np.mean([
+            len(set(exact_ids[i]) & set(ann_ids[i])) / k
+            for i in range(len(queries))
+        ])
+        report["indexes"].append({
+            "index_type": index_type,
+            "available": True,
+            "recall_at_k": round(float(recall), 4),
+            "avg_latency_ms": round(latency, 4),
+            "speedup": round(flat_latency / latency, 2) if latency > 0 else None,
+            "build_seconds": round(build_seconds, 2)
+        })
+
+    return report
+
+
+def load_flat_index(path: Path) -> faiss.Index:
+    """Load the exact flat index of a saved store"""
+    return faiss.read_index(str(Path(path) / INDEX_FILE))
@@ -0,0 +1,201 @@
+"""
+Local intent classifier for PetikSendiri Assistant
+Answers greetings, identity questions and clearly off-topic questions without retrieval or an LLM call
+"""
+import re
+import threading
+from collections import Counter
+from typing import Optional, Set
+
+GREETING = "greeting"
+IDENTITY = "identity"
+OFF_TOPIC = "off_topic"
+
+WORD_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+GREETING_WORDS = frozenset("""
+    hai hay hi hii hallo halo haloo hello helo hey hei pagi siang sore malam selamat
+    assalamualaikum assalamu alaikum salam permisi
+""".split())
+
+# Words that may accompany a greeting without adding a question ("halo kak", "hai min")
+ADDRESS_WORDS = frozenset("""
+    kak kakak min admin bang mas mbak gan sis bro sob sobat semua petiksendiri petik sendiri
+    assistant asisten bot wr wb juga ya
+""".split())
+
+IDENTITY_PATTERNS = [
+    re.compile(pattern) for pattern in (
+        r"\bsiapa\s+(kamu|anda|kau|dirimu|namamu)\b",
+        r"\b(kamu|anda|kau)\s+(itu\s+)?siapa\b",
+        r"\bnama\s*(mu|kamu|anda)\b",
+        r"\bapa\s+itu\s+petik\s*sendiri\b",
+        r"\b(kamu|anda)\s+(itu\s+)?apa\b",
+        r"\bperkenalkan\s+diri",
+        r"\b(kamu|anda)\s+bisa\s+(bantu\s+)?apa\b",
+        r"\b(kamu|anda)\s+(itu\s+)?(bot|robot|ai|manusia)\b",
+    )
+]
+IDENTITY_MAX_WORDS = 8
+
+# Word roots of the supported topics, matched against the stems of affixed words (menanam, pemupukan)
+TOPIC_ROOTS = frozenset("""
+    tanam nanam tani kebun pupuk hidroponik hidroponic akuaponik aquaponik aquaponic benih
+    bibit semai panen hama penyakit daun akar batang tanah sayur buah kompos siram nutrisi
+    farming garden pohon bunga biji gulma organik greenhouse microgreen microgreens pestisida
+    fungisida insektisida herbisida kutu ulat jamur busuk layu tumbuh
+""".split())
+TOPIC_WORDS = frozenset("""
+    pot polybag cabai cabe tomat selada kangkung bayam sawi pakcoy terong timun jahe kunyit
+    stroberi anggur jeruk mangga melon semangka kemangi seledri bawang tanaman kebun lahan
+    pertanian ph npk
+""".split())
+
+# Indonesian affixes stripped to find a word's root. "se" is left out so "sebuah" is not "buah"
+# Particles and possessives come after the derivational suffix (tanamannya = tanam + an + nya)
+PARTICLE_SUFFIXES = ("nya", "lah", "kah")
+SUFFIXES = ("kan", "an", "i")
+PREFIXES = ("ber", "per", "ter", "di", "ke", "me", "pe")
+# Nasal prefixes replace the first letter of the root (menanam -> tanam, pemupukan -> pupuk)
+NASAL_PREFIXES = (
+    ("meny", "s"), ("peny", "s"), ("meng", "k"), ("peng", "k"), ("mem", "p"), ("pem", "p"),
+    ("men", "t"), ("pen", "t"), ("meng", ""), ("peng", ""), ("mem", ""), ("pem", ""),
+    ("men", ""), ("pen", "")
+)
+MIN_STEM_LENGTH = 3
+
+# Subjects that are clearly outside urban farming. Words with a farming sense are left out
+# (bola lampu, film plastik, slot netpot, pacar air, musik untuk tanaman, ramalan cuaca)
+OFF_TOPIC_WORDS = frozenset("""
+    politik presiden pemilu capres partai dpr menteri gubernur pilkada sepakbola liga
+    piala timnas drakor anime lagu penyanyi artis selebriti gosip saham forex
+    trading kripto crypto bitcoin pinjol game gaming coding
+    pemrograman python javascript programming matematika pacaran
+    zodiak horoskop judi togel
+""".split())
+OFF_TOPIC_PHRASES = ("sepak bola", "mobile legend", "film bioskop", "judi slot")
+
+GREETING_RESPONSE = (
+    "Hai, Sobat Petik Sendiri 👋 Saya PetikSendiri Assistant, asisten AI yang siap membantu "
+    "pertanyaan seputar urban farming dan tanaman, mulai dari cara menanam, merawat, pupuk, "
+    "hidroponik, sampai mengatasi hama. Ada yang ingin ditanyakan tentang berkebun hari ini? 🌱"
+)
+
+IDENTITY_RESPONSE = (
+    "Saya PetikSendiri Assistant, asisten AI dari PetikSendiri yang ahli dalam urban farming "
+    "dan tanaman. Saya bisa membantu seputar cara menanam dan merawat tanaman, hidroponik dan "
+    "aquaponik, pupuk dan nutrisi, serta hama dan penyakit tanaman. Silakan ajukan pertanyaan "
+    "tentang berkebun di rumah ya! 🌱"
+)
+
+OFF_TOPIC_RESPONSE = (
+    "Maaf, saya hanya bisa membantu menjawab pertanyaan seputar urban farming dan tanaman. "
+    "Silakan ajukan pertanyaan yang berkaitan dengan topik tersebut ya! 🌱"
+)
+
+CANNED_RESPONSES = {
+    GREETING: GREETING_RESPONSE,
+    IDENTITY: IDENTITY_RESPONSE,
+    OFF_TOPIC: OFF_TOPIC_RESPONSE,
+}
+
+
+def _strip_suffixes(words: Set[str], suffixes) -> Set[str]:
+    stripped = set(words)
+    for word in words:
+        for suffix in suffixes:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                stripped.add(word[:-len(suffix)])
+    return stripped
+
+
+def _stems(word: str) -> Set[str]:
+    """The word and its possible roots after removing suffixes and one prefix"""
+    bases = _strip_suffixes(_strip_suffixes({word}, PARTICLE_SUFFIXES), SUFFIXES)
+
+    stems = set(bases)
+    for base in bases:
+        for prefix in PREFIXES:
+            if base.startswith(prefix) and len(base) - len(prefix) >= MIN_STEM_LENGTH:
+                stems.add(base[len(prefix):])
+        for prefix, initial in NASAL_PREFIXES:
+            if base.startswith(prefix) and len(base) - len(prefix) >= MIN_STEM_LENGTH - 1:
+                stems.add(initial + base[len(prefix):])
+    return stems
+
+
+def _mentions_topic(words) -> bool:
+    return any(
+        word in TOPIC_WORDS or not _stems(word).isdisjoint(TOPIC_ROOTS)
+        for word in words
+    )
+
+
+class IntentClassifier:
+    """
+    Rule-based classifier for messages that do not need the knowledge base
+
+    Only unambiguous messages are classified: a message is a greeting when it has nothing
+    but greeting and address words, an identity question when it is short and matches an
+    identity pattern, and off-topic when it names an unrelated subject without mentioning
+    any farming term. Off-topic is not decided inside a conversation, where a short
+    follow-up can rely on earlier turns. Everything else returns None and goes through RAG.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+
+    def classify(self, text: str, has_history: bool = False) -> Optional[str]:
+        """Get the intent of a message, or None when it needs a RAG answer"""
+        normalized = " ".join(text.lower().split())
+        words = WORD_PATTERN.findall(normalized)
+        intent = self._classify(normalized, words, has_history)
+        with self._lock:
+            self._counts[intent or "rag"] += 1
+        return intent
+
+    @staticmethod
+    def _classify(normalized: str, words, has_history: bool) -> Optional[str]:
+        if not words:
+            return None
+
+        if any(word in GREETING_WORDS for word in words) and all(
+            word in GREETING_WORDS or word in ADDRESS_WORDS for word in words
+        ):
+            return GREETING
+
+        if _mentions_topic(words):
+            return None
+
+        if len(words) <= IDENTITY_MAX_WORDS and any(
+            pattern.search(normalized) for pattern in IDENTITY_PATTERNS
+        ):
+            return IDENTITY
+
+        if has_history:
+            return None
+
+        if any(word in OFF_TOPIC_WORDS for word in words) or any(
+            phrase in normalized for phrase in OFF_TOPIC_PHRASES
+        ):
+            return OFF_TOPIC
+
+        return None
+
+    def canned_response(self, text: str, has_history: bool = False) -> Optional[str]:
+        """Get the fixed answer for a message, or None when it needs a RAG answer"""
+        intent = self.classify(text, has_history)
+        return CANNED_RESPONSES[intent] if intent is not None else None
+
+    def stats(self) -> dict:
+        """Get how many messages were answered by each fast path"""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        fast_path = total - counts.get("rag", 0)
+        return {
+            "classified": total,
+            "by_intent": counts,
+            "fast_path_rate": round(fast_path / total, 4) if total else 0.0
+        }
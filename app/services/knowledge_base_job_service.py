@@ -0,0 +1,233 @@
+"""
+Knowledge Base Job Service for PetikSendiri Assistant
+Runs knowledge base ingestion as resumable background jobs
+"""
+import uuid
+import logging
+import threading
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, update, or_, and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.chat import KnowledgeBaseJob
+from app.services.rag_service import rag_service
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock serializing job creation and claims, so only one build runs at a time
+BUILD_LOCK_KEY = 7286011
+
+
+class KnowledgeBaseJobService:
+    """Service for background knowledge base ingestion jobs"""
+    
+    ACTIVE_STATUSES = ("pending", "running")
+    
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+    
+    @staticmethod
+    def _stale_before() -> datetime:
+        """Jobs without a heartbeat since this time are considered interrupted"""
+        return KnowledgeBaseJobService._now() - timedelta(seconds=settings.RAG_JOB_STALE_SECONDS)
+    
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[KnowledgeBaseJob]:
+        """Get a job by job_id"""
+        return db.query(KnowledgeBaseJob).filter(
+            KnowledgeBaseJob.job_id == job_id
+        ).first()
+    
+    @staticmethod
+    def get_active_job(db: Session, exclude_job_id: Optional[str] = None) -> Optional[KnowledgeBaseJob]:
+        """Get a job that is still making progress in some worker, other than exclude_job_id"""
+        query = db.query(KnowledgeBaseJob).filter(
+            KnowledgeBaseJob.status.in_(KnowledgeBaseJobService.ACTIVE_STATUSES),
+            KnowledgeBaseJob.heartbeat_at >= KnowledgeBaseJobService._stale_before()
+        )
+        if exclude_job_id is not None:
+            query = query.filter(KnowledgeBaseJob.job_id != exclude_job_id)
+        return query.first()
+    
+    @staticmethod
+    def _lock_builds(db: Session) -> None:
+        """Wait for the build lock, held until the current transaction ends"""
+        db.execute(select(func.pg_advisory_xact_lock(BUILD_LOCK_KEY)))
+    
+    @staticmethod
+    def is_resumable(job: KnowledgeBaseJob) -> bool:
+        """Check whether a job failed or was interrupted (stale heartbeat)"""
+        if job.status == "failed":
+            return True
+        if job.status in KnowledgeBaseJobService.ACTIVE_STATUSES:
+            return job.heartbeat_at is None or job.heartbeat_at < KnowledgeBaseJobService._stale_before()
+        return False
+    
+    @staticmethod
+    def create_job(
+        db: Session,
+        force_reprocess: bool = False,
+        parallel: bool = False,
+        user_id: Optional[int] = None
+    ) -> Optional[KnowledgeBaseJob]:
+        """Create a pending ingestion job, or get None when another job is active"""
+        KnowledgeBaseJobService._lock_builds(db)
+        if KnowledgeBaseJobService.get_active_job(db):
+            db.rollback()
+            return None
+        
+        job = KnowledgeBaseJob(
+            job_id=str(uuid.uuid4()),
+            status="pending",
+            force_reprocess=force_reprocess,
+            parallel=parallel,
+            created_by=user_id,
+            heartbeat_at=KnowledgeBaseJobService._now()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def claim_job(db: Session, job_id: str) -> bool:
+        """
+        Atomically mark a job as running
+        
+        Fails when another worker is already running this job, or when a different job is
+        active, so two builds never write the same vector store versions at once.
+        """
+        KnowledgeBaseJobService._lock_builds(db)
+        if KnowledgeBaseJobService.get_active_job(db, exclude_job_id=job_id):
+            db.rollback()
+            return False
+        
+        stale_before = KnowledgeBaseJobService._stale_before()
+        result = db.execute(
+            update(KnowledgeBaseJob)
+            .where(
+                KnowledgeBaseJob.job_id == job_id,
+                or_(
+                    KnowledgeBaseJob.status.in_(("pending", "failed")),
+                    and_(
+                        KnowledgeBaseJob.status == "running",
+                        or_(
+                            KnowledgeBaseJob.heartbeat_at.is_(None),
+                            KnowledgeBaseJob.heartbeat_at < stale_before
+                        )
+                    )
+                )
+            )
+            .values(
+                status="running",
+                heartbeat_at=KnowledgeBaseJobService._now(),
+                error_message=None
+            )
+        )
+        db.commit()
+        return result.rowcount == 1
+    
+    @staticmethod
+    def start_job(job_id: str, resume: bool = False) -> None:
+        """Run a job in a background thread of this worker"""
+        thread = threading.Thread(
+            target=KnowledgeBaseJobService.run_job,
+            args=(job_id, resume),
+            name=f"knowledge-base-job-{job_id}",
+            daemon=True
+        )
+        thread.start()
+    
+    @staticmethod
+    def _send_heartbeats(job_id: str, stop: threading.Event) -> None:
+        """
+        Keep a running job's heartbeat fresh until stop is set
+        
+        Progress also moves the heartbeat, but one large file can take longer than
+        RAG_JOB_STALE_SECONDS, and the job must not look interrupted meanwhile.
+        """
+        interval = max(1.0, settings.RAG_JOB_STALE_SECONDS / 3)
+        while not stop.wait(interval):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(KnowledgeBaseJob)
+                    .where(KnowledgeBaseJob.job_id == job_id, KnowledgeBaseJob.status == "running")
+                    .values(heartbeat_at=KnowledgeBaseJobService._now())
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Error sending heartbeat of knowledge base job {job_id}: {e}")
+                db.rollback()
+            finally:
+                db.close()
+    
+    @staticmethod
+    def run_job(job_id: str, resume: bool = False) -> None:
+        """
+        Run an ingestion job to completion
+        
+        When resuming, ingestion runs incrementally from the last checkpoint saved on disk,
+        so files completed before the interruption are skipped.
+        """
+        db = SessionLocal()
+        stop_heartbeats = threading.Event()
+        try:
+            if not KnowledgeBaseJobService.claim_job(db, job_id):
+                logger.info(f"Knowledge base job {job_id} is not claimable or another job is running, skipping")
+                return
+            
+            threading.Thread(
+                target=KnowledgeBaseJobService._send_heartbeats,
+                args=(job_id, stop_heartbeats),
+                name=f"knowledge-base-job-heartbeat-{job_id}",
+                daemon=True
+            ).start()
+            
+            job = KnowledgeBaseJobService.get_job(db, job_id)
+            job.started_at = job.started_at or KnowledgeBaseJobService._now()
+            db.commit()
+            
+            def on_progress(progress: dict) -> None:
+                now = KnowledgeBaseJobService._now()
+                job.total_files = progress["total_files"]
+                job.processed_files = progress["processed"]
+                job.failed_files = progress["failed"]
+                job.skipped_files = progress["skipped"]
+                job.embedded_chunks = progress["embedded_chunks"]
+                job.heartbeat_at = now
+                if progress["checkpoint"]:
+                    job.checkpoint_at = now
+                db.commit()
+            
+            # Rebuilds reset every file record up front, so a resumed rebuild can run incrementally
+            result = rag_service.process_documents(
+                db,
+                force_reprocess=job.force_reprocess and not resume,
+                parallel=job.parallel,
+                progress_callback=on_progress
+            )
+            
+            job.result = result
+            job.status = "completed" if result["success"] else "failed"
+            job.error_message = None if result["success"] else result["message"]
+            job.finished_at = KnowledgeBaseJobService._now()
+            db.commit()
+            logger.info(f"Knowledge base job {job_id} finished with status {job.status}")
+        except Exception as e:
+            logger.error(f"Knowledge base job {job_id} failed: {e}")
+            db.rollback()
+            job = KnowledgeBaseJobService.get_job(db, job_id)
+            if job:
+                job.status = "failed"
+                job.error_message = str(e)
+                job.finished_at = KnowledgeBaseJobService._now()
+                db.commit()
+        finally:
+            stop_heartbeats.set()
+            db.close()
@@ -3,15 +3,23 @@ RAG (Retrieval-Augmented Generation) Service for PetikSendiri Assistant
 Handles document processing, vector store management, and knowledge retrieval
 """
 import os
+import json
+import asyncio
+import time
+import hashlib
 import logging
-from typing import List, Optional, Tuple
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 from pathlib import Path
 
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
@@ -21,6 +29,30 @@ from langchain_core.runnables import RunnablePassthrough
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models.chat import ProcessedDocument
+from app.services.embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache
+from app.services.response_cache import SemanticResponseCache, is_history_independent
+from app.services.intent_classifier import IntentClassifier
+from app.services.single_flight import SingleFlight
+from app.services.token_budget import MESSAGE_OVERHEAD_TOKENS, count_tokens, pack_context, trim_history
+from app.services.vector_store_versions import VectorStoreVersions
+from app.services.bm25_index import BM25Index
+from app.services.faiss_store import (
+    INDEX_TYPES,
+    compare_index_types,
+    load_flat_index,
+    load_store,
+    save_ann_index,
+    save_store
+)
+from app.services.document_loader import (
+    SUPPORTED_EXTENSIONS,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    compute_file_hash,
+    iter_document_chunks,
+    load_document,
+    split_document_file,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -68,20 +100,49 @@ KONTEKS DARI KNOWLEDGE BASE:
 Jika konteks kosong atau tidak relevan, jawab berdasarkan pengetahuanmu tentang urban farming."""
 
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
+        base_embeddings = OpenAIEmbeddings(
             openai_api_key=settings.OPENAI_API_KEY
         )
+        # Loaded when a build first embeds documents, so serving workers never hold it
+        self.embedding_cache = EmbeddingCache.for_model(
+            Path(settings.EMBEDDING_CACHE_PATH),
+            base_embeddings.model,
+            settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+        # Shared by every retrieval path, including FAISS' own query embedding calls
+        self.query_embedding_cache = QueryEmbeddingCache(
+            settings.QUERY_EMBEDDING_CACHE_SIZE,
+            settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+        self.embeddings = CachedEmbeddings(
+            base_embeddings,
+            self.embedding_cache,
+            self.query_embedding_cache
+        )
+        self.response_cache = SemanticResponseCache(
+            settings.RESPONSE_CACHE_SIZE,
+            settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+            settings.RESPONSE_CACHE_TTL_SECONDS
+        )
+        self.intent_classifier = IntentClassifier()
+        # Identical concurrent requests share one embedding, retrieval and completion call
+        self.single_flight = SingleFlight()
         self.llm = ChatOpenAI(
             model=settings.OPENAI_MODEL,
             openai_api_key=settings.OPENAI_API_KEY,
             temperature=0.7
         )
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+        self.versions = VectorStoreVersions(
+            self._get_vector_store_path(),
+            settings.VECTOR_STORE_KEEP_VERSIONS
         )
         self.vector_store: Optional[FAISS] = None
+        self.lexical_index: Optional[BM25Index] = None
+        self.vector_store_version: Optional[str] = None
+        self._last_version_check = time.monotonic()
+        self._swap_lock = threading.Lock()
+        # Query embeddings run here so hybrid retrieval can stop waiting on a slow API
+        self._query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="query-embedding")
         self._load_vector_store()
     
     def _get_knowledge_base_path(self) -> Path:
@@ -92,51 +153,113 @@ Jika konteks kosong atau tidak relevan, jawab berdasarkan pengetahuanmu tentang
         """Get the vector store directory path"""
         return Path(settings.VECTOR_STORE_PATH)
     
+    def _load_store_version(self, version: str, read_only: bool = False) -> FAISS:
+        """
+        Load a saved vector store version from disk
+        
+        Read-only stores serve the VECTOR_INDEX_TYPE index and are memory-mapped when
+        VECTOR_STORE_MMAP is enabled, so all workers share one page-cache copy. Builds load
+        a modifiable in-memory copy of the exact flat index.
+        """
+        return load_store(
+            self.versions.path_for(version),
+            self.embeddings,
+            read_only=read_only,
+            mmap=settings.VECTOR_STORE_MMAP,
+            index_type=settings.VECTOR_INDEX_TYPE
+        )
+    
+    def _activate_version(self, version: str) -> None:
+        """Load a version's read-only vector store and lexical index and start serving them"""
+        store = self._load_store_version(version, read_only=True)
+        version_path = self.versions.path_for(version)
+        lexical_index = BM25Index.load(version_path) if BM25Index.exists(version_path) else None
+        
+        # Results are matched by document id, so a request that sees the new lexical
+        # index together with the old store only loses hits, never mixes up documents
+        self.lexical_index = lexical_index
+        self.vector_store = store
+        self.vector_store_version = version
+    
     def _load_vector_store(self) -> None:
-        """Load existing vector store if available"""
-        vector_store_path = self._get_vector_store_path()
-        index_path = vector_store_path / "index.faiss"
+        """Load the published vector store version if available"""
+        version = self.versions.current_version()
         
-        if index_path.exists():
+        if version is not None:
             try:
-                self.vector_store = FAISS.load_local(
-                    str(vector_store_path),
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info("Vector store loaded successfully")
+                self._activate_version(version)
+                logger.info(f"Vector store version {version} loaded successfully")
             except Exception as e:
                 logger.error(f"Error loading vector store: {e}")
                 self.vector_store = None
+                self.lexical_index = None
         else:
             logger.info("No existing vector store found")
     
-    def _load_document(self, file_path: str) -> List[Document]:
-        """Load a document based on its file type"""
-        file_path = Path(file_path)
-        extension = file_path.suffix.lower()
+    def _refresh_vector_store(self) -> None:
+        """
+        Swap in a newly published vector store version
         
+        The pointer file is checked at most every VECTOR_STORE_REFRESH_SECONDS. The new
+        version is loaded in a background thread; requests keep using the old store until
+        the loaded one replaces it in a single reference assignment.
+        """
+        now = time.monotonic()
+        if now - self._last_version_check < settings.VECTOR_STORE_REFRESH_SECONDS:
+            return
+        self._last_version_check = now
+        
+        version = self.versions.current_version()
+        if version is None or version == self.vector_store_version:
+            return
+        if not self._swap_lock.acquire(blocking=False):
+            return  # A swap is already in progress
+        
+        threading.Thread(
+            target=self._swap_in_version,
+            args=(version,),
+            name=f"vector-store-swap-{version}",
+            daemon=True
+        ).start()
+    
+    def _swap_in_version(self, version: str) -> None:
         try:
-            if extension == ".pdf":
-                loader = PyPDFLoader(str(file_path))
-            elif extension == ".docx":
-                loader = Docx2txtLoader(str(file_path))
-            elif extension == ".txt":
-                loader = TextLoader(str(file_path), encoding="utf-8")
-            else:
-                logger.warning(f"Unsupported file type: {extension}")
-                return []
-            
-            documents = loader.load()
-            # Add metadata
-            for doc in documents:
-                doc.metadata["source"] = str(file_path)
-                doc.metadata["filename"] = file_path.name
-            
-            return documents
+            self._activate_version(version)
+            logger.info(f"Swapped in vector store version {version}")
         except Exception as e:
-            logger.error(f"Error loading document {file_path}: {e}")
-            return []
+            logger.error(f"Error loading vector store version {version}: {e}")
+        finally:
+            self._swap_lock.release()
+    
+    def _load_build_store(self, force_reprocess: bool) -> Tuple[Optional[FAISS], bool]:
+        """
+        Load a private copy of the store an ingestion run starts from
+        Returns: (store, resumed_from_staging)
+        
+        An unpublished checkpoint of an interrupted build takes precedence over the
+        published version, since the per-file records were written against it.
+        """
+        if force_reprocess:
+            self.versions.clear_staging()
+            return None, False
+        
+        staging_version = self.versions.staging_version()
+        if staging_version is not None:
+            try:
+                logger.info(f"Resuming from vector store checkpoint {staging_version}")
+                return self._load_store_version(staging_version), True
+            except Exception as e:
+                logger.error(f"Error loading checkpoint {staging_version}, ignoring it: {e}")
+                self.versions.clear_staging()
+        
+        version = self.versions.current_version()
+        if version is None:
+            return None, False
+        return self._load_store_version(version), False
+    
+    def _load_document(self, file_path: str) -> List[Document]:
+        """Load a document based on its file type"""
+        return load_document(file_path)
     
     def get_all_files(self) -> List[Tuple[str, str]]:
         """Get all supported files from knowledge base directory"""
@@ -146,17 +269,160 @@ Jika konteks kosong atau tidak relevan, jawab berdasarkan pengetahuanmu tentang
             knowledge_base_path.mkdir(parents=True, exist_ok=True)
             return []
         
-        supported_extensions = {".pdf", ".docx", ".txt"}
         files = []
         
         for file_path in knowledge_base_path.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
                 files.append((str(file_path), file_path.suffix.lower()[1:]))
         
         return files
     
-    def process_documents(self, db: Session, force_reprocess: bool = False) -> dict:
-        """Process all documents in knowledge base and create/update vector store"""
+    def _iter_file_chunks(
+        self,
+        file_paths: List[str],
+        parallel: bool = False
+    ) -> Iterator[Tuple[str, Iterable[Document], Optional[str]]]:
+        """
+        Yield (file_path, chunks, error) for each file
+        
+        Sequential mode streams chunks lazily page by page. Parallel mode parses files in
+        a process pool, keeping only a bounded window of files in flight. Workers are
+        spawned rather than forked: this runs in a thread of a multi-threaded server, and a
+        forked child could inherit locks held by other threads (logging, HTTP clients).
+        """
+        if not parallel or len(file_paths) < 2:
+            for file_path in file_paths:
+                yield file_path, iter_document_chunks(file_path, CHUNK_SIZE, CHUNK_OVERLAP), None
+            return
+        
+        max_workers = min(settings.RAG_INGEST_WORKERS, len(file_paths))
+        remaining = iter(file_paths)
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {
+                executor.submit(split_document_file, file_path, CHUNK_SIZE, CHUNK_OVERLAP): file_path
+                for file_path in islice(remaining, max_workers * 2)
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = futures.pop(future)
+                    try:
+                        _, chunks, error = future.result()
+                    except Exception as e:
+                        # Worker process died (e.g. parser crash), report it as a file failure
+                        chunks, error = [], str(e)
+                    yield file_path, chunks, error
+                    
+                    next_path = next(remaining, None)
+                    if next_path is not None:
+                        futures[executor.submit(split_document_file, next_path, CHUNK_SIZE, CHUNK_OVERLAP)] = next_path
+    
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in fixed-size batches with bounded concurrency, preserving order"""
+        batch_size = settings.RAG_EMBEDDING_BATCH_SIZE
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        
+        if len(batches) <= 1 or settings.RAG_EMBEDDING_CONCURRENCY <= 1:
+            return [vector for batch in batches for vector in self.embeddings.embed_documents(batch)]
+        
+        with ThreadPoolExecutor(max_workers=settings.RAG_EMBEDDING_CONCURRENCY) as executor:
+            results = executor.map(self.embeddings.embed_documents, batches)
+            return [vector for batch_vectors in results for vector in batch_vectors]
+    
+    @staticmethod
+    def _chunk_id(chunk: Document, seen: Dict[str, int]) -> str:
+        """Build a deterministic vector id from chunk content and metadata"""
+        payload = json.dumps(chunk.metadata, sort_keys=True, default=str) + "\n" + chunk.page_content
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        # Identical chunks within one file still need distinct ids
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        return digest if occurrence == 0 else f"{digest}:{occurrence}"
+    
+    @staticmethod
+    def _vector_ids_by_source(store: Optional[FAISS]) -> Dict[str, Set[str]]:
+        """Map each source file to the ids of its vectors in a store"""
+        ids_by_source: Dict[str, Set[str]] = defaultdict(set)
+        if store is None:
+            return ids_by_source
+        
+        for doc_id in store.index_to_docstore_id.values():
+            doc = store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                ids_by_source[doc.metadata.get("source")].add(doc_id)
+        
+        return ids_by_source
+    
+    @staticmethod
+    def _delete_vectors(store: Optional[FAISS], ids: Set[str]) -> None:
+        """Remove vectors from a store by document id"""
+        if store is None or not ids:
+            return
+        store.delete(list(ids))
+    
+    def _index_documents(
+        self,
+        store: Optional[FAISS],
+        documents: List[Document],
+        ids: List[str]
+    ) -> FAISS:
+        """Embed documents and add them to a store, creating it if needed"""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        vectors = self._embed_texts(texts)
+        text_embeddings = list(zip(texts, vectors))
+        
+        if store is None:
+            return FAISS.from_embeddings(
+                text_embeddings,
+                self.embeddings,
+                metadatas=metadatas,
+                ids=ids
+            )
+        
+        store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        return store
+    
+    @staticmethod
+    def _build_lexical_index(store: FAISS) -> BM25Index:
+        """Build a BM25 index over the chunks of a store, in index order"""
+        doc_ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+        return BM25Index.build(
+            doc_ids,
+            (store.docstore.search(doc_id).page_content for doc_id in doc_ids)
+        )
+    
+    def process_documents(
+        self,
+        db: Session,
+        force_reprocess: bool = False,
+        parallel: bool = False,
+        progress_callback: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Sync the vector store with the knowledge base directory
+        
+        Files are compared by content hash: added and changed files are re-chunked and
+        only chunks that are not already indexed get embedded, while vectors of removed
+        files and outdated chunks are deleted from the store by document id.
+        Chunks are streamed into the store in batches of RAG_INDEX_BATCH_SIZE, so memory
+        stays flat regardless of corpus size.
+        With force_reprocess=True the store is rebuilt from scratch.
+        With parallel=True files are parsed and chunked in a process pool.
+        
+        The partial index is saved every RAG_CHECKPOINT_INTERVAL_BATCHES batches, once it
+        has also grown by RAG_CHECKPOINT_MIN_GROWTH since the last checkpoint, and files are
+        only marked completed once a saved index contains all of their chunks, so an
+        interrupted run resumes from the last checkpoint. Growing the interval with the
+        index keeps the total checkpoint I/O linear in the corpus size. Checkpoints are
+        staged and saved flat; only the final version is published, with its approximate
+        serving index and BM25 index.
+        progress_callback receives a progress dict after every file and checkpoint.
+        """
+        started_at = time.perf_counter()
         files = self.get_all_files()
         
         if not files:
@@ -167,20 +433,31 @@ Jika konteks kosong atau tidak relevan, jawab berdasarkan pengetahuanmu tentang
                 "failed": 0
             }
         
-        all_documents = []
-        processed_count = 0
-        failed_count = 0
+        existing_records = {
+            record.file_path: record
+            for record in db.query(ProcessedDocument).all()
+        }
+        # Builds work on a private copy, so serving never sees a store that is being mutated
+        store, resumed_from_staging = self._load_build_store(force_reprocess)
+        rebuild = store is None
+        ids_by_source = self._vector_ids_by_source(store)
+        
+        doc_records = {}
+        file_hashes = {}
+        skipped_count = 0
         
         for file_path, file_type in files:
-            # Check if already processed
-            existing = db.query(ProcessedDocument).filter(
-                ProcessedDocument.file_path == file_path
-            ).first()
+            content_hash = compute_file_hash(file_path)
+            existing = existing_records.get(file_path)
             
-            if existing and not force_reprocess:
-                if existing.status == "completed":
-                    logger.info(f"Skipping already processed: {file_path}")
-                    continue
+            if (
+                existing
+                and not rebuild
+                and existing.status == "completed"
+                and existing.content_hash == content_hash
+            ):
+                skipped_count += 1
+                continue
             
             # Create or update record
             if not existing:
@@ -196,88 +473,486 @@ Jika konteks kosong atau tidak relevan, jawab berdasarkan pengetahuanmu tentang
                 doc_record.status = "processing"
                 doc_record.error_message = None
             
+            doc_records[file_path] = doc_record
+            file_hashes[file_path] = content_hash
+        
+        # Files that disappeared from the knowledge base. Vectors are matched by source
+        # rather than by record, so an interrupted run cannot leave orphaned vectors behind.
+        current_paths = {file_path for file_path, _ in files}
+        removed_records = [
+            record for file_path, record in existing_records.items()
+            if file_path not in current_paths
+        ]
+        for record in removed_records:
+            db.delete(record)
+        removed_ids: Set[str] = set()
+        for source, ids in ids_by_source.items():
+            if source not in current_paths:
+                removed_ids |= ids
+        
+        db.commit()
+        
+        batch: List[Tuple[str, Document, str]] = []
+        awaiting_checkpoint: List[str] = []
+        current_file: Optional[str] = None
+        current_flushed_ids: Set[str] = set()
+        batches_since_checkpoint = 0
+        vectors_since_checkpoint = 0
+        checkpointed_vectors = store.index.ntotal if store is not None else 0
+        dirty = False
+        # Checkpoints are staged rather than published, so serving keeps the complete old
+        # index until the new one is finished
+        staged_version = self.versions.staging_version() if resumed_from_staging else None
+        total_chunks = 0
+        embedded_count = 0
+        deleted_count = 0
+        processed_count = 0
+        failed_count = 0
+        
+        def report_progress(checkpoint: bool = False) -> None:
+            if progress_callback is None:
+                return
+            progress_callback({
+                "total_files": len(doc_records),
+                "processed": processed_count,
+                "failed": failed_count,
+                "skipped": skipped_count,
+                "embedded_chunks": embedded_count,
+                "checkpoint": checkpoint
+            })
+        
+        def delete_vectors(ids: Set[str]) -> None:
+            nonlocal deleted_count, dirty
+            if store is None or not ids:
+                return
+            self._delete_vectors(store, ids)
+            deleted_count += len(ids)
+            dirty = True
+        
+        def checkpoint(final: bool = False) -> None:
+            """Save the partial index as a new version, then mark files whose chunks it contains as completed"""
+            nonlocal batches_since_checkpoint, vectors_since_checkpoint, checkpointed_vectors
+            nonlocal dirty, staged_version
+            if store is not None and dirty:
+                version, version_path = self.versions.create_version()
+                # The approximate and BM25 indexes are built once, for the published version
+                save_store(store, version_path, settings.VECTOR_INDEX_TYPE if final else "flat")
+                dirty = False
+                checkpointed_vectors = store.index.ntotal
+                if not final:
+                    self.versions.stage(version)
+                    staged_version = version
+                else:
+                    self._build_lexical_index(store).save(version_path)
+                    self.versions.publish(version)
+                    staged_version = None
+            elif final and staged_version is not None:
+                # Nothing changed since the last checkpoint; it only lacks the serving indexes
+                staged_path = self.versions.path_for(staged_version)
+                save_ann_index(store.index, staged_path, settings.VECTOR_INDEX_TYPE)
+                self._build_lexical_index(store).save(staged_path)
+                self.versions.publish(staged_version)
+                staged_version = None
+            self.embedding_cache.flush()
+            
+            for file_path in awaiting_checkpoint:
+                doc_records[file_path].status = "completed"
+                doc_records[file_path].processed_at = datetime.utcnow()
+            awaiting_checkpoint.clear()
             db.commit()
             
-            try:
-                # Load and split document
-                documents = self._load_document(file_path)
-                if documents:
-                    chunks = self.text_splitter.split_documents(documents)
-                    all_documents.extend(chunks)
+            batches_since_checkpoint = 0
+            vectors_since_checkpoint = 0
+            report_progress(checkpoint=True)
+        
+        def flush_batch() -> None:
+            """Embed the pending batch, checkpointing when enough was added since the last checkpoint"""
+            nonlocal store, embedded_count, batches_since_checkpoint, vectors_since_checkpoint, dirty
+            if not batch:
+                return
+            
+            current_flushed_ids.update(
+                chunk_id for file_path, _, chunk_id in batch if file_path == current_file
+            )
+            store = self._index_documents(
+                store,
+                [doc for _, doc, _ in batch],
+                [chunk_id for _, _, chunk_id in batch]
+            )
+            embedded_count += len(batch)
+            vectors_since_checkpoint += len(batch)
+            dirty = True
+            batch.clear()
+            
+            batches_since_checkpoint += 1
+            if (
+                batches_since_checkpoint >= settings.RAG_CHECKPOINT_INTERVAL_BATCHES
+                and vectors_since_checkpoint >= checkpointed_vectors * settings.RAG_CHECKPOINT_MIN_GROWTH
+            ):
+                checkpoint()
+        
+        report_progress()
+        
+        try:
+            delete_vectors(removed_ids)
+            
+            for file_path, chunks, error in self._iter_file_chunks(list(doc_records), parallel):
+                doc_record = doc_records[file_path]
+                indexed_ids = ids_by_source.get(file_path, set())
+                current_file = file_path
+                current_flushed_ids.clear()
+                file_ids: Set[str] = set()
+                seen: Dict[str, int] = {}
+                chunk_count = 0
+                
+                try:
+                    for chunk in chunks:
+                        chunk_id = self._chunk_id(chunk, seen)
+                        file_ids.add(chunk_id)
+                        chunk_count += 1
+                        if chunk_id not in indexed_ids:
+                            batch.append((file_path, chunk, chunk_id))
+                            if len(batch) >= settings.RAG_INDEX_BATCH_SIZE:
+                                flush_batch()
+                    if not chunk_count:
+                        error = error or "No content extracted from document"
+                except Exception as e:
+                    error = str(e)
+                
+                if error:
+                    # Drop this file's queued chunks and any of its vectors already flushed
+                    batch[:] = [entry for entry in batch if entry[0] != file_path]
+                    delete_vectors(indexed_ids | current_flushed_ids)
                     
-                    doc_record.chunk_count = len(chunks)
-                    doc_record.status = "completed"
-                    doc_record.processed_at = datetime.utcnow()
-                    processed_count += 1
-                else:
+                    doc_record.chunk_count = 0
                     doc_record.status = "failed"
-                    doc_record.error_message = "No content extracted from document"
+                    doc_record.error_message = error
                     failed_count += 1
-            except Exception as e:
-                doc_record.status = "failed"
-                doc_record.error_message = str(e)
-                failed_count += 1
-                logger.error(f"Error processing {file_path}: {e}")
-            
-            db.commit()
-        
-        # Create or update vector store
-        if all_documents:
-            try:
-                vector_store_path = self._get_vector_store_path()
-                vector_store_path.mkdir(parents=True, exist_ok=True)
+                    logger.error(f"Error processing {file_path}: {error}")
+                    db.commit()
+                    report_progress()
+                    continue
                 
-                if self.vector_store is None or force_reprocess:
-                    self.vector_store = FAISS.from_documents(
-                        all_documents,
-                        self.embeddings
-                    )
-                else:
-                    self.vector_store.add_documents(all_documents)
+                delete_vectors(indexed_ids - file_ids)
+                total_chunks += chunk_count
                 
-                self.vector_store.save_local(str(vector_store_path))
-                logger.info(f"Vector store saved with {len(all_documents)} chunks")
-            except Exception as e:
-                logger.error(f"Error creating vector store: {e}")
-                return {
-                    "success": False,
-                    "message": f"Error creating vector store: {e}",
-                    "processed": processed_count,
-                    "failed": failed_count
-                }
+                doc_record.chunk_count = chunk_count
+                doc_record.content_hash = file_hashes[file_path]
+                awaiting_checkpoint.append(file_path)
+                processed_count += 1
+                report_progress()
+            
+            flush_batch()
+            checkpoint(final=True)
+            
+            current_version = self.versions.current_version()
+            if current_version is not None and current_version != self.vector_store_version:
+                # Serve the published version through the shared read-only mapping
+                # rather than keeping the build's private in-memory copy alive
+                self._activate_version(current_version)
+            logger.info(
+                f"Vector store saved: {embedded_count} chunks embedded, "
+                f"{deleted_count} stale chunks removed"
+            )
+        except Exception as e:
+            logger.error(f"Error creating vector store: {e}")
+            return {
+                "success": False,
+                "message": f"Error creating vector store: {e}",
+                "processed": processed_count,
+                "failed": failed_count
+            }
+        finally:
+            self.embedding_cache.flush()
+        
+        elapsed = time.perf_counter() - started_at
+        docs_per_second = processed_count / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"Ingested {processed_count} documents ({total_chunks} chunks) "
+            f"in {elapsed:.1f}s ({docs_per_second:.2f} docs/s)"
+        )
         
         return {
             "success": True,
-            "message": f"Processed {processed_count} documents, {failed_count} failed",
+            "message": (
+                f"Processed {processed_count} documents, {failed_count} failed, "
+                f"{skipped_count} unchanged, {len(removed_records)} removed"
+            ),
             "processed": processed_count,
             "failed": failed_count,
-            "total_chunks": len(all_documents)
+            "skipped": skipped_count,
+            "removed": len(removed_records),
+            "total_chunks": total_chunks,
+            "embedded_chunks": embedded_count,
+            "deleted_chunks": deleted_count,
+            "embedding_cache": self.embedding_cache.stats(),
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_second": round(docs_per_second, 2)
         }
     
-    def retrieve_context(self, query: str, k: int = 4) -> str:
-        """Retrieve relevant context from vector store"""
-        if self.vector_store is None:
-            return ""
+    def _embed_query(self, query: str, timeout: Optional[float] = None) -> Optional[List[float]]:
+        """Embed a query, giving up after timeout seconds"""
+        future = self._query_executor.submit(
+            self.single_flight.do,
+            "embedding",
+            QueryEmbeddingCache.normalize(query),
+            lambda: self.embeddings.embed_query(query)
+        )
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning(f"Query embedding exceeded {timeout}s, using lexical retrieval only")
+            return None
+    
+    @staticmethod
+    def _document_key(doc: Document) -> str:
+        return doc.id or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    
+    def _query_embedding_timeout(self) -> Optional[float]:
+        """Embedding timeout of retrieval: only bounded when lexical results can be used alone"""
+        use_lexical, _, _ = self._retrieval_plan(settings.RAG_RETRIEVAL_K)
+        return settings.RAG_EMBEDDING_TIMEOUT_SECONDS if use_lexical else None
+    
+    def _retrieval_plan(self, k: int) -> Tuple[bool, bool, int]:
+        """Decide which retrievers to use: (use_lexical, use_vector, fetch_k)"""
+        mode = settings.RAG_RETRIEVAL_MODE
+        use_lexical = mode in ("hybrid", "lexical") and self.lexical_index is not None
+        use_vector = mode in ("hybrid", "vector") or not use_lexical
+        fetch_k = k * 4 if use_lexical and use_vector else k
+        return use_lexical, use_vector, fetch_k
+    
+    @staticmethod
+    def _lexical_search(
+        vector_store: FAISS,
+        lexical_index: BM25Index,
+        query: str,
+        k: int
+    ) -> List[Tuple[Document, float]]:
+        """BM25 search, dropping chunks scored below RAG_MIN_BM25_SCORE"""
+        results = []
+        for doc_id, score in lexical_index.search(query, k):
+            if score < settings.RAG_MIN_BM25_SCORE:
+                break
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                results.append((doc, score))
+        return results
+    
+    @staticmethod
+    def _vector_search(
+        vector_store: FAISS,
+        query_vector: List[float],
+        k: int
+    ) -> List[Tuple[Document, float]]:
+        """
+        Vector search scored by cosine similarity, dropping chunks below RAG_MIN_SIMILARITY
+        
+        The indexes return squared L2 distances; for the unit-length OpenAI embeddings the
+        cosine similarity is 1 - distance / 2.
+        """
+        results = []
+        for doc, distance in vector_store.similarity_search_with_score_by_vector(query_vector, k=k):
+            similarity = 1.0 - float(distance) / 2.0
+            if similarity >= settings.RAG_MIN_SIMILARITY:
+                results.append((doc, similarity))
+        return results
+    
+    def _fuse_rankings(
+        self,
+        ranked_lists: List[List[Tuple[Document, float]]],
+        k: int
+    ) -> List[Tuple[Document, float]]:
+        """Merge ranked result lists with reciprocal-rank fusion, scoring by the fused score"""
+        if not ranked_lists:
+            return []
+        if len(ranked_lists) == 1:
+            return ranked_lists[0][:k]
+        
+        fused_scores: Dict[str, float] = defaultdict(float)
+        documents: Dict[str, Document] = {}
+        for ranked_docs in ranked_lists:
+            for rank, (doc, _) in enumerate(ranked_docs, 1):
+                key = self._document_key(doc)
+                fused_scores[key] += 1.0 / (settings.RAG_RRF_K + rank)
+                documents.setdefault(key, doc)
+        
+        top_keys = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+        return [(documents[key], fused_scores[key]) for key in top_keys]
+    
+    def _retrieve_documents(
+        self,
+        query: str,
+        k: int = 4,
+        query_vector: Optional[List[float]] = None,
+        embed_query: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """
+        Retrieve up to k relevant chunks for a query with their scores
+        
+        RAG_RETRIEVAL_MODE selects vector search, BM25 lexical search, or a hybrid of both
+        merged with reciprocal-rank fusion. Each retriever drops chunks below its own score
+        threshold first, so a hybrid result only holds chunks that passed at least one. In
+        hybrid mode a query embedding that fails or is slower than RAG_EMBEDDING_TIMEOUT_SECONDS
+        is abandoned and the lexical results are used alone. A query_vector computed by the
+        caller is used as is; embed_query=False means the caller already tried to embed the
+        query, so a missing vector is not requested again.
+        """
+        self._refresh_vector_store()
+        # Keep local references so a concurrent version swap cannot affect this call
+        vector_store = self.vector_store
+        lexical_index = self.lexical_index
+        if vector_store is None:
+            return []
+        
+        use_lexical, use_vector, fetch_k = self._retrieval_plan(k)
+        ranked_lists: List[List[Tuple[Document, float]]] = []
+        
+        if use_lexical:
+            ranked_lists.append(self._lexical_search(vector_store, lexical_index, query, fetch_k))
+        
+        if use_vector and query_vector is None and embed_query:
+            try:
+                query_vector = self._embed_query(query, self._query_embedding_timeout())
+            except Exception as e:
+                if not use_lexical:
+                    raise
+                logger.warning(f"Query embedding failed, using lexical retrieval only: {e}")
+                query_vector = None
+        if use_vector and query_vector is not None:
+            ranked_lists.append(self._vector_search(vector_store, query_vector, fetch_k))
+        
+        return self._fuse_rankings(ranked_lists, k)
+    
+    async def _aembed_query(self, query: str, timeout: Optional[float] = None) -> Optional[List[float]]:
+        """Embed a query without blocking the event loop, giving up after timeout seconds"""
+        try:
+            embedding = self.single_flight.ado(
+                "embedding",
+                QueryEmbeddingCache.normalize(query),
+                lambda: self.embeddings.aembed_query(query)
+            )
+            return await asyncio.wait_for(embedding, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Query embedding exceeded {timeout}s, using lexical retrieval only")
+            return None
+    
+    async def _aretrieve_documents(
+        self,
+        query: str,
+        k: int = 4,
+        query_vector: Optional[List[float]] = None,
+        embed_query: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """
+        Async version of _retrieve_documents
+        
+        The query is embedded over the async OpenAI client while the lexical search runs
+        in a worker thread; FAISS searches also run in worker threads.
+        """
+        self._refresh_vector_store()
+        vector_store = self.vector_store
+        lexical_index = self.lexical_index
+        if vector_store is None:
+            return []
+        
+        use_lexical, use_vector, fetch_k = self._retrieval_plan(k)
+        lexical_task = None
+        if use_lexical:
+            lexical_task = asyncio.create_task(asyncio.to_thread(
+                self._lexical_search, vector_store, lexical_index, query, fetch_k
+            ))
         
+        ranked_lists: List[List[Tuple[Document, float]]] = []
+        if use_vector and query_vector is None and embed_query:
+            try:
+                query_vector = await self._aembed_query(query, self._query_embedding_timeout())
+            except Exception as e:
+                if not use_lexical:
+                    raise
+                logger.warning(f"Query embedding failed, using lexical retrieval only: {e}")
+                query_vector = None
+        if use_vector and query_vector is not None:
+            ranked_lists.append(await asyncio.to_thread(
+                self._vector_search, vector_store, query_vector, fetch_k
+            ))
+        if lexical_task is not None:
+            ranked_lists.insert(0, await lexical_task)
+        
+        return self._fuse_rankings(ranked_lists, k)
+    
+    def _retrieval_key(
+        self,
+        query: str,
+        k: int,
+        query_vector: Optional[List[float]],
+        embed_query: bool
+    ) -> tuple:
+        """
+        Single-flight key of a retrieval call
+        
+        Calls that cannot search by vector (no query vector and no embedding allowed) give
+        lexical-only results, so they never share a call with ones that can.
+        """
+        with_vector = query_vector is not None or embed_query
+        return (self.vector_store_version, query, k, with_vector)
+    
+    def retrieve_documents(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        query_vector: Optional[List[float]] = None,
+        embed_query: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """Retrieve relevant chunks with their scores, best first"""
+        k = k or settings.RAG_RETRIEVAL_K
         try:
-            docs = self.vector_store.similarity_search(query, k=k)
-            if not docs:
-                return ""
-            
-            context_parts = []
-            for i, doc in enumerate(docs, 1):
-                source = doc.metadata.get("filename", "Unknown")
-                context_parts.append(f"[Sumber: {source}]\n{doc.page_content}")
-            
-            return "\n\n---\n\n".join(context_parts)
+            return self.single_flight.do(
+                "retrieval",
+                self._retrieval_key(query, k, query_vector, embed_query),
+                lambda: self._retrieve_documents(query, k, query_vector, embed_query)
+            )
         except Exception as e:
             logger.error(f"Error retrieving context: {e}")
-            return ""
+            return []
     
-    def generate_title(self, user_message: str) -> str:
-        """Generate a concise title from user's first message using LLM"""
+    async def aretrieve_documents(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        query_vector: Optional[List[float]] = None,
+        embed_query: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """Retrieve relevant chunks with their scores without blocking the event loop"""
+        k = k or settings.RAG_RETRIEVAL_K
         try:
-            prompt = f"""Buatkan judul yang singkat (maksimal 5 kata) untuk percakapan yang dimulai dengan pertanyaan berikut:
+            return await self.single_flight.ado(
+                "retrieval",
+                self._retrieval_key(query, k, query_vector, embed_query),
+                lambda: self._aretrieve_documents(query, k, query_vector, embed_query)
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return []
+    
+    @staticmethod
+    def _pack_context(scored_docs: List[Tuple[Document, float]], budget: int) -> str:
+        """Format chunks with their source and pack as many as fit in the token budget"""
+        context_parts = []
+        for doc, _ in scored_docs:
+            source = doc.metadata.get("filename", "Unknown")
+            context_parts.append(f"[Sumber: {source}]\n{doc.page_content}")
+        
+        return pack_context(context_parts, budget)
+    
+    def retrieve_context(self, query: str, k: Optional[int] = None) -> str:
+        """Retrieve relevant context from the knowledge base"""
+        return self._pack_context(self.retrieve_documents(query, k), settings.RAG_CONTEXT_TOKEN_BUDGET)
+    
+    async def aretrieve_context(self, query: str, k: Optional[int] = None) -> str:
+        """Retrieve relevant context from the knowledge base without blocking the event loop"""
+        return self._pack_context(await self.aretrieve_documents(query, k), settings.RAG_CONTEXT_TOKEN_BUDGET)
+    
+    TITLE_PROMPT = """Buatkan judul yang singkat (maksimal 5 kata) untuk percakapan yang dimulai dengan pertanyaan berikut:
 
 "{user_message}"
 
@@ -292,50 +967,361 @@ Contoh:
 - Judul: "Cara Menanam Tomat"
 
 Berikan hanya judul saja tanpa penjelasan tambahan."""
-            
-            messages = [HumanMessage(content=prompt)]
+    
+    SUMMARY_CONTEXT_PROMPT = """RINGKASAN PERCAKAPAN SEBELUMNYA:
+{summary}"""
+    
+    SUMMARY_PROMPT = """Perbarui ringkasan percakapan antara pengguna dan PetikSendiri Assistant berikut.
+
+Ringkasan sebelumnya:
+{summary}
+
+Percakapan baru:
+{conversation}
+
+Tulis ringkasan baru dalam bahasa Indonesia, maksimal 120 kata. Pertahankan tanaman, masalah, kondisi kebun dan saran penting yang sudah dibahas agar pertanyaan lanjutan tetap bisa dijawab. Berikan hanya ringkasannya saja."""
+    
+    ERROR_RESPONSE = "Maaf, terjadi kesalahan saat memproses pertanyaan Anda. Silakan coba lagi."
+    
+    @staticmethod
+    def _fallback_title(user_message: str) -> str:
+        """Simple truncation used when the LLM title is unusable"""
+        return user_message[:50] + "..." if len(user_message) > 50 else user_message
+    
+    def _clean_title(self, title: str, user_message: str) -> str:
+        title = title.strip()
+        # Fallback if title is too long
+        if len(title) > 50:
+            title = user_message[:50] + "..."
+        return title
+    
+    def generate_title(self, user_message: str) -> str:
+        """Generate a concise title from user's first message using LLM"""
+        try:
+            messages = [HumanMessage(content=self.TITLE_PROMPT.format(user_message=user_message))]
             response = self.llm.invoke(messages)
-            title = response.content.strip()
-            
-            # Fallback if title is too long
-            if len(title) > 50:
-                title = user_message[:50] + "..."
-            
-            return title
+            return self._clean_title(response.content, user_message)
         except Exception as e:
             logger.error(f"Error generating title: {e}")
-            # Fallback to simple truncation
-            return user_message[:50] + "..." if len(user_message) > 50 else user_message
+            return self._fallback_title(user_message)
     
-    def generate_response(
+    async def agenerate_title(self, user_message: str) -> str:
+        """Async version of generate_title"""
+        try:
+            messages = [HumanMessage(content=self.TITLE_PROMPT.format(user_message=user_message))]
+            response = await self.llm.ainvoke(messages)
+            return self._clean_title(response.content, user_message)
+        except Exception as e:
+            logger.error(f"Error generating title: {e}")
+            return self._fallback_title(user_message)
+    
+    def _build_messages(
         self,
         user_message: str,
-        chat_history: List[Tuple[str, str]] = None
-    ) -> str:
-        """Generate a response using RAG"""
-        # Retrieve context
-        context = self.retrieve_context(user_message)
+        scored_docs: List[Tuple[Document, float]],
+        chat_history: Optional[List[Tuple[str, str]]],
+        summary: Optional[str] = None
+    ) -> list:
+        """
+        Build the system prompt, context, conversation summary, recent history and current
+        message for the LLM
+        
+        Everything shares RAG_PROMPT_TOKEN_BUDGET: the system prompt, the summary and the
+        question are counted first, context chunks are packed into what is left (at most
+        RAG_CONTEXT_TOKEN_BUDGET), and the most recent history exchanges that still fit
+        are kept.
+        """
+        summary_prompt = self.SUMMARY_CONTEXT_PROMPT.format(summary=summary) if summary else ""
+        fixed_tokens = (
+            count_tokens(self.SYSTEM_PROMPT)
+            + count_tokens(summary_prompt)
+            + count_tokens(user_message)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        remaining = max(0, settings.RAG_PROMPT_TOKEN_BUDGET - fixed_tokens)
+        context = self._pack_context(scored_docs, min(settings.RAG_CONTEXT_TOKEN_BUDGET, remaining))
+        remaining -= count_tokens(context)
         
-        # Build messages
         messages = [
             SystemMessage(content=self.SYSTEM_PROMPT.format(context=context if context else "Tidak ada konteks tersedia."))
         ]
+        if summary_prompt:
+            messages.append(SystemMessage(content=summary_prompt))
         
         # Add chat history
         if chat_history:
-            for human_msg, ai_msg in chat_history[-5:]:  # Last 5 exchanges
+            for human_msg, ai_msg in trim_history(chat_history[-5:], remaining):  # Last 5 exchanges
                 messages.append(HumanMessage(content=human_msg))
                 messages.append(AIMessage(content=ai_msg))
         
         # Add current message
         messages.append(HumanMessage(content=user_message))
+        return messages
+    
+    @staticmethod
+    def _messages_key(messages: list) -> str:
+        """Identify a prompt by the type and content of its messages"""
+        payload = json.dumps([(message.type, message.content) for message in messages], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _complete(self, messages: list):
+        """Chat completion shared with identical concurrent prompts"""
+        return self.single_flight.do(
+            "completion", self._messages_key(messages), lambda: self.llm.invoke(messages)
+        )
+    
+    async def _acomplete(self, messages: list):
+        """Async chat completion shared with identical concurrent prompts"""
+        return await self.single_flight.ado(
+            "completion", self._messages_key(messages), lambda: self.llm.ainvoke(messages)
+        )
+    
+    def _canned_response(
+        self,
+        user_message: str,
+        chat_history: Optional[List[Tuple[str, str]]] = None,
+        summary: Optional[str] = None
+    ) -> Optional[str]:
+        """Fixed answer for greetings, identity and off-topic questions, skipping retrieval and the LLM"""
+        if not settings.RAG_INTENT_FAST_PATH:
+            return None
+        has_history = bool(chat_history) or bool(summary)
+        return self.intent_classifier.canned_response(user_message, has_history)
+    
+    @staticmethod
+    def _use_response_cache(
+        user_message: str,
+        chat_history: Optional[List[Tuple[str, str]]],
+        summary: Optional[str] = None
+    ) -> bool:
+        """
+        Whether to look up the response cache for a question
+        
+        Lookups need the query embedding, so they are skipped in lexical mode where
+        retrieval does not embed the query.
+        """
+        has_history = bool(chat_history) or bool(summary)
+        return (
+            settings.RESPONSE_CACHE_ENABLED
+            and settings.RAG_RETRIEVAL_MODE != "lexical"
+            and is_history_independent(user_message, has_history)
+        )
+    
+    @staticmethod
+    def _store_in_response_cache(
+        query_vector: Optional[List[float]],
+        chat_history: Optional[List[Tuple[str, str]]],
+        summary: Optional[str] = None
+    ) -> bool:
+        """Only answers generated without any conversation in the prompt are shared between users"""
+        return query_vector is not None and not chat_history and not summary
+    
+    def generate_response(
+        self,
+        user_message: str,
+        chat_history: List[Tuple[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        """
+        Generate a response using RAG
+        
+        Questions that do not depend on the chat history are answered from the semantic
+        response cache when a similar enough question was answered on the same vector
+        store version. The query embedding of the lookup is reused for retrieval, and only
+        answers generated without history or summary are stored.
+        """
+        canned_response = self._canned_response(user_message, chat_history, summary)
+        if canned_response is not None:
+            return canned_response
+        
+        started_at = time.perf_counter()
+        query_vector = None
+        version = None
+        use_cache = self._use_response_cache(user_message, chat_history, summary)
+        if use_cache:
+            try:
+                self._refresh_vector_store()
+                version = self.vector_store_version
+                query_vector = self._embed_query(user_message, self._query_embedding_timeout())
+            except Exception as e:
+                logger.warning(f"Skipping response cache: {e}")
+            if query_vector is not None:
+                cached_response = self.response_cache.lookup(query_vector, user_message, version)
+                if cached_response is not None:
+                    return cached_response
+        
+        scored_docs = self.retrieve_documents(
+            user_message, query_vector=query_vector, embed_query=not use_cache
+        )
+        messages = self._build_messages(user_message, scored_docs, chat_history, summary)
         
         try:
-            response = self.llm.invoke(messages)
-            return response.content
+            response = self._complete(messages)
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return self.ERROR_RESPONSE
+        
+        if self._store_in_response_cache(query_vector, chat_history, summary):
+            self.response_cache.store(
+                query_vector,
+                user_message,
+                response.content,
+                time.perf_counter() - started_at,
+                version
+            )
+        return response.content
+    
+    async def _alookup_response_cache(
+        self,
+        user_message: str
+    ) -> Tuple[Optional[List[float]], Optional[str], Optional[str]]:
+        """Look up the response cache: (query_vector, version, cached_response)"""
+        query_vector = None
+        version = None
+        try:
+            self._refresh_vector_store()
+            version = self.vector_store_version
+            query_vector = await self._aembed_query(user_message, self._query_embedding_timeout())
+        except Exception as e:
+            logger.warning(f"Skipping response cache: {e}")
+        if query_vector is None:
+            return None, None, None
+        return query_vector, version, self.response_cache.lookup(query_vector, user_message, version)
+    
+    async def agenerate_response(
+        self,
+        user_message: str,
+        chat_history: List[Tuple[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> str:
+        """Async version of generate_response, using the async OpenAI client throughout"""
+        canned_response = self._canned_response(user_message, chat_history, summary)
+        if canned_response is not None:
+            return canned_response
+        
+        started_at = time.perf_counter()
+        query_vector, version, cached_response = None, None, None
+        use_cache = self._use_response_cache(user_message, chat_history, summary)
+        if use_cache:
+            query_vector, version, cached_response = await self._alookup_response_cache(user_message)
+        if cached_response is not None:
+            return cached_response
+        
+        scored_docs = await self.aretrieve_documents(
+            user_message, query_vector=query_vector, embed_query=not use_cache
+        )
+        messages = self._build_messages(user_message, scored_docs, chat_history, summary)
+        
+        try:
+            response = await self._acomplete(messages)
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            return "Maaf, terjadi kesalahan saat memproses pertanyaan Anda. Silakan coba lagi."
+            return self.ERROR_RESPONSE
+        
+        if self._store_in_response_cache(query_vector, chat_history, summary):
+            self.response_cache.store(
+                query_vector,
+                user_message,
+                response.content,
+                time.perf_counter() - started_at,
+                version
+            )
+        return response.content
+    
+    async def astream_response(
+        self,
+        user_message: str,
+        chat_history: List[Tuple[str, str]] = None,
+        summary: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a RAG response token by token
+        
+        A canned or cached answer is yielded as a single chunk. If the model fails before producing
+        anything the error response is yielded instead; a failure mid-stream ends the
+        stream early and the partial answer is not cached.
+        """
+        canned_response = self._canned_response(user_message, chat_history, summary)
+        if canned_response is not None:
+            yield canned_response
+            return
+        
+        started_at = time.perf_counter()
+        query_vector, version, cached_response = None, None, None
+        use_cache = self._use_response_cache(user_message, chat_history, summary)
+        if use_cache:
+            query_vector, version, cached_response = await self._alookup_response_cache(user_message)
+        if cached_response is not None:
+            yield cached_response
+            return
+        
+        scored_docs = await self.aretrieve_documents(
+            user_message, query_vector=query_vector, embed_query=not use_cache
+        )
+        messages = self._build_messages(user_message, scored_docs, chat_history, summary)
+        
+        parts: List[str] = []
+        try:
+            async for chunk in self.llm.astream(messages):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            if not parts:
+                yield self.ERROR_RESPONSE
+            return
+        
+        if self._store_in_response_cache(query_vector, chat_history, summary):
+            self.response_cache.store(
+                query_vector,
+                user_message,
+                "".join(parts),
+                time.perf_counter() - started_at,
+                version
+            )
+    
+    async def asummarize_conversation(
+        self,
+        previous_summary: Optional[str],
+        exchanges: List[Tuple[str, str]]
+    ) -> Optional[str]:
+        """Fold exchanges into a conversation summary, returning None if the LLM call fails"""
+        conversation = "\n".join(
+            f"Pengguna: {human_msg}\nAsisten: {ai_msg}" for human_msg, ai_msg in exchanges
+        )
+        prompt = self.SUMMARY_PROMPT.format(
+            summary=previous_summary or "Belum ada.",
+            conversation=conversation
+        )
+        try:
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            return response.content.strip()
+        except Exception as e:
+            logger.error(f"Error summarizing conversation: {e}")
+            return None
+    
+    def get_index_report(self, k: int = 4, sample_size: int = 200) -> dict:
+        """Compare recall and latency of approximate index types against the flat index"""
+        version = self.versions.current_version()
+        if version is None:
+            return {"vector_store_version": None, "vectors": 0, "indexes": []}
+        
+        flat_index = load_flat_index(self.versions.path_for(version))
+        report = compare_index_types(flat_index, INDEX_TYPES, k=k, sample_size=sample_size)
+        report["vector_store_version"] = version
+        report["configured_index_type"] = settings.VECTOR_INDEX_TYPE
+        return report
+    
+    def get_cache_stats(self) -> dict:
+        """Get hit/miss counters of the caches, the intent fast path and call coalescing"""
+        return {
+            "query_embedding_cache": self.query_embedding_cache.stats(),
+            "document_embedding_cache": self.embedding_cache.stats(),
+            "response_cache": self.response_cache.stats(),
+            "intent_fast_path": self.intent_classifier.stats(),
+            "single_flight": self.single_flight.stats()
+        }
     
     def get_knowledge_base_stats(self, db: Session) -> dict:
         """Get statistics about the knowledge base"""
@@ -344,7 +1330,7 @@ Berikan hanya judul saja tanpa penjelasan tambahan."""
         total_documents = len(documents)
         total_chunks = sum(doc.chunk_count for doc in documents if doc.status == "completed")
         
-        vector_store_exists = (self._get_vector_store_path() / "index.faiss").exists()
+        current_version = self.versions.current_version()
         
         last_processed = db.query(ProcessedDocument).filter(
             ProcessedDocument.status == "completed"
@@ -353,7 +1339,8 @@ Berikan hanya judul saja tanpa penjelasan tambahan."""
         return {
             "total_documents": total_documents,
             "total_chunks": total_chunks,
-            "vector_store_exists": vector_store_exists,
+            "vector_store_exists": current_version is not None,
+            "vector_store_version": current_version,
             "last_updated": last_processed.processed_at if last_processed else None
         }
 
@@ -0,0 +1,178 @@
+"""
+Semantic response cache for PetikSendiri Assistant
+Serves stored answers to questions whose embedding is close to an earlier question
+"""
+import re
+import time
+import threading
+from typing import FrozenSet, List, Optional
+
+import numpy as np
+
+from app.services.bm25_index import tokenize
+
+# Words that make a question depend on earlier turns ("bagaimana caranya?", "kalau yang tadi?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(itu|tersebut|tadi|sebelumnya|barusan|lagi|juga|sama|atas|\w+nya)\b",
+    re.IGNORECASE
+)
+
+
+# Words that phrase a question without changing what it asks about
+QUESTION_WORDS = frozenset("""
+    cara caranya gimana bagaimanakah tolong mohon minta jelaskan sebutkan beri berikan
+    tahu tau info dong sih deh ya kak min admin mau ingin boleh baik benar
+""".split())
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    """Content words of a question, which must match for a cached answer to be served"""
+    return frozenset(tokenize(question)) - QUESTION_WORDS
+
+
+def is_history_independent(user_message: str, has_history: bool) -> bool:
+    """Check whether a question can be answered without the conversation so far"""
+    if not has_history:
+        return True
+    return FOLLOW_UP_PATTERN.search(user_message) is None
+
+
+class SemanticResponseCache:
+    """
+    Cache of answers keyed by query embedding
+
+    A lookup hits when the cosine similarity to a stored question reaches the threshold
+    and both questions have the same key terms. Embeddings of questions that differ in
+    one word ("cara menanam cabai" and "cara menanam tomat") can score above any usable
+    threshold, so the similarity alone does not decide a hit. Entries belong to one
+    vector store version and are dropped when it changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        similarity_threshold: float,
+        ttl_seconds: float = 0
+    ):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._terms: List[FrozenSet[str]] = []
+        self._answers: List[str] = []
+        self._latencies: List[float] = []
+        self._stored_at: List[float] = []
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def _reset(self, version: Optional[str]) -> None:
+        self._version = version
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._terms = []
+        self._answers = []
+        self._latencies = []
+        self._stored_at = []
+
+    def _find(self, query: np.ndarray, terms: FrozenSet[str]) -> Optional[int]:
+        """Get the most similar entry above the threshold with the same key terms"""
+        if not self._answers:
+            return None
+        similarities = self._vectors @ query
+        for row in np.argsort(-similarities):
+            if similarities[row] < self.similarity_threshold:
+                return None
+            if self._terms[row] == terms:
+                return int(row)
+        return None
+
+    def lookup(
+        self,
+        query_vector: List[float],
+        question: str,
+        version: Optional[str]
+    ) -> Optional[str]:
+        """Get the stored answer of the most similar question, if similar enough"""
+        query = self._normalize(query_vector)
+        terms = key_terms(question)
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+
+            best = self._find(query, terms)
+            expired = (
+                best is not None and self.ttl_seconds
+                and time.monotonic() - self._stored_at[best] > self.ttl_seconds
+            )
+            if best is None or expired:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.saved_seconds += self._latencies[best]
+            return self._answers[best]
+
+    def store(
+        self,
+        query_vector: List[float],
+        question: str,
+        answer: str,
+        latency_seconds: float,
+        version: Optional[str]
+    ) -> None:
+        """Store an answer together with the time it took to generate"""
+        if self.max_entries <= 0:
+            return
+        query = self._normalize(query_vector)
+        terms = key_terms(question)
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+
+            # Concurrent misses on the same question all store its answer; keep one
+            duplicate = self._find(query, terms)
+            if duplicate is not None:
+                self._answers[duplicate] = answer
+                self._latencies[duplicate] = latency_seconds
+                self._stored_at[duplicate] = time.monotonic()
+                return
+
+            if self._answers:
+                self._vectors = np.vstack([self._vectors, query])
+            else:
+                self._vectors = query.reshape(1, -1)
+            self._terms.append(terms)
+            self._answers.append(answer)
+            self._latencies.append(latency_seconds)
+            self._stored_at.append(time.monotonic())
+
+            # Oldest entries go first
+            overflow = len(self._answers) - self.max_entries
+            if overflow > 0:
+                self._vectors = self._vectors[overflow:]
+                del self._terms[:overflow]
+                del self._answers[:overflow]
+                del self._latencies[:overflow]
+                del self._stored_at[:overflow]
+
+    def stats(self) -> dict:
+        """Get hit rate and generation time saved by cache hits"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._answers),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+            "vector_store_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2)
+        }
@@ -0,0 +1,99 @@
+"""
+Single-flight call coalescing for PetikSendiri Assistant
+Concurrent identical calls share one in-flight execution instead of each calling the API
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """An in-flight synchronous call that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same name and key
+
+    The first caller (the leader) executes the call; callers arriving while it is in
+    flight wait for and share its result or exception. Nothing is cached: once the call
+    finishes the next caller executes it again. Threads and coroutines are coalesced
+    separately, with do() and ado() respectively.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, Hashable], _Call] = {}
+        self._tasks: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"executed": 0, "coalesced": 0})
+
+    def _record(self, name: str, leader: bool) -> None:
+        with self._lock:
+            self._counts[name]["executed" if leader else "coalesced"] += 1
+
+    def do(self, name: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for the identical call already running in another thread"""
+        call_key = (name, key)
+        with self._lock:
+            call = self._calls.get(call_key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[call_key] = call
+        self._record(name, leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[call_key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, name: str, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await factory(), or the identical call already in flight on this event loop
+
+        The shared call runs as its own task, so a caller that is cancelled or times out
+        does not cancel it for the others.
+        """
+        call_key = (name, key)
+        task = self._tasks.get(call_key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(factory())
+            self._tasks[call_key] = task
+            task.add_done_callback(lambda done: self._finish_task(call_key, done))
+        self._record(name, leader)
+        return await asyncio.shield(task)
+
+    def _finish_task(self, call_key: Tuple[str, Hashable], task: asyncio.Future) -> None:
+        if self._tasks.get(call_key) is task:
+            del self._tasks[call_key]
+        # Mark the exception retrieved in case every caller gave up waiting
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Get executed and coalesced call counts per call name"""
+        with self._lock:
+            counts = {name: dict(values) for name, values in self._counts.items()}
+        for values in counts.values():
+            total = values["executed"] + values["coalesced"]
+            values["coalesced_rate"] = round(values["coalesced"] / total, 4) if total else 0.0
+        return counts
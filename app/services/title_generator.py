@@ -0,0 +1,70 @@
+"""
+Local title generation for PetikSendiri Assistant chat sessions
+Builds a short title from the keywords of the first message, without a network call
+"""
+import re
+from typing import List
+
+from app.services.bm25_index import STOPWORDS
+
+WORD_PATTERN = re.compile(r"[^\W\d_][\w-]*", re.UNICODE)
+
+# Question words, requests and greetings that never belong in a title
+FILLER_WORDS = frozenset("""
+    halo hai hi hello selamat pagi siang sore malam permisi tolong mohon minta coba
+    gimana bagaimanakah apakah siapa dimana di mana kapan berapa mana boleh ingin mau
+    pengen pingin jelaskan jelaskanlah sebutkan berikan kasih beri tahu tau info dong
+    ya yah sih deh kak min admin bang mas mbak gan terima kasih makasih nggak gak enggak
+""".split())
+
+MIN_TITLE_WORDS = 3
+
+
+def _keyword_runs(text: str) -> List[List[str]]:
+    """Split text into runs of consecutive content words, in order of appearance"""
+    runs: List[List[str]] = [[]]
+    for word in WORD_PATTERN.findall(text):
+        lower = word.lower()
+        if len(lower) < 2 or lower in STOPWORDS or lower in FILLER_WORDS:
+            if runs[-1]:
+                runs.append([])
+            continue
+        runs[-1].append(word)
+    return [run for run in runs if run]
+
+
+def _title_case(word: str) -> str:
+    # Keep acronyms such as NPK or pH as written
+    if any(char.isupper() for char in word[1:]):
+        return word
+    return word[:1].upper() + word[1:].lower()
+
+
+def extract_title(user_message: str, max_words: int = 5, max_length: int = 50) -> str:
+    """
+    Build a title from the first message of a conversation
+
+    Indonesian noun phrases put the head first ("cara menanam tomat"), so the first run
+    of consecutive content words is the core of the title. Following runs are added while
+    the title is shorter than MIN_TITLE_WORDS, up to max_words. Falls back to truncating
+    the message when it has no content words.
+    """
+    words: List[str] = []
+    seen = set()
+    for run in _keyword_runs(user_message):
+        if len(words) >= MIN_TITLE_WORDS:
+            break
+        for word in run:
+            if len(words) >= max_words:
+                break
+            if word.lower() in seen:
+                continue
+            seen.add(word.lower())
+            words.append(_title_case(word))
+
+    title = " ".join(words)
+    if not title:
+        title = user_message.strip()
+    if len(title) > max_length:
+        title = title[:max_length].rstrip() + "..."
+    return title
@@ -0,0 +1,61 @@
+"""
+Prompt token budgeting for PetikSendiri Assistant
+Counts tokens locally with tiktoken and packs context and history into a fixed budget
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+from app.core.config import settings
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens of a text for the chat model"""
+    if not text:
+        return 0
+    return len(_encoding(model or settings.OPENAI_MODEL).encode(text, disallowed_special=()))
+
+
+def pack_context(parts: List[str], budget: int) -> str:
+    """
+    Join context parts, best first, until the token budget is used up
+
+    A part that does not fit is skipped so a shorter, lower-ranked one can still be used.
+    """
+    packed: List[str] = []
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    remaining = budget
+    for part in parts:
+        cost = count_tokens(part) + (separator_tokens if packed else 0)
+        if cost > remaining:
+            continue
+        packed.append(part)
+        remaining -= cost
+    return CONTEXT_SEPARATOR.join(packed)
+
+
+def trim_history(history: List[Tuple[str, str]], budget: int) -> List[Tuple[str, str]]:
+    """Keep the most recent (human, ai) exchanges that fit in the token budget"""
+    kept: List[Tuple[str, str]] = []
+    remaining = budget
+    for human_msg, ai_msg in reversed(history):
+        cost = count_tokens(human_msg) + count_tokens(ai_msg) + 2 * MESSAGE_OVERHEAD_TOKENS
+        if cost > remaining:
+            break
+        kept.append((human_msg, ai_msg))
+        remaining -= cost
+    kept.reverse()
+    return kept
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from app.models.user import User
@@ -12,6 +14,12 @@ class UserService:
         """Get user by ID."""
         return db.query(User).filter(User.id == user_id).first()
     
+    @staticmethod
+    async def aget_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+        """Get user by ID using an async session."""
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
+    
     @staticmethod
     def get_by_email(db: Session, email: str) -> Optional[User]:
         """Get user by email."""
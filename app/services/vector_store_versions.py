@@ -0,0 +1,120 @@
+"""
+Versioned on-disk layout for the PetikSendiri vector store
+Each build writes a new version directory and publishes it by atomically replacing a pointer file
+"""
+import os
+import uuid
+import shutil
+import logging
+from typing import List, Optional, Tuple
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreVersions:
+    """
+    Manage vector store versions under a root directory
+
+    Layout:
+        <root>/versions/<version>/   one complete saved index per version
+        <root>/CURRENT               name of the published version
+        <root>/STAGING               name of an unpublished checkpoint of an interrupted build
+    """
+
+    CURRENT_FILE = "CURRENT"
+    STAGING_FILE = "STAGING"
+    VERSIONS_DIR = "versions"
+    # Index saved directly in the root by releases before versioning
+    LEGACY_VERSION = "legacy"
+
+    def __init__(self, root: Path, keep_versions: int = 3):
+        self.root = Path(root)
+        self.keep_versions = keep_versions
+
+    def _read_pointer(self, filename: str) -> Optional[str]:
+        try:
+            version = (self.root / filename).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def _write_pointer(self, filename: str, version: str) -> None:
+        """Atomically replace a pointer file"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f"{filename}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.root / filename)
+
+    def current_version(self) -> Optional[str]:
+        """Get the published version, if any"""
+        version = self._read_pointer(self.CURRENT_FILE)
+        if version is None and (self.root / "index.faiss").exists():
+            return self.LEGACY_VERSION
+        return version
+
+    def staging_version(self) -> Optional[str]:
+        """Get the checkpoint of an unfinished build that has not been published"""
+        return self._read_pointer(self.STAGING_FILE)
+
+    def path_for(self, version: str) -> Path:
+        """Get the directory holding a version"""
+        if version == self.LEGACY_VERSION:
+            return self.root
+        return self.root / self.VERSIONS_DIR / version
+
+    def create_version(self) -> Tuple[str, Path]:
+        """Allocate a new, empty version directory"""
+        version = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        path = self.path_for(version)
+        path.mkdir(parents=True, exist_ok=False)
+        return version, path
+
+    def stage(self, version: str) -> None:
+        """Record a checkpoint without publishing it, dropping the checkpoint it supersedes"""
+        previous = self.staging_version()
+        self._write_pointer(self.STAGING_FILE, version)
+        if previous is not None and previous != version and previous != self.current_version():
+            shutil.rmtree(self.path_for(previous), ignore_errors=True)
+
+    def clear_staging(self) -> None:
+        """Forget the staged checkpoint"""
+        try:
+            (self.root / self.STAGING_FILE).unlink()
+        except FileNotFoundError:
+            pass
+
+    def publish(self, version: str) -> None:
+        """Make a version current for every worker and drop old versions"""
+        self._write_pointer(self.CURRENT_FILE, version)
+        if self.staging_version() == version:
+            self.clear_staging()
+        logger.info(f"Published vector store version {version}")
+        self.collect_garbage()
+
+    def list_versions(self) -> List[str]:
+        """List stored versions, oldest first"""
+        versions_path = self.root / self.VERSIONS_DIR
+        if not versions_path.exists():
+            return []
+        return sorted(path.name for path in versions_path.iterdir() if path.is_dir())
+
+    def collect_garbage(self) -> None:
+        """
+        Delete old versions, keeping the current and staged ones plus the newest keep_versions
+
+        Recently replaced versions are kept so workers that have not swapped yet can still load them.
+        """
+        protected = {self.current_version(), self.staging_version()}
+        versions = self.list_versions()
+        recent = set(versions[-self.keep_versions:]) if self.keep_versions > 0 else set()
+
+        for version in versions:
+            if version in protected or version in recent:
+                continue
+            shutil.rmtree(self.path_for(version), ignore_errors=True)
+            logger.info(f"Removed old vector store version {version}")
@@ -0,0 +1,14 @@
+"""
+Shared test setup
+
+Settings are read when app.core.config is first imported, so the required variables
+get placeholder values here. Tests never connect to the database.
+"""
+import os
+
+os.environ.setdefault("DATABASE_HOST", "localhost")
+os.environ.setdefault("DATABASE_PORT", "5432")
+os.environ.setdefault("DATABASE_USER", "petiksendiri")
+os.environ.setdefault("DATABASE_PASSWORD", "petiksendiri")
+os.environ.setdefault("DATABASE_NAME", "petiksendiri_test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
@@ -0,0 +1,46 @@
+from app.services.bm25_index import BM25Index, tokenize
+
+DOC_IDS = ["cabai", "tomat", "pupuk"]
+TEXTS = [
+    "Cabai rawit ditanam di polybag dengan media tanah dan kompos",
+    "Tomat cherry perlu disiram setiap pagi dan diberi ajir",
+    "Pupuk NPK mutiara diberikan dua minggu sekali untuk cabai dan tomat",
+]
+
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("Bagaimana cara menanam cabai di pot?") == ["cara", "menanam", "cabai", "pot"]
+
+
+def test_search_ranks_exact_term_matches_first():
+    index = BM25Index.build(DOC_IDS, TEXTS)
+
+    results = index.search("npk mutiara", k=3)
+
+    assert [doc_id for doc_id, _ in results] == ["pupuk"]
+    assert results[0][1] > 0
+
+
+def test_search_prefers_rarer_terms():
+    index = BM25Index.build(DOC_IDS, TEXTS)
+
+    ranked = [doc_id for doc_id, _ in index.search("cabai rawit", k=3)]
+
+    assert ranked == ["cabai", "pupuk"]
+
+
+def test_search_without_matches_or_documents():
+    assert BM25Index.build(DOC_IDS, TEXTS).search("anggrek", k=3) == []
+    assert BM25Index.build([], []).search("cabai") == []
+
+
+def test_saved_index_loads_with_same_results(tmp_path):
+    index = BM25Index.build(DOC_IDS, TEXTS)
+    assert not BM25Index.exists(tmp_path)
+
+    index.save(tmp_path)
+    loaded = BM25Index.load(tmp_path)
+
+    assert BM25Index.exists(tmp_path)
+    assert len(loaded) == 3
+    assert loaded.search("tomat pagi", k=2) == index.search("tomat pagi", k=2)
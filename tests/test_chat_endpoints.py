@@ -0,0 +1,124 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat
+from app.api.v1.endpoints.chat import _sse_event
+from app.core.pagination import decode_rank_cursor, encode_rank_cursor
+
+
+def _parse_sse(event: str):
+    lines = event.rstrip("\n").split("\n")
+    assert lines[0].startswith("event: ") and lines[1].startswith("data: ")
+    return lines[0][len("event: "):], json.loads(lines[1][len("data: "):])
+
+
+def test_sse_token_event():
+    event = _sse_event("token", {"content": "Siram pagi"})
+
+    assert event.endswith("\n\n")
+    assert _parse_sse(event) == ("token", {"content": "Siram pagi"})
+
+
+def test_sse_done_event_serializes_saved_message():
+    message = SimpleNamespace(
+        id=7,
+        role="assistant",
+        content="Siram pagi hari.",
+        created_at=datetime(2026, 10, 17, 8, 30, tzinfo=timezone.utc)
+    )
+
+    name, data = _parse_sse(_sse_event("done", {"message": message, "title": "Menyiram Cabai"}))
+
+    assert name == "done"
+    assert data == {
+        "message": {
+            "id": 7,
+            "role": "assistant",
+            "content": "Siram pagi hari.",
+            "created_at": "2026-10-17T08:30:00Z"
+        },
+        "title": "Menyiram Cabai"
+    }
+
+
+def _client(db=None):
+    """Client for the chat router with user 1 signed in and the given database session"""
+    async def get_user():
+        return SimpleNamespace(id=1, is_superuser=False)
+
+    async def get_db():
+        yield db
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[chat.get_current_active_user_async] = get_user
+    app.dependency_overrides[chat.get_async_db] = get_db
+    return TestClient(app)
+
+
+def test_send_returns_404_when_session_is_deleted_mid_request(monkeypatch):
+    async def process_message(db, session_id, user_message, user_id=None):
+        return SimpleNamespace(session_id=session_id), None, False
+
+    monkeypatch.setattr(chat.ChatService, "process_message", staticmethod(process_message))
+
+    response = _client().post("/chat/send", json={"message": "kapan cabai disiram?", "session_id": "abc"})
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Chat session not found"}
+
+
+def test_delete_all_sessions_returns_deleted_count(monkeypatch):
+    deleted_for = []
+
+    async def delete_user_sessions(db, user_id):
+        deleted_for.append(user_id)
+        return 3
+
+    monkeypatch.setattr(chat.ChatService, "delete_user_sessions", staticmethod(delete_user_sessions))
+
+    response = _client().delete("/chat/sessions")
+
+    assert response.status_code == 200
+    assert response.json() == {"deleted_count": 3}
+    assert deleted_for == [1]
+
+
+def test_search_passes_decoded_cursor_and_returns_next_cursor(monkeypatch):
+    calls = []
+    row = SimpleNamespace(
+        id=12,
+        session_id="abc",
+        session_title="Menyiram Cabai",
+        role="assistant",
+        snippet="Siram <mark>cabai</mark> pagi hari.",
+        rank=0.5,
+        created_at=datetime(2026, 10, 17, 8, 30, tzinfo=timezone.utc)
+    )
+
+    async def search_messages(db, user_id, query, limit=20, cursor=None):
+        calls.append((user_id, query, limit, cursor))
+        return [row], (0.5, 12)
+
+    monkeypatch.setattr(chat.ChatService, "search_messages", staticmethod(search_messages))
+
+    response = _client().get(
+        "/chat/search", params={"q": "cabai", "limit": 1, "cursor": encode_rank_cursor(0.7, 20)}
+    )
+
+    assert response.status_code == 200
+    assert calls == [(1, "cabai", 1, (0.7, 20))]
+    body = response.json()
+    assert body["results"][0]["message_id"] == 12
+    assert body["results"][0]["snippet"] == "Siram <mark>cabai</mark> pagi hari."
+    assert decode_rank_cursor(body["next_cursor"]) == (0.5, 12)
+
+
+def test_search_rejects_malformed_cursor():
+    response = _client().get("/chat/search", params={"q": "cabai", "cursor": "bukan-cursor!"})
+
+    assert response.status_code == 400
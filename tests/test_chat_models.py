@@ -0,0 +1,29 @@
+from sqlalchemy import Computed
+
+from app.models.chat import SEARCH_CONFIG, ChatMessage, ChatSession
+
+
+def test_message_foreign_key_cascades_session_deletes():
+    foreign_key, = ChatMessage.__table__.c.session_id.foreign_keys
+
+    assert foreign_key.column is ChatSession.__table__.c.id
+    assert foreign_key.ondelete == "CASCADE"
+
+
+def test_deleting_a_session_does_not_load_its_messages():
+    messages = ChatSession.messages.property
+
+    assert messages.passive_deletes is True
+    assert messages.cascade.delete_orphan
+
+
+def test_search_vector_is_generated_by_the_database():
+    column = ChatMessage.__table__.c.content_tsv
+
+    assert isinstance(column.computed, Computed)
+    assert column.computed.persisted is True
+    assert f"to_tsvector('{SEARCH_CONFIG}', content)" in str(column.computed.sqltext)
+
+
+def test_search_vector_is_not_loaded_with_messages():
+    assert ChatMessage.content_tsv.property.deferred is True
@@ -0,0 +1,40 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from app.services.chat_retention_service import PARTITION_NAME_PATTERN, ChatRetentionService
+
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2026, 1, 1), 1, date(2026, 2, 1)),
+    (date(2026, 12, 1), 1, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 3, 1), -15, date(2024, 12, 1)),
+    (date(2026, 3, 1), 0, date(2026, 3, 1)),
+])
+def test_add_months(month, months, expected):
+    assert ChatRetentionService._add_months(month, months) == expected
+
+
+def test_partition_name_round_trips_through_pattern():
+    name = ChatRetentionService.partition_name(date(2026, 7, 1))
+    assert name == "chat_messages_p202607"
+    assert PARTITION_NAME_PATTERN.match(name).groups() == ("2026", "07")
+
+
+def test_default_partition_does_not_match_pattern():
+    assert PARTITION_NAME_PATTERN.match("chat_messages_default") is None
+
+
+def test_month_start_is_utc():
+    assert ChatRetentionService._month_start(date(2026, 7, 1)) == datetime(2026, 7, 1, tzinfo=timezone.utc)
+
+
+def test_retention_cutoff(monkeypatch):
+    monkeypatch.setattr(ChatRetentionService, "_current_month", staticmethod(lambda: date(2026, 10, 1)))
+    assert ChatRetentionService.retention_cutoff(12) == datetime(2025, 10, 1, tzinfo=timezone.utc)
+    assert ChatRetentionService.retention_cutoff(1) == datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+
+def test_retention_cutoff_keeps_everything_when_disabled():
+    assert ChatRetentionService.retention_cutoff(0) is None
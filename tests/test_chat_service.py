@@ -0,0 +1,250 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.models.chat import MessageRole
+from app.services import chat_service
+from app.services.chat_service import ChatConnection, ChatService
+
+
+def _exchange(human_id, human="tanya", ai="jawab"):
+    return (
+        SimpleNamespace(id=human_id, role=MessageRole.USER, content=f"{human} {human_id}"),
+        SimpleNamespace(id=human_id + 1, role=MessageRole.ASSISTANT, content=f"{ai} {human_id}")
+    )
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    """Capture the arguments of summary updates instead of running them"""
+    calls = []
+
+    def update_summary(*args):
+        calls.append(args)
+        return args
+
+    monkeypatch.setattr(settings, "CHAT_SUMMARY_RECENT_EXCHANGES", 1)
+    monkeypatch.setattr(settings, "CHAT_SUMMARY_EVERY_EXCHANGES", 2)
+    monkeypatch.setattr(ChatService, "_update_summary", staticmethod(update_summary))
+    monkeypatch.setattr(chat_service, "_run_in_background", lambda args: args)
+    return calls
+
+
+def test_summary_waits_until_enough_exchanges(scheduled):
+    session = SimpleNamespace(id=7, summary=None, summary_message_id=None)
+
+    assert ChatService.schedule_summary_update(session, [_exchange(1)]) is None
+    assert scheduled == []
+
+
+def test_summary_folds_all_but_recent_exchanges(scheduled):
+    session = SimpleNamespace(id=7, summary="Ringkasan lama", summary_message_id=0)
+    exchanges = [_exchange(1), _exchange(3)]
+
+    ChatService.schedule_summary_update(session, exchanges)
+
+    # With the turn just answered, 3 exchanges are unsummarized and 1 is kept raw
+    assert scheduled == [(7, "Ringkasan lama", 0, [("tanya 1", "jawab 1"), ("tanya 3", "jawab 3")], 4)]
+
+
+def _connection_with_summary(result):
+    connection = ChatConnection(user_id=1)
+    connection.session = SimpleNamespace(summary=None, summary_message_id=None)
+    connection.exchanges = [_exchange(1), _exchange(3), _exchange(5)]
+
+    async def run():
+        connection._summary_task = asyncio.create_task(asyncio.sleep(0, result))
+        await connection._summary_task
+        connection._apply_summary()
+
+    asyncio.run(run())
+    return connection
+
+
+def test_finished_summary_drops_covered_exchanges():
+    connection = _connection_with_summary(("Ringkasan baru", 4))
+
+    assert connection.session.summary == "Ringkasan baru"
+    assert connection.session.summary_message_id == 4
+    assert [human_msg.id for human_msg, _ in connection.exchanges] == [5]
+    assert connection._summary_task is None
+
+
+def test_failed_summary_keeps_exchanges():
+    connection = _connection_with_summary(None)
+
+    assert connection.session.summary is None
+    assert len(connection.exchanges) == 3
+    assert connection._summary_task is None
+
+
+class FakeDB:
+    """Records executed statements and returns the given rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(scalars=lambda: iter(self.rows))
+
+
+def _message(id, role):
+    return SimpleNamespace(id=id, role=role, content=f"pesan {id}")
+
+
+def test_chat_history_reads_a_bounded_window_after_the_summary(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_WINDOW_MESSAGES", 6)
+    db = FakeDB([])
+    session = SimpleNamespace(id=7, summary_message_id=40)
+
+    asyncio.run(ChatService.get_chat_history(db, session))
+
+    statement = db.statements[0]
+    compiled = statement.compile()
+    assert "chat_messages.id > " in str(compiled)
+    assert 40 in compiled.params.values()
+    assert statement._limit == 6
+
+
+def test_chat_history_pairs_newest_first_rows_in_order():
+    # Newest first, with an unanswered question and an orphan answer at the window edge
+    rows = [
+        _message(6, MessageRole.USER),
+        _message(5, MessageRole.ASSISTANT),
+        _message(4, MessageRole.USER),
+        _message(3, MessageRole.ASSISTANT),
+        _message(2, MessageRole.USER),
+        _message(1, MessageRole.ASSISTANT),
+    ]
+    session = SimpleNamespace(id=7, summary_message_id=None)
+
+    exchanges = asyncio.run(ChatService.get_chat_history(FakeDB(rows), session))
+
+    assert [(human_msg.id, ai_msg.id) for human_msg, ai_msg in exchanges] == [(2, 3), (4, 5)]
+    assert ChatService._history(exchanges) == [("pesan 2", "pesan 3"), ("pesan 4", "pesan 5")]
+
+
+class GoneSessionDB:
+    """A database where every session has been deleted"""
+
+    def __init__(self):
+        self.rolled_back = False
+        self.committed = False
+
+    async def execute(self, statement):
+        return SimpleNamespace(first=lambda: None)
+
+    async def rollback(self):
+        self.rolled_back = True
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_add_message_to_deleted_session_rolls_back():
+    db = GoneSessionDB()
+    session = SimpleNamespace(id=7)
+
+    message = asyncio.run(ChatService.add_message(db, session, MessageRole.ASSISTANT, "Siram pagi hari."))
+
+    assert message is None
+    assert db.rolled_back and not db.committed
+
+
+def test_process_message_stops_when_session_is_gone(monkeypatch):
+    async def prepare_message(db, session_id, user_message, user_id=None):
+        return None, False, []
+
+    async def generate_response(**kwargs):
+        raise AssertionError("no answer is generated for a deleted session")
+
+    monkeypatch.setattr(ChatService, "prepare_message", staticmethod(prepare_message))
+    monkeypatch.setattr(chat_service.rag_service, "agenerate_response", generate_response)
+
+    result = asyncio.run(ChatService.process_message(GoneSessionDB(), "abc", "kapan cabai disiram?", 1))
+
+    assert result == (None, None, False)
+
+
+def test_session_messages_page_walks_back_from_the_newest():
+    # One row past the limit tells that older messages exist
+    rows = [_message(id, MessageRole.USER) for id in (9, 8, 7)]
+    for row in rows:
+        row.created_at = datetime(2026, 10, 17, 8, row.id)
+    session = SimpleNamespace(id=7)
+
+    messages, next_cursor = asyncio.run(ChatService.get_session_messages(FakeDB(rows), session, limit=2))
+
+    assert [message.id for message in messages] == [8, 9]
+    assert next_cursor == (datetime(2026, 10, 17, 8, 8), 8)
+
+
+def test_last_session_messages_page_has_no_cursor():
+    rows = [_message(1, MessageRole.ASSISTANT)]
+    rows[0].created_at = datetime(2026, 10, 17, 8, 0)
+
+    messages, next_cursor = asyncio.run(
+        ChatService.get_session_messages(FakeDB(rows), SimpleNamespace(id=7), limit=2)
+    )
+
+    assert [message.id for message in messages] == [1]
+    assert next_cursor is None
+
+
+class DeleteDB:
+    """Reports rowcount for a DELETE and records the statement"""
+
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=self.rowcount)
+
+    async def commit(self):
+        self.committed = True
+
+
+def test_delete_user_sessions_is_one_statement_for_the_user():
+    db = DeleteDB(rowcount=4)
+
+    deleted_count = asyncio.run(ChatService.delete_user_sessions(db, 9))
+
+    assert deleted_count == 4
+    assert db.committed
+    statement, = db.statements
+    compiled = statement.compile()
+    assert str(compiled).startswith("DELETE FROM chat_sessions WHERE chat_sessions.user_id = ")
+    assert 9 in compiled.params.values()
+
+
+class SearchDB(FakeDB):
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: list(self.rows))
+
+
+def test_search_messages_is_scoped_to_the_user_and_paged_by_rank():
+    rows = [SimpleNamespace(id=id, rank=rank) for id, rank in ((12, 0.9), (8, 0.5), (3, 0.1))]
+    db = SearchDB(rows)
+
+    page, next_cursor = asyncio.run(ChatService.search_messages(db, 9, '"pupuk organik" -kimia', limit=2))
+
+    assert [row.id for row in page] == [12, 8]
+    assert next_cursor == (0.5, 8)
+    compiled = db.statements[0].compile(dialect=postgresql.dialect())
+    sql = str(compiled)
+    assert "websearch_to_tsquery" in sql
+    assert "chat_messages.content_tsv @@ " in sql
+    assert "chat_sessions.user_id = " in sql
+    assert "ts_headline" in sql
+    assert 9 in compiled.params.values()
+    assert '"pupuk organik" -kimia' in compiled.params.values()
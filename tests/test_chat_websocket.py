@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def authenticate(websocket):
+        return SimpleNamespace(id=1, is_superuser=False)
+
+    async def open_session(self, session_id):
+        return SimpleNamespace(session_id=session_id, title="Cara Menanam Cabai")
+
+    monkeypatch.setattr(chat, "_ws_authenticate", authenticate)
+    monkeypatch.setattr(chat.ChatConnection, "open_session", open_session)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    return TestClient(app)
+
+
+def test_non_string_session_id_gets_error_event(client):
+    with client.websocket_connect("/chat/ws") as websocket:
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_json({"type": "session", "session_id": 123})
+        event = websocket.receive_json()
+
+    assert event["type"] == "error"
+    assert "session_id" in event["detail"]
+
+
+def test_valid_session_frame_opens_session(client):
+    with client.websocket_connect("/chat/ws") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "session", "session_id": "abc"})
+        event = websocket.receive_json()
+
+    assert event == {
+        "type": "session",
+        "session_id": "abc",
+        "is_new_session": False,
+        "title": "Cara Menanam Cabai"
+    }
+
+
+@pytest.mark.parametrize("frame, detail", [
+    ({"type": "message", "message": ["halo"]}, "message"),
+    ({"type": "message"}, "message"),
+    ({"type": "message", "message": "   "}, "Message is required"),
+    ({"type": "unknown"}, "Unknown message type"),
+])
+def test_malformed_frames_get_error_events(client, frame, detail):
+    with client.websocket_connect("/chat/ws") as websocket:
+        websocket.receive_json()
+        websocket.send_json(frame)
+        event = websocket.receive_json()
+
+    assert event["type"] == "error"
+    assert detail in event["detail"]
@@ -0,0 +1,55 @@
+import hashlib
+
+from app.services.document_loader import (
+    compute_file_hash,
+    iter_document_chunks,
+    load_document,
+    split_document_file,
+)
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_iter_document_chunks_splits_with_overlap_and_source(tmp_path):
+    text = " ".join(f"kalimat{i}" for i in range(400))
+    file_path = _write(tmp_path / "panduan.txt", text)
+
+    chunks = list(iter_document_chunks(file_path, chunk_size=200, chunk_overlap=50))
+
+    assert len(chunks) > 1
+    assert all(len(chunk.page_content) <= 200 for chunk in chunks)
+    assert all(chunk.metadata["filename"] == "panduan.txt" for chunk in chunks)
+    assert chunks[0].page_content.split()[-1] in chunks[1].page_content
+
+
+def test_iter_document_chunks_skips_unsupported_files(tmp_path):
+    assert list(iter_document_chunks(_write(tmp_path / "data.csv", "a,b"))) == []
+
+
+def test_split_document_file_matches_streaming_chunks(tmp_path):
+    file_path = _write(tmp_path / "pupuk.txt", "pupuk organik " * 300)
+
+    path, chunks, error = split_document_file(file_path, chunk_size=300, chunk_overlap=30)
+
+    assert path == file_path
+    assert error is None
+    streamed = list(iter_document_chunks(file_path, chunk_size=300, chunk_overlap=30))
+    assert [chunk.page_content for chunk in chunks] == [chunk.page_content for chunk in streamed]
+
+
+def test_split_document_file_reports_empty_documents(tmp_path):
+    _, chunks, error = split_document_file(_write(tmp_path / "data.csv", "a,b"))
+    assert chunks == []
+    assert error == "No content extracted from document"
+
+
+def test_load_document_returns_nothing_for_missing_files(tmp_path):
+    assert load_document(str(tmp_path / "missing.txt")) == []
+
+
+def test_compute_file_hash(tmp_path):
+    file_path = _write(tmp_path / "a.txt", "tanam")
+    assert compute_file_hash(file_path) == hashlib.sha256(b"tanam").hexdigest()
@@ -0,0 +1,157 @@
+import asyncio
+
+import numpy as np
+
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache
+
+
+def _vector(value: float, dim: int = 4):
+    return [value] * dim
+
+
+def test_get_many_reports_misses_and_pending_hits(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=100)
+    assert cache.get_many(["a"]) == [None]
+
+    cache.put_many(["a"], [_vector(1.0)])
+    assert cache.get_many(["a", "b"]) == [_vector(1.0), None]
+    assert cache.stats()["hits"] == 1
+
+
+def test_flushed_entries_survive_reload(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=100)
+    cache.put_many(["a", "b"], [_vector(1.0), _vector(2.0)])
+    cache.flush()
+
+    reloaded = EmbeddingCache(tmp_path, max_entries=100)
+    assert len(reloaded) == 2
+    assert reloaded.get_many(["b", "a"]) == [_vector(2.0), _vector(1.0)]
+
+
+def test_flush_appends_segments_instead_of_rewriting(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=1000)
+    cache.put_many([f"text {i}" for i in range(10)], [_vector(i) for i in range(10)])
+    cache.flush()
+    first_segment = sorted(tmp_path.glob("segment-*.vectors.npy"))[0]
+    first_written_at = first_segment.stat().st_mtime_ns
+
+    cache.put_many(["new"], [_vector(99.0)])
+    cache.flush()
+
+    assert cache.stats()["segments"] == 2
+    assert first_segment.stat().st_mtime_ns == first_written_at
+    assert len(EmbeddingCache(tmp_path, max_entries=1000)) == 11
+
+
+def test_similar_sized_segments_are_merged(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=1000)
+    for batch in range(3):
+        texts = [f"text {batch}-{i}" for i in range(10)]
+        cache.put_many(texts, [_vector(batch)] * 10)
+        cache.flush()
+
+    assert cache.stats()["segments"] == 1
+    assert len(cache) == 30
+    assert cache.get_many(["text 0-0", "text 2-9"]) == [_vector(0.0), _vector(2.0)]
+
+
+def test_least_recently_used_entries_are_evicted_past_slack(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=4)
+    for i, text in enumerate(["a", "b", "c", "d"]):
+        cache.put_many([text], [_vector(i)])
+    cache.flush()
+    cache.get_many(["a"])
+    cache.put_many(["e", "f"], [_vector(4.0), _vector(5.0)])
+    cache.flush()
+
+    assert len(cache) == 4
+    assert cache.get_many(["a", "b", "f"]) == [_vector(0.0), None, _vector(5.0)]
+    assert len(EmbeddingCache(tmp_path, max_entries=4)) == 4
+
+
+def test_cache_is_loaded_on_first_use(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=10)
+    cache.put_many(["a"], [_vector(1.0)])
+    cache.flush()
+
+    reloaded = EmbeddingCache(tmp_path, max_entries=10)
+    assert reloaded.stats()["loaded"] is False
+    assert reloaded.stats()["entries"] == 0
+    assert reloaded.get_many(["a"]) == [_vector(1.0)]
+    assert reloaded.stats()["loaded"] is True
+
+
+def test_legacy_single_file_layout_is_loaded(tmp_path):
+    np.save(tmp_path / "vectors.npy", np.ones((1, 4), dtype=np.float32))
+    np.save(tmp_path / "keys.npy", np.array([EmbeddingCache._key("a")], dtype="S64"))
+    np.save(tmp_path / "last_used.npy", np.array([3], dtype=np.int64))
+
+    cache = EmbeddingCache(tmp_path, max_entries=10)
+    assert cache.get_many(["a"]) == [_vector(1.0)]
+    assert not (tmp_path / "vectors.npy").exists()
+
+
+def test_incomplete_segment_is_ignored(tmp_path):
+    cache = EmbeddingCache(tmp_path, max_entries=10)
+    cache.put_many(["a"], [_vector(1.0)])
+    cache.flush()
+    next(tmp_path.glob("segment-*.keys.npy")).unlink()
+
+    assert len(EmbeddingCache(tmp_path, max_entries=10)) == 0
+
+
+def test_query_cache_normalizes_and_evicts():
+    cache = QueryEmbeddingCache(max_entries=1)
+    cache.put("Cara menanam cabai?", [1.0])
+
+    assert cache.get("cara  menanam cabai") == [1.0]
+    cache.put("tomat", [2.0])
+    assert cache.get("cara menanam cabai") is None
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(text))] for text in texts]
+
+
+def test_query_cache_entries_expire_after_ttl():
+    cache = QueryEmbeddingCache(max_entries=10, ttl_seconds=60)
+    cache.put("cabai", [1.0])
+    key = QueryEmbeddingCache.normalize("cabai")
+    stored_at, vector = cache._entries[key]
+    cache._entries[key] = (stored_at - 61, vector)
+
+    assert cache.get("cabai") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_cached_embeddings_embed_each_query_once(tmp_path):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(
+        underlying, EmbeddingCache(tmp_path, max_entries=10), QueryEmbeddingCache(max_entries=10)
+    )
+
+    assert embeddings.embed_query("Cara menanam cabai?") == [19.0]
+    assert embeddings.embed_query("cara menanam cabai") == [19.0]
+    assert asyncio.run(embeddings.aembed_query("CARA MENANAM CABAI")) == [19.0]
+    assert underlying.calls == 1
+
+
+def test_cached_embeddings_embed_only_missing_documents(tmp_path):
+    underlying = CountingEmbeddings()
+    embeddings = CachedEmbeddings(underlying, EmbeddingCache(tmp_path, max_entries=10))
+
+    assert embeddings.embed_documents(["aa", "bbb", "aa"]) == [[2.0], [3.0], [2.0]]
+    assert embeddings.embed_documents(["bbb", "cccc"]) == [[3.0], [4.0]]
+    assert underlying.calls == 2
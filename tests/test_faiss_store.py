@@ -0,0 +1,110 @@
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from app.services.faiss_store import (
+    MmapDocstore,
+    _hold_out_queries,
+    ann_index_file,
+    build_ann_index,
+    compare_index_types,
+    load_store,
+    save_store,
+)
+
+
+def _flat_index(count: int, dim: int = 32) -> faiss.Index:
+    rng = np.random.default_rng(42)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.standard_normal((count, dim)).astype(np.float32))
+    return index
+
+
+def test_held_out_queries_are_not_indexed():
+    flat_index = _flat_index(500)
+    base_index, queries = _hold_out_queries(flat_index, sample_size=20)
+
+    assert len(queries) == 20
+    assert base_index.ntotal == 480
+    distances, _ = base_index.search(queries, 1)
+    assert np.all(distances[:, 0] > 0)
+
+
+def test_held_out_queries_are_at_most_a_tenth_of_the_vectors():
+    _, queries = _hold_out_queries(_flat_index(50), sample_size=200)
+    assert len(queries) == 5
+
+
+def test_compare_index_types_reports_hnsw_recall():
+    report = compare_index_types(_flat_index(1000), ["flat", "hnsw"], k=4, sample_size=50)
+
+    assert report["queries"] == 50
+    assert report["vectors"] == 950
+    assert [entry["index_type"] for entry in report["indexes"]] == ["hnsw"]
+    assert 0.0 <= report["indexes"][0]["recall_at_k"] <= 1.0
+
+
+def test_compare_index_types_without_enough_vectors():
+    report = compare_index_types(_flat_index(5), ["hnsw"])
+    assert report["queries"] == 0
+    assert report["indexes"] == []
+
+
+def test_build_ann_index_keeps_vector_order():
+    flat_index = _flat_index(200)
+    hnsw = build_ann_index(flat_index, "hnsw")
+
+    assert hnsw.ntotal == flat_index.ntotal
+    _, ids = hnsw.search(flat_index.reconstruct_n(0, 10), 1)
+    assert list(ids[:, 0]) == list(range(10))
+
+
+def test_build_ann_index_skips_flat_and_undertrained_ivfpq():
+    flat_index = _flat_index(100)
+    assert build_ann_index(flat_index, "flat") is None
+    assert build_ann_index(flat_index, "ivfpq") is None
+
+
+class _NoEmbeddings:
+    def embed_query(self, text):
+        raise AssertionError("stores are searched by vector in these tests")
+
+
+def _store():
+    texts = ["cara menanam cabai", "pupuk organik cair", "hama kutu daun"]
+    vectors = [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+    metadatas = [{"source": f"{i}.txt", "page": i} for i in range(3)]
+    return FAISS.from_embeddings(
+        list(zip(texts, vectors)), _NoEmbeddings(), metadatas=metadatas, ids=["a", "b", "c"]
+    )
+
+
+def test_saved_store_loads_memory_mapped_and_read_only(tmp_path):
+    save_store(_store(), tmp_path)
+
+    loaded = load_store(tmp_path, _NoEmbeddings(), read_only=True, mmap=True)
+
+    assert isinstance(loaded.docstore, MmapDocstore)
+    doc, _ = loaded.similarity_search_with_score_by_vector([0.0, 1.0], k=1)[0]
+    assert doc.id == "b"
+    assert doc.page_content == "pupuk organik cair"
+    assert doc.metadata == {"source": "1.txt", "page": 1}
+    assert loaded.docstore.search("missing") == "ID missing not found."
+
+
+def test_saved_store_loads_modifiable_copy_for_builds(tmp_path):
+    save_store(_store(), tmp_path)
+
+    loaded = load_store(tmp_path, _NoEmbeddings())
+    loaded.delete(["a"])
+
+    assert loaded.index.ntotal == 2
+    assert [doc_id for doc_id, _ in MmapDocstore(tmp_path).iter_documents()] == ["a", "b", "c"]
+
+
+def test_read_only_store_serves_saved_ann_index(tmp_path):
+    save_store(_store(), tmp_path, index_type="hnsw")
+
+    assert (tmp_path / ann_index_file("hnsw")).exists()
+    loaded = load_store(tmp_path, _NoEmbeddings(), read_only=True, index_type="hnsw")
+    assert isinstance(loaded.index, faiss.IndexHNSWFlat)
@@ -0,0 +1,94 @@
+import pytest
+
+from app.services.intent_classifier import (
+    GREETING,
+    IDENTITY,
+    OFF_TOPIC,
+    IntentClassifier,
+    _stems,
+)
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("text", ["halo", "Hai kak!", "selamat pagi min", "assalamualaikum wr wb"])
+def test_greetings(classifier, text):
+    assert classifier.classify(text) == GREETING
+
+
+@pytest.mark.parametrize("text", ["siapa kamu?", "kamu itu apa", "perkenalkan dirimu"])
+def test_identity_questions(classifier, text):
+    assert classifier.classify(text) == IDENTITY
+
+
+@pytest.mark.parametrize("text", [
+    "siapa presiden pertama indonesia?",
+    "prediksi skor sepak bola malam ini",
+    "saham apa yang bagus dibeli",
+    "tolong ajari coding python",
+])
+def test_off_topic_questions(classifier, text):
+    assert classifier.classify(text) == OFF_TOPIC
+
+
+@pytest.mark.parametrize("text", [
+    "halo, cara menanam cabai di pot bagaimana?",
+    "kenapa daun tomat saya menguning",
+    "pemupukan selada hidroponik",
+    "apa pestisida untuk kutu kebul",
+    "bagaimana cara mengolah tanah di kebun kimia atau organik",
+])
+def test_farming_questions_go_to_rag(classifier, text):
+    assert classifier.classify(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "bola lampu untuk growlight",
+    "film plastik uv untuk atap",
+    "berapa slot netpot di pipa",
+    "cara merawat pacar air",
+    "apakah musik bikin cepat tumbuh",
+    "ramalan cuaca minggu ini",
+    "kopi java",
+])
+def test_farming_senses_of_ambiguous_words_are_not_off_topic(classifier, text):
+    assert classifier.classify(text) is None
+
+
+def test_off_topic_is_not_decided_inside_a_conversation(classifier):
+    assert classifier.classify("kalau saham?", has_history=True) is None
+
+
+def test_greeting_with_question_goes_to_rag(classifier):
+    assert classifier.classify("halo, kapan waktu panen jagung") is None
+
+
+def test_canned_response_only_for_classified_messages(classifier):
+    assert classifier.canned_response("halo")
+    assert classifier.canned_response("cara menyiram anggrek") is None
+
+
+def test_stats_count_fast_path(classifier):
+    classifier.classify("halo")
+    classifier.classify("cara menanam bayam")
+    stats = classifier.stats()
+    assert stats["classified"] == 2
+    assert stats["fast_path_rate"] == 0.5
+
+
+@pytest.mark.parametrize("word, root", [
+    ("menanam", "tanam"),
+    ("pemupukan", "pupuk"),
+    ("penyiraman", "siram"),
+    ("pertumbuhan", "tumbuh"),
+    ("tanamannya", "tanam"),
+])
+def test_stems_find_roots_of_affixed_words(word, root):
+    assert root in _stems(word)
+
+
+def test_stems_do_not_strip_se_prefix():
+    assert "buah" not in _stems("sebuah")
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.knowledge_base_job_service import KnowledgeBaseJobService
+
+
+def _job(status: str, heartbeat_age_seconds=0):
+    heartbeat_at = None
+    if heartbeat_age_seconds is not None:
+        heartbeat_at = datetime.now(timezone.utc) - timedelta(seconds=heartbeat_age_seconds)
+    return SimpleNamespace(status=status, heartbeat_at=heartbeat_at)
+
+
+def test_failed_job_is_resumable():
+    assert KnowledgeBaseJobService.is_resumable(_job("failed"))
+
+
+def test_completed_job_is_not_resumable():
+    assert not KnowledgeBaseJobService.is_resumable(_job("completed"))
+
+
+def test_running_job_with_fresh_heartbeat_is_not_resumable():
+    assert not KnowledgeBaseJobService.is_resumable(_job("running", heartbeat_age_seconds=1))
+
+
+def test_running_job_with_stale_heartbeat_is_resumable():
+    stale = settings.RAG_JOB_STALE_SECONDS + 60
+    assert KnowledgeBaseJobService.is_resumable(_job("running", heartbeat_age_seconds=stale))
+
+
+def test_pending_job_without_heartbeat_is_resumable():
+    assert KnowledgeBaseJobService.is_resumable(_job("pending", heartbeat_age_seconds=None))
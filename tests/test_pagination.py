@@ -0,0 +1,48 @@
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.chat import _decode_cursor
+from app.core.pagination import decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 8, 30, 15, 123456, tzinfo=timezone.utc)
+
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "bukan-cursor!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"t": "kemarin", "id": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"t": "2026-10-17T08:30:00"}').decode(),
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_endpoint_rejects_malformed_cursor_with_400():
+    assert _decode_cursor(None) is None
+
+    with pytest.raises(HTTPException) as exc_info:
+        _decode_cursor("bukan-cursor!")
+
+    assert exc_info.value.status_code == 400
+
+
+def test_rank_cursor_round_trip():
+    assert decode_rank_cursor(encode_rank_cursor(0.0607927, 42)) == (0.0607927, 42)
+
+
+def test_time_cursor_is_not_a_rank_cursor():
+    cursor = encode_cursor(datetime(2026, 10, 17, tzinfo=timezone.utc), 42)
+
+    with pytest.raises(ValueError):
+        decode_rank_cursor(cursor)
@@ -0,0 +1,298 @@
+import asyncio
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.core.config import settings
+from app.services.intent_classifier import GREETING_RESPONSE
+from app.services.rag_service import rag_service
+from app.services.token_budget import count_tokens
+
+
+class FakeEmbeddings:
+    """Embeds a text as [len(text)] and records every batch call"""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def _write_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"dokumen{i}.txt"
+        path.write_text(f"dokumen {i} " + "tanaman sayur " * 200, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def _chunk_texts(results):
+    return {file_path: [chunk.page_content for chunk in chunks] for file_path, chunks, _ in results}
+
+
+def test_parallel_file_chunks_match_sequential(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_INGEST_WORKERS", 2)
+    file_paths = _write_files(tmp_path, 3)
+
+    sequential = list(rag_service._iter_file_chunks(file_paths, parallel=False))
+    parallel = list(rag_service._iter_file_chunks(file_paths, parallel=True))
+
+    assert all(error is None for _, _, error in parallel)
+    assert _chunk_texts(parallel) == _chunk_texts(sequential)
+
+
+def test_parallel_file_chunks_report_failed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_INGEST_WORKERS", 2)
+    file_paths = _write_files(tmp_path, 1) + [str(tmp_path / "missing.txt")]
+
+    errors = {file_path: error for file_path, _, error in rag_service._iter_file_chunks(file_paths, parallel=True)}
+
+    assert errors[file_paths[0]] is None
+    assert errors[file_paths[1]] == "No content extracted from document"
+
+
+def test_embed_texts_batches_concurrently_in_order(monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag_service, "embeddings", embeddings)
+    monkeypatch.setattr(settings, "RAG_EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "RAG_EMBEDDING_CONCURRENCY", 3)
+    texts = ["a" * length for length in range(1, 8)]
+
+    vectors = rag_service._embed_texts(texts)
+
+    assert vectors == [[float(length)] for length in range(1, 8)]
+    assert sorted(len(batch) for batch in embeddings.batches) == [1, 2, 2, 2]
+
+
+def _store(texts_by_source):
+    texts, metadatas, ids = [], [], []
+    for source, texts_of_source in texts_by_source.items():
+        for i, text in enumerate(texts_of_source):
+            texts.append(text)
+            metadatas.append({"source": source})
+            ids.append(f"{source}-{i}")
+    vectors = [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+    return FAISS.from_embeddings(list(zip(texts, vectors)), FakeEmbeddings(), metadatas=metadatas, ids=ids)
+
+
+def test_chunk_id_is_deterministic_and_distinguishes_repeats():
+    chunk = Document(page_content="siram pagi hari", metadata={"source": "a.txt", "page": 1})
+    seen = {}
+    first = rag_service._chunk_id(chunk, seen)
+    repeat = rag_service._chunk_id(chunk, seen)
+
+    assert first == rag_service._chunk_id(chunk, {})
+    assert repeat == f"{first}:1"
+    other_page = Document(page_content="siram pagi hari", metadata={"source": "a.txt", "page": 2})
+    assert rag_service._chunk_id(other_page, {}) != first
+
+
+def test_vector_ids_by_source():
+    store = _store({"a.txt": ["satu", "dua"], "b.txt": ["tiga"]})
+
+    ids_by_source = rag_service._vector_ids_by_source(store)
+
+    assert ids_by_source == {"a.txt": {"a.txt-0", "a.txt-1"}, "b.txt": {"b.txt-0"}}
+    assert rag_service._vector_ids_by_source(None) == {}
+
+
+def test_delete_vectors_removes_only_given_ids():
+    store = _store({"a.txt": ["satu", "dua"], "b.txt": ["tiga"]})
+
+    rag_service._delete_vectors(store, {"a.txt-0", "a.txt-1"})
+
+    assert store.index.ntotal == 1
+    assert rag_service._vector_ids_by_source(store) == {"b.txt": {"b.txt-0"}}
+
+
+def _scored(*contents):
+    return [(Document(id=content, page_content=content), 1.0) for content in contents]
+
+
+def test_fuse_rankings_rewards_documents_in_both_lists(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_RRF_K", 60)
+    lexical = _scored("a", "b", "c")
+    vector = _scored("c", "d", "a")
+
+    fused = rag_service._fuse_rankings([lexical, vector], k=3)
+
+    assert [doc.id for doc, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+
+
+def test_fuse_rankings_with_one_list_keeps_its_scores():
+    ranked = _scored("a", "b", "c")
+    assert rag_service._fuse_rankings([ranked], k=2) == ranked[:2]
+    assert rag_service._fuse_rankings([], k=2) == []
+
+
+def _serve_store(monkeypatch, store):
+    monkeypatch.setattr(rag_service, "vector_store", store)
+    monkeypatch.setattr(rag_service, "lexical_index", rag_service._build_lexical_index(store))
+    monkeypatch.setattr(rag_service, "_refresh_vector_store", lambda: None)
+
+
+def test_hybrid_retrieval_falls_back_to_lexical_when_embedding_fails(monkeypatch):
+    _serve_store(monkeypatch, _store({"a.txt": ["pupuk kompos organik", "hama kutu daun"]}))
+    monkeypatch.setattr(settings, "RAG_RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(settings, "RAG_MIN_BM25_SCORE", 0.0)
+
+    def fail(query, timeout=None):
+        raise RuntimeError("embedding API unavailable")
+
+    monkeypatch.setattr(rag_service, "_embed_query", fail)
+
+    results = rag_service._retrieve_documents("kompos", k=2)
+
+    assert [doc.page_content for doc, _ in results] == ["pupuk kompos organik"]
+
+
+def test_vector_only_retrieval_returns_nothing_when_embedding_fails(monkeypatch):
+    _serve_store(monkeypatch, _store({"a.txt": ["pupuk kompos organik"]}))
+    monkeypatch.setattr(settings, "RAG_RETRIEVAL_MODE", "vector")
+
+    def fail(query, timeout=None):
+        raise RuntimeError("embedding API unavailable")
+
+    monkeypatch.setattr(rag_service, "_embed_query", fail)
+
+    assert rag_service.retrieve_documents("kompos", k=2) == []
+
+
+class FakeLLM:
+    """Answers every prompt with fixed chunks and records the prompts"""
+
+    def __init__(self, chunks=("Siram ", "pagi hari."), error=None):
+        self.chunks = chunks
+        self.error = error
+        self.prompts = []
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages)
+        if self.error:
+            raise self.error
+        return AIMessage(content="".join(self.chunks))
+
+    async def astream(self, messages):
+        self.prompts.append(messages)
+        for chunk in self.chunks:
+            yield AIMessageChunk(content=chunk)
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(rag_service, "llm", llm)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+    async def retrieve(query, k=None, query_vector=None, embed_query=True):
+        return [(Document(page_content="Cabai disiram pagi hari.", metadata={"filename": "cabai.txt"}), 0.9)]
+
+    monkeypatch.setattr(rag_service, "aretrieve_documents", retrieve)
+    return llm
+
+
+def test_agenerate_response_answers_with_retrieved_context(fake_llm):
+    response = asyncio.run(rag_service.agenerate_response(
+        "kapan cabai disiram?", [("cabai apa yang mudah?", "Cabai rawit.")]
+    ))
+
+    assert response == "Siram pagi hari."
+    prompt = fake_llm.prompts[0]
+    assert "[Sumber: cabai.txt]" in prompt[0].content
+    assert [message.content for message in prompt[1:]] == [
+        "cabai apa yang mudah?", "Cabai rawit.", "kapan cabai disiram?"
+    ]
+
+
+def test_agenerate_response_returns_error_response_when_llm_fails(fake_llm):
+    fake_llm.error = RuntimeError("rate limited")
+
+    response = asyncio.run(rag_service.agenerate_response("kapan cabai disiram?"))
+
+    assert response == rag_service.ERROR_RESPONSE
+
+
+def test_agenerate_response_skips_llm_for_greetings(fake_llm):
+    assert asyncio.run(rag_service.agenerate_response("halo kak")) == GREETING_RESPONSE
+    assert fake_llm.prompts == []
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_astream_response_yields_model_chunks(fake_llm):
+    chunks = asyncio.run(_collect(rag_service.astream_response("kapan cabai disiram?")))
+    assert chunks == ["Siram ", "pagi hari."]
+
+
+def test_astream_response_yields_error_response_when_model_fails_first(fake_llm):
+    fake_llm.chunks = ()
+    fake_llm.error = RuntimeError("rate limited")
+
+    chunks = asyncio.run(_collect(rag_service.astream_response("kapan cabai disiram?")))
+
+    assert chunks == [rag_service.ERROR_RESPONSE]
+
+
+def test_astream_response_ends_early_when_model_fails_mid_stream(fake_llm):
+    fake_llm.error = RuntimeError("connection reset")
+
+    chunks = asyncio.run(_collect(rag_service.astream_response("kapan cabai disiram?")))
+
+    assert chunks == ["Siram ", "pagi hari."]
+
+
+def test_vector_search_drops_chunks_below_min_similarity(monkeypatch):
+    store = _store({"a.txt": ["dekat", "jauh sekali"]})
+    monkeypatch.setattr(settings, "RAG_MIN_SIMILARITY", 0.75)
+
+    # Vectors are [len(text), row]: "dekat" is [5, 0] and "jauh sekali" is [11, 1]
+    results = rag_service._vector_search(store, [5.0, 0.0], k=2)
+
+    assert [(doc.page_content, similarity) for doc, similarity in results] == [("dekat", 1.0)]
+
+
+def test_build_messages_fits_prompt_token_budget(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_PROMPT_TOKEN_BUDGET", count_tokens(rag_service.SYSTEM_PROMPT) + 300)
+    monkeypatch.setattr(settings, "RAG_CONTEXT_TOKEN_BUDGET", 1500)
+    scored_docs = [
+        (Document(page_content="kompos " * 50, metadata={"filename": "kompos.txt"}), 0.9),
+        (Document(page_content="siram pagi", metadata={"filename": "siram.txt"}), 0.8),
+    ]
+    history = [(f"pertanyaan {i} " * 20, f"jawaban {i} " * 20) for i in range(5)]
+
+    messages = rag_service._build_messages("kapan menyiram?", scored_docs, history)
+
+    total = sum(count_tokens(message.content) for message in messages)
+    assert total <= settings.RAG_PROMPT_TOKEN_BUDGET + count_tokens("{context}")
+    assert "[Sumber: kompos.txt]" in messages[0].content
+    assert messages[-1].content == "kapan menyiram?"
+
+
+def test_summarize_conversation_includes_previous_summary(monkeypatch):
+    llm = FakeLLM(chunks=("  Pengguna menanam cabai.  ",))
+    monkeypatch.setattr(rag_service, "llm", llm)
+
+    summary = asyncio.run(rag_service.asummarize_conversation(
+        "Pengguna punya kebun kecil.", [("kapan cabai disiram?", "Pagi hari.")]
+    ))
+
+    assert summary == "Pengguna menanam cabai."
+    prompt = llm.prompts[0][0].content
+    assert "Pengguna punya kebun kecil." in prompt
+    assert "Pengguna: kapan cabai disiram?\nAsisten: Pagi hari." in prompt
+
+
+def test_summarize_conversation_returns_none_on_llm_error(monkeypatch):
+    monkeypatch.setattr(rag_service, "llm", FakeLLM(error=RuntimeError("quota")))
+
+    assert asyncio.run(rag_service.asummarize_conversation(None, [("halo", "hai")])) is None
@@ -0,0 +1,77 @@
+from app.services.response_cache import SemanticResponseCache, is_history_independent, key_terms
+
+
+def _cache(**kwargs) -> SemanticResponseCache:
+    options = {"max_entries": 10, "similarity_threshold": 0.98}
+    options.update(kwargs)
+    return SemanticResponseCache(**options)
+
+
+def test_hit_on_same_question():
+    cache = _cache()
+    cache.store([1.0, 0.0], "cara menanam cabai", "jawaban cabai", 1.5, "v1")
+
+    assert cache.lookup([1.0, 0.0], "Bagaimana cara menanam cabai?", "v1") == "jawaban cabai"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["saved_seconds"] == 1.5
+
+
+def test_miss_on_similar_vector_with_different_key_terms():
+    cache = _cache()
+    cache.store([1.0, 0.0], "cara menanam cabai", "jawaban cabai", 1.0, "v1")
+
+    assert cache.lookup([1.0, 0.01], "cara menanam tomat", "v1") is None
+
+
+def test_miss_below_similarity_threshold():
+    cache = _cache()
+    cache.store([1.0, 0.0], "cara menanam cabai", "jawaban cabai", 1.0, "v1")
+
+    assert cache.lookup([0.8, 0.6], "cara menanam cabai", "v1") is None
+
+
+def test_version_change_drops_entries():
+    cache = _cache()
+    cache.store([1.0, 0.0], "cara menanam cabai", "jawaban cabai", 1.0, "v1")
+
+    assert cache.lookup([1.0, 0.0], "cara menanam cabai", "v2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_miss():
+    cache = _cache(ttl_seconds=1)
+    cache.store([1.0, 0.0], "cara menanam cabai", "jawaban cabai", 1.0, "v1")
+    cache._stored_at[0] -= 10
+
+    assert cache.lookup([1.0, 0.0], "cara menanam cabai", "v1") is None
+
+
+def test_duplicate_question_replaces_entry():
+    cache = _cache()
+    cache.store([1.0, 0.0], "cara menanam cabai", "lama", 1.0, "v1")
+    cache.store([1.0, 0.0], "cara menanam cabai", "baru", 1.0, "v1")
+
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup([1.0, 0.0], "cara menanam cabai", "v1") == "baru"
+
+
+def test_oldest_entries_are_evicted():
+    cache = _cache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "menanam cabai", "cabai", 1.0, "v1")
+    cache.store([0.0, 1.0, 0.0], "menanam tomat", "tomat", 1.0, "v1")
+    cache.store([0.0, 0.0, 1.0], "menanam selada", "selada", 1.0, "v1")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup([1.0, 0.0, 0.0], "menanam cabai", "v1") is None
+    assert cache.lookup([0.0, 0.0, 1.0], "menanam selada", "v1") == "selada"
+
+
+def test_key_terms_ignore_question_phrasing():
+    assert key_terms("Tolong jelaskan cara menanam cabai dong") == key_terms("menanam cabai?")
+    assert key_terms("cara menanam cabai") != key_terms("cara menanam tomat")
+
+
+def test_history_independence():
+    assert is_history_independent("kalau yang tadi bagaimana?", has_history=False)
+    assert not is_history_independent("kalau yang tadi bagaimana?", has_history=True)
+    assert is_history_independent("cara menanam selada hidroponik", has_history=True)
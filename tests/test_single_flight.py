@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.rag_service import rag_service
+from app.services.single_flight import SingleFlight
+
+
+def test_do_coalesces_concurrent_threads():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "hasil"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(single_flight.do("llm", "q", slow_call)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(single_flight.do("llm", "q", slow_call)))
+        for _ in range(3)
+    ]
+    for follower in followers:
+        follower.start()
+    deadline = time.monotonic() + 5
+    while single_flight.stats()["llm"]["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["hasil"] * 4
+    assert len(calls) == 1
+    assert single_flight.stats()["llm"]["coalesced_rate"] == 0.75
+
+
+def test_do_runs_again_after_call_finished():
+    single_flight = SingleFlight()
+    assert single_flight.do("llm", "q", lambda: 1) == 1
+    assert single_flight.do("llm", "q", lambda: 2) == 2
+
+
+def test_do_shares_exceptions_and_forgets_the_call():
+    single_flight = SingleFlight()
+
+    def failing_call():
+        raise RuntimeError("gagal")
+
+    with pytest.raises(RuntimeError):
+        single_flight.do("llm", "q", failing_call)
+    assert single_flight.do("llm", "q", lambda: "ok") == "ok"
+
+
+def test_ado_coalesces_concurrent_coroutines():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "hasil"
+
+    async def run():
+        return await asyncio.gather(*(single_flight.ado("llm", "q", call) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["hasil"] * 5
+    assert len(calls) == 1
+
+
+def test_ado_keeps_shared_call_when_a_caller_times_out():
+    single_flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "hasil"
+
+    async def run():
+        impatient = asyncio.wait_for(single_flight.ado("llm", "q", call), 0.001)
+        patient = single_flight.ado("llm", "q", call)
+        return await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    impatient, patient = asyncio.run(run())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "hasil"
+
+
+def test_retrieval_key_separates_lexical_only_calls():
+    hybrid = rag_service._retrieval_key("cara menanam cabai", 4, None, True)
+    with_vector = rag_service._retrieval_key("cara menanam cabai", 4, [0.1, 0.2], False)
+    lexical_only = rag_service._retrieval_key("cara menanam cabai", 4, None, False)
+
+    assert hybrid == with_vector
+    assert lexical_only != hybrid
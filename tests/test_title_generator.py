@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.title_generator import extract_title
+
+
+@pytest.mark.parametrize("message, title", [
+    ("Bagaimana cara menanam tomat di rumah?", "Cara Menanam Tomat"),
+    ("halo kak, gimana cara merawat anggrek bulan?", "Cara Merawat Anggrek Bulan"),
+    ("Berapa dosis pupuk NPK untuk cabai", "Dosis Pupuk NPK"),
+    ("kenapa daun selada saya menguning", "Daun Selada Menguning"),
+])
+def test_title_from_first_keywords(message, title):
+    assert extract_title(message) == title
+
+
+def test_title_keeps_acronyms():
+    assert "pH" in extract_title("berapa pH air hidroponik yang ideal")
+
+
+def test_title_skips_repeated_words():
+    assert extract_title("tomat tomat tomat berbuah") == "Tomat Berbuah"
+
+
+def test_title_falls_back_to_message_without_keywords():
+    assert extract_title("apa?") == "apa?"
+
+
+def test_title_is_truncated():
+    assert extract_title("x" * 80) == "X" + "x" * 49 + "..."
@@ -0,0 +1,38 @@
+from app.services.token_budget import (
+    CONTEXT_SEPARATOR,
+    MESSAGE_OVERHEAD_TOKENS,
+    count_tokens,
+    pack_context,
+    trim_history,
+)
+
+
+def test_count_tokens_of_empty_text():
+    assert count_tokens("") == 0
+    assert count_tokens("cara menanam cabai") > 0
+
+
+def test_pack_context_keeps_parts_in_order_within_budget():
+    parts = ["pertama " * 5, "kedua " * 5, "ketiga " * 5]
+    budget = count_tokens(parts[0]) + count_tokens(CONTEXT_SEPARATOR) + count_tokens(parts[1])
+
+    assert pack_context(parts, budget) == CONTEXT_SEPARATOR.join(parts[:2])
+
+
+def test_pack_context_skips_parts_that_do_not_fit():
+    short = "pendek"
+    long = "panjang " * 100
+    budget = count_tokens(short) + count_tokens(CONTEXT_SEPARATOR) + 10
+
+    assert pack_context([long, short], budget) == short
+
+
+def test_trim_history_keeps_most_recent_exchanges():
+    history = [("tanya satu", "jawab satu"), ("tanya dua", "jawab dua"), ("tanya tiga", "jawab tiga")]
+    last_two = sum(
+        count_tokens(human) + count_tokens(ai) + 2 * MESSAGE_OVERHEAD_TOKENS
+        for human, ai in history[1:]
+    )
+
+    assert trim_history(history, last_two) == history[1:]
+    assert trim_history(history, 0) == []
@@ -0,0 +1,65 @@
+from app.services.vector_store_versions import VectorStoreVersions
+
+
+def test_publish_moves_current_pointer(tmp_path):
+    versions = VectorStoreVersions(tmp_path)
+    assert versions.current_version() is None
+
+    version, path = versions.create_version()
+    versions.publish(version)
+
+    assert path.is_dir()
+    assert versions.current_version() == version
+    assert VectorStoreVersions(tmp_path).current_version() == version
+
+
+def test_legacy_root_index_is_the_current_version(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"")
+    versions = VectorStoreVersions(tmp_path)
+
+    assert versions.current_version() == VectorStoreVersions.LEGACY_VERSION
+    assert versions.path_for(VectorStoreVersions.LEGACY_VERSION) == tmp_path
+
+
+def test_stage_replaces_previous_checkpoint(tmp_path):
+    versions = VectorStoreVersions(tmp_path)
+    first, first_path = versions.create_version()
+    second, _ = versions.create_version()
+
+    versions.stage(first)
+    versions.stage(second)
+
+    assert versions.staging_version() == second
+    assert not first_path.exists()
+
+
+def test_stage_keeps_published_version(tmp_path):
+    versions = VectorStoreVersions(tmp_path)
+    published, published_path = versions.create_version()
+    versions.publish(published)
+    versions.stage(published)
+    checkpoint, _ = versions.create_version()
+
+    versions.stage(checkpoint)
+
+    assert published_path.exists()
+
+
+def test_publish_clears_staging_of_same_version(tmp_path):
+    versions = VectorStoreVersions(tmp_path)
+    version, _ = versions.create_version()
+    versions.stage(version)
+
+    versions.publish(version)
+
+    assert versions.staging_version() is None
+
+
+def test_garbage_collection_keeps_recent_current_and_staged(tmp_path):
+    versions = VectorStoreVersions(tmp_path, keep_versions=1)
+    created = [versions.create_version()[0] for _ in range(4)]
+    versions.stage(created[0])
+
+    versions.publish(created[1])
+
+    assert versions.list_versions() == [created[0], created[1], created[3]]